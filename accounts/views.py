@@ -7,6 +7,9 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.utils.crypto import get_random_string
 from django.db import transaction
+from projects import cache as config_cache
+from search.index import matching_ids
+from search.models import SearchEntry
 from .models import User
 from .forms import CustomUserCreationForm, CustomUserChangeForm, CustomPasswordChangeForm, UserProfileForm
 
@@ -50,8 +53,7 @@ def dashboard(request):
     """Dashboard view for authenticated users."""
     context = {
         'user': request.user,
-        'clients_count': request.user.created_clients.count(),
-        'projects_count': request.user.created_projects.count(),
+        **config_cache.dashboard_counts(request.user),
     }
     return render(request, 'accounts/dashboard.html', context)
 
@@ -99,15 +101,7 @@ class UserListView(ListView):
         queryset = super().get_queryset()
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                username__icontains=search
-            ) | queryset.filter(
-                email__icontains=search
-            ) | queryset.filter(
-                first_name__icontains=search
-            ) | queryset.filter(
-                last_name__icontains=search
-            )
+            queryset = queryset.filter(pk__in=matching_ids(search, SearchEntry.Kind.USER))
         return queryset
 
 
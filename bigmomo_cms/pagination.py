@@ -0,0 +1,75 @@
+"""Keyset pagination of list views ordered by name."""
+import base64
+import json
+from collections import namedtuple
+
+from django.db.models import Q
+
+
+# Page of a keyset paginated list. The cursors are the ``after`` and
+# ``before`` query parameters of the next and previous pages, or None.
+KeysetPage = namedtuple('KeysetPage', ['object_list', 'next_cursor', 'previous_cursor'])
+
+
+class KeysetPaginationMixin:
+    """Paginate a ``ListView`` by ``(name, id)`` instead of by offset.
+
+    Each page is fetched with ``WHERE (name, id) > cursor ORDER BY name, id
+    LIMIT n``, which an index on ``(name, id)`` answers without counting
+    or skipping the rows of earlier pages, so every page is as fast as the
+    first one. Pages are linked with opaque ``after``/``before`` cursors
+    holding the name and id of the last (or first) row shown.
+
+    The ids and names of a page are read first, from the filtered table
+    alone, so that joins and aggregates cannot make the database sort the
+    whole table. ``get_page_queryset`` then loads the rows of those ids.
+    """
+    paginate_by = 50
+
+    def get_page_queryset(self, queryset, pks):
+        """Return the rows of a page, given its ids; add joins and annotations here."""
+        return queryset.filter(pk__in=pks)
+
+    def paginate_queryset(self, queryset, page_size):
+        after = _decode_cursor(self.request.GET.get('after'))
+        before = _decode_cursor(self.request.GET.get('before'))
+        keys = queryset.select_related(None).values_list('pk', flat=True)
+        if before is not None:
+            name, pk = before
+            # ``name <= cursor`` bounds the index range; the OR alone would not.
+            keys = keys.filter(Q(name__lte=name), Q(name__lt=name) | Q(id__lt=pk)).order_by('-name', '-id')
+            pks = list(keys[:page_size + 1])
+            has_previous, has_next = len(pks) > page_size, True
+            pks = pks[:page_size][::-1]
+        else:
+            if after is not None:
+                name, pk = after
+                keys = keys.filter(Q(name__gte=name), Q(name__gt=name) | Q(id__gt=pk))
+            pks = list(keys.order_by('name', 'id')[:page_size + 1])
+            has_previous, has_next = after is not None, len(pks) > page_size
+            pks = pks[:page_size]
+        rows = {row.pk: row for row in self.get_page_queryset(queryset, pks).order_by()}
+        rows = [rows[pk] for pk in pks if pk in rows]
+        page = KeysetPage(
+            object_list=rows,
+            next_cursor=_encode_cursor(rows[-1]) if has_next and rows else None,
+            previous_cursor=_encode_cursor(rows[0]) if has_previous and rows else None,
+        )
+        return None, page, rows, bool(page.next_cursor or page.previous_cursor)
+
+
+def _encode_cursor(obj):
+    return base64.urlsafe_b64encode(json.dumps([obj.name, obj.pk]).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Return the ``(name, id)`` of a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(name, str) or not isinstance(pk, int):
+        return None
+    return name, pk
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'accounts',
     'clients',
     'projects',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -83,6 +84,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Scheduler workers write from several processes at once
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -117,6 +123,69 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Log synchronization
+SYNC_CHUNK_SIZE = config('SYNC_CHUNK_SIZE', default=1024 * 1024, cast=int)
+SYNC_DESTINATION_DIR = config('SYNC_DESTINATION_DIR', default=str(BASE_DIR / 'sync_data'))
+# Only needed for S3-compatible stores such as MinIO
+SYNC_S3_ENDPOINT_URL = config('SYNC_S3_ENDPOINT_URL', default='')
+# Seconds a source listing is reused by file filter previews (0 disables); sync runs always list live
+SYNC_LISTING_CACHE_DIR = config('SYNC_LISTING_CACHE_DIR', default=str(BASE_DIR / 'sync_listings'))
+SYNC_LISTING_CACHE_TTL = config('SYNC_LISTING_CACHE_TTL', default=300, cast=int)
+# Threads decoding independent members of compressed files (multi-member gzip, zstd frames)
+SYNC_DECOMPRESS_THREADS = config('SYNC_DECOMPRESS_THREADS', default=4, cast=int)
+# Chunks or parsed batches buffered between the fetch, parse and load threads of a sync
+SYNC_PIPELINE_DEPTH = config('SYNC_PIPELINE_DEPTH', default=8, cast=int)
+
+# Parsed rows are staged as Parquet files and loaded in bulk once this many bytes are staged
+SYNC_STAGING_DIR = config('SYNC_STAGING_DIR', default=str(BASE_DIR / 'sync_staging'))
+SYNC_LOAD_BATCH_BYTES = config('SYNC_LOAD_BATCH_BYTES', default=256 * 1024 * 1024, cast=int)
+# Rows of a local partition sorted in memory by the clustering fields; larger loads are sorted in runs and merged
+SYNC_SORT_RUN_ROWS = config('SYNC_SORT_RUN_ROWS', default=250_000, cast=int)
+# Row deduplication: rows a partition's Bloom filter first has room for (it grows as needed), and rate of unique rows wrongly dropped
+SYNC_ROW_DEDUP_CAPACITY = config('SYNC_ROW_DEDUP_CAPACITY', default=5_000_000, cast=int)
+SYNC_ROW_DEDUP_ERROR_RATE = config('SYNC_ROW_DEDUP_ERROR_RATE', default=0.0001, cast=float)
+# Crawler verification: concurrent DNS lookups, and verified addresses cached per worker process
+SYNC_CRAWLER_DNS_THREADS = config('SYNC_CRAWLER_DNS_THREADS', default=16, cast=int)
+SYNC_CRAWLER_CACHE_SIZE = config('SYNC_CRAWLER_CACHE_SIZE', default=100_000, cast=int)
+SYNC_CRAWLER_CACHE_TTL = config('SYNC_CRAWLER_CACHE_TTL', default=24 * 60 * 60, cast=int)
+SYNC_CRAWLER_RANGES_DIR = config('SYNC_CRAWLER_RANGES_DIR', default=str(BASE_DIR / 'crawler_ranges'))
+# Files retried after a failed run kept on disk until loaded, so further retries read them back instead of downloading (0 disables)
+SYNC_SPOOL_DIR = config('SYNC_SPOOL_DIR', default=str(BASE_DIR / 'sync_spool'))
+SYNC_SPOOL_QUOTA_BYTES = config('SYNC_SPOOL_QUOTA_BYTES', default=1024 * 1024 * 1024, cast=int)
+
+# Pooled SFTP sessions, reused across files and projects within a worker
+SFTP_POOL_IDLE_TIMEOUT = config('SFTP_POOL_IDLE_TIMEOUT', default=300, cast=int)
+SFTP_POOL_HEALTH_CHECK_AFTER = config('SFTP_POOL_HEALTH_CHECK_AFTER', default=30, cast=int)
+SFTP_POOL_MAX_IDLE_PER_HOST = config('SFTP_POOL_MAX_IDLE_PER_HOST', default=4, cast=int)
+SFTP_POOL_KEEPALIVE = config('SFTP_POOL_KEEPALIVE', default=30, cast=int)
+# Seconds to wait for an SFTP server to connect or answer a request
+SFTP_TIMEOUT = config('SFTP_TIMEOUT', default=30, cast=int)
+# Store the host key of SFTP servers without one on first connection, instead of refusing to connect
+SFTP_TRUST_NEW_HOST_KEYS = config('SFTP_TRUST_NEW_HOST_KEYS', default=False, cast=bool)
+# Files up to this size are read ahead on extra SFTP channels of the same connection
+SFTP_READ_AHEAD_CHANNELS = config('SFTP_READ_AHEAD_CHANNELS', default=8, cast=int)
+SFTP_READ_AHEAD_MAX_SIZE = config('SFTP_READ_AHEAD_MAX_SIZE', default=1024 * 1024, cast=int)
+
+# Concurrent S3 listing: threads per listing and folder levels expanded into partitions
+S3_LIST_CONCURRENCY = config('S3_LIST_CONCURRENCY', default=8, cast=int)
+S3_LIST_MAX_DEPTH = config('S3_LIST_MAX_DEPTH', default=3, cast=int)
+
+# Scheduler
+SCHEDULER_MAX_WORKERS = config('SCHEDULER_MAX_WORKERS', default=4, cast=int)
+SCHEDULER_MAX_JOBS_PER_SOURCE = config('SCHEDULER_MAX_JOBS_PER_SOURCE', default=2, cast=int)
+SCHEDULER_POLL_INTERVAL = config('SCHEDULER_POLL_INTERVAL', default=30, cast=int)
+
+# Cache of project configuration pages, invalidated when it changes. The default local-memory cache
+# belongs to each process, which sees changes made by other processes (other site workers, the scheduler)
+# only after CONFIG_CACHE_TIMEOUT; set CACHE_REDIS_URL (e.g. redis://localhost:6379/0) to share it between them.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 10000}}}
+# Seconds a cached project or page fragment is kept at most (0 disables the cache)
+CONFIG_CACHE_TIMEOUT = config('CONFIG_CACHE_TIMEOUT', default=3600, cast=int)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
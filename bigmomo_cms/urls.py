@@ -24,6 +24,7 @@ urlpatterns = [
     path('', include('accounts.urls')),
     path('clients/', include('clients.urls')),
     path('projects/', include('projects.urls')),
+    path('search/', include('search.urls')),
 ]
 
 if settings.DEBUG:
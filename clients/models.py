@@ -25,6 +25,10 @@ class Client(models.Model):
         verbose_name = _('Client')
         verbose_name_plural = _('Clients')
         ordering = ['name']
+        # Keyset pagination of the client list
+        indexes = [
+            models.Index(fields=['name', 'id'], name='client_name_id_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -1,3 +1,100 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import User
+from projects.models import Project
+from .models import Client
+
+
+class ClientListPaginationTests(TestCase):
+    """The client list is paginated by ``(name, id)`` cursors."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        # Repeated names make the id break ties between rows of equal name.
+        cls.clients = [
+            Client.objects.create(name=f'Client {i % 40:02d}', created_by=cls.user)
+            for i in range(120)
+        ]
+        Project.objects.create(name='Site', client=cls.clients[0], created_by=cls.user)
+    
+    def setUp(self):
+        self.client.force_login(self.user)
+    
+    def get_page(self, **params):
+        response = self.client.get(reverse('client_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+    
+    def test_pages_forward_and_back(self):
+        expected = sorted(self.clients, key=lambda client: (client.name, client.pk))
+        pages = [self.get_page()]
+        while pages[-1].next_cursor:
+            pages.append(self.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([len(page.object_list) for page in pages], [50, 50, 20])
+        self.assertEqual([client for page in pages for client in page.object_list], expected)
+        self.assertIsNone(pages[0].previous_cursor)
+        
+        # Walking back from the last page shows the same pages again.
+        page = pages[-1]
+        for previous in reversed(pages[:-1]):
+            page = self.get_page(before=page.previous_cursor)
+            self.assertEqual(list(page.object_list), list(previous.object_list))
+        self.assertIsNone(page.previous_cursor)
+        self.assertIsNotNone(page.next_cursor)
+    
+    def test_malformed_cursor_shows_first_page(self):
+        page = self.get_page(after='not-a-cursor')
+        self.assertEqual(page.object_list[0], min(self.clients, key=lambda client: (client.name, client.pk)))
+        self.assertIsNone(page.previous_cursor)
+    
+    def test_project_counts(self):
+        page = self.get_page()
+        counts = {client.pk: client.project_count for client in page.object_list}
+        self.assertEqual(counts[self.clients[0].pk], 1)
+        self.assertEqual(sum(counts.values()), 1)
+    
+    def test_search_filters_before_paginating(self):
+        response = self.client.get(reverse('client_list'), {'search': 'Client 07'})
+        names = {client.name for client in response.context['page_obj'].object_list}
+        self.assertEqual(names, {'Client 07'})
+        self.assertEqual(len(response.context['page_obj'].object_list), 3)
+
+
+class ClientProjectsTests(TestCase):
+    """Projects of a client are loaded when it is expanded."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.acme = Client.objects.create(name='Acme', created_by=cls.user)
+        for i in range(5):
+            Project.objects.create(
+                name=f'Site {i}', description='A long description of the site ' * 3,
+                client=cls.acme, created_by=cls.user,
+            )
+        Project.objects.create(name='Other', client=Client.objects.create(name='Other', created_by=cls.user), created_by=cls.user)
+    
+    def test_requires_login(self):
+        response = self.client.get(reverse('client_projects', args=[self.acme.pk]))
+        self.assertEqual(response.status_code, 302)
+    
+    def test_lists_the_projects_of_one_client(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('client_projects', args=[self.acme.pk]))
+        projects = response.json()['projects']
+        self.assertEqual(sorted(project['name'] for project in projects), [f'Site {i}' for i in range(5)])
+        self.assertEqual(projects[0]['created_by'], 'editor')
+        self.assertLessEqual(len(projects[0]['description'].split()), 11)
+        self.assertEqual(projects[0]['detail_url'], reverse('project_detail', args=[projects[0]['id']]))
+        # Session and user, the client, and its projects with their creators.
+        self.assertLessEqual(len(queries), 4)
+    
+    def test_unknown_client(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('client_projects', args=[0]))
+        self.assertEqual(response.status_code, 404)
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.ClientListView.as_view(), name='client_list'),
     path('create/', views.ClientCreateView.as_view(), name='client_create'),
+    path('<int:pk>/projects/', views.client_projects, name='client_projects'),
     path('<int:pk>/edit/', views.ClientUpdateView.as_view(), name='client_edit'),
     path('<int:pk>/delete/', views.ClientDeleteView.as_view(), name='client_delete'),
 ]
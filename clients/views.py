@@ -1,31 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.text import Truncator
 from django.db.models import Count
+from bigmomo_cms.pagination import KeysetPaginationMixin
+from search.index import matching_ids
+from search.models import SearchEntry
 from .models import Client
 from .forms import ClientForm
 
 
-class ClientListView(ListView):
+class ClientListView(KeysetPaginationMixin, ListView):
     """List view for clients."""
     model = Client
     template_name = 'clients/client_list.html'
     context_object_name = 'clients'
-    ordering = ['name']
     
     def get_queryset(self):
-        """Get clients with project count."""
-        return Client.objects.annotate(project_count=Count('projects'))
-    
-    def get_context_data(self, **kwargs):
-        """Add search functionality."""
-        context = super().get_context_data(**kwargs)
+        """Get clients filtered by search.
+        
+        Projects are only fetched when a client is expanded (see ``client_projects``).
+        """
+        queryset = Client.objects.all()
         search = self.request.GET.get('search')
         if search:
-            context['clients'] = context['clients'].filter(name__icontains=search)
-        return context
+            queryset = queryset.filter(pk__in=matching_ids(search, SearchEntry.Kind.CLIENT))
+        return queryset
+    
+    def get_page_queryset(self, queryset, pks):
+        """Count the projects of the clients shown only."""
+        return queryset.filter(pk__in=pks).annotate(project_count=Count('projects'))
+
+
+@login_required
+def client_projects(request, pk):
+    """Return the projects of a client as JSON, for the client list to show when expanded."""
+    client = get_object_or_404(Client, pk=pk)
+    projects = client.projects.select_related('created_by').only('name', 'description', 'client', 'created_by__username')
+    
+    return JsonResponse({
+        'projects': [
+            {
+                'id': project.pk,
+                'name': project.name,
+                'description': Truncator(project.description).words(10),
+                'created_by': project.created_by.username,
+                'detail_url': reverse('project_detail', args=[project.pk]),
+                'edit_url': reverse('project_edit', args=[project.pk]),
+            }
+            for project in projects
+        ],
+    })
 
 
 class ClientCreateView(CreateView):
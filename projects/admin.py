@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
-from .models import Project, LogSource, FileFilter, Schedule
+from .models import Project, LogSource, Destination, Rollup, ManifestEntry, FileFilter, Schedule, JobRun, JobStage
 
 
 class LogSourceInline(admin.StackedInline):
@@ -11,26 +11,57 @@ class LogSourceInline(admin.StackedInline):
             'fields': ['source_type']
         }),
         ('SFTP Configuration', {
-            'fields': ['host', 'port', 'username', 'password', 'directory'],
+            'fields': ['host', 'port', 'username', 'password', 'directory', 'host_key'],
             'classes': ('collapse',)
         }),
         ('S3 Configuration', {
-            'fields': ['bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix'],
+            'fields': ['bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix', 'resume_listing'],
+            'classes': ('collapse',)
+        }),
+        ('Sync Options', {
+            'fields': ['tail_files']
+        }),
+    )
+
+
+class DestinationInline(admin.StackedInline):
+    model = Destination
+    extra = 0
+    fieldsets = (
+        ('Destination Type', {
+            'fields': ['destination_type', 'table_name']
+        }),
+        ('Table Layout', {
+            'fields': ['partitioning', 'clustering_fields', 'deduplicate_rows', 'classify_crawlers', 'normalize_dimensions']
+        }),
+        ('Local Configuration', {
+            'fields': ['directory'],
+            'classes': ('collapse',)
+        }),
+        ('BigQuery Configuration', {
+            'fields': ['gcp_project', 'dataset', 'location', 'credentials_json'],
             'classes': ('collapse',)
         }),
     )
 
 
+class RollupInline(admin.TabularInline):
+    model = Rollup
+    extra = 0
+    fields = ['name', 'granularity', 'group_by', 'is_active']
+
+
 class FileFilterInline(admin.StackedInline):
     model = FileFilter
     extra = 0
-    fields = ['filter_type', 'pattern']
+    fields = ['filter_type', 'pattern', 'log_format']
 
 
 class ScheduleInline(admin.StackedInline):
     model = Schedule
     extra = 0
-    fields = ['cron_expression', 'is_active']
+    fields = ['cron_expression', 'is_active', 'next_run_at', 'last_run_at']
+    readonly_fields = ['next_run_at', 'last_run_at']
 
 
 @admin.register(Project)
@@ -52,7 +83,7 @@ class ProjectAdmin(admin.ModelAdmin):
         }),
     )
     
-    inlines = [LogSourceInline, FileFilterInline, ScheduleInline]
+    inlines = [LogSourceInline, DestinationInline, RollupInline, FileFilterInline, ScheduleInline]
     readonly_fields = ['created_at', 'updated_at']
     
     def has_log_source(self, obj):
@@ -88,13 +119,16 @@ class LogSourceAdmin(admin.ModelAdmin):
             'fields': ['source_type']
         }),
         ('SFTP Configuration', {
-            'fields': ['host', 'port', 'username', 'password', 'directory'],
+            'fields': ['host', 'port', 'username', 'password', 'directory', 'host_key'],
             'classes': ('collapse',)
         }),
         ('S3 Configuration', {
-            'fields': ['bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix'],
+            'fields': ['bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix', 'resume_listing'],
             'classes': ('collapse',)
         }),
+        ('Sync Options', {
+            'fields': ['tail_files']
+        }),
     )
     
     def get_connection_info(self, obj):
@@ -107,12 +141,52 @@ class LogSourceAdmin(admin.ModelAdmin):
     get_connection_info.short_description = 'Connection Info'
 
 
+@admin.register(Destination)
+class DestinationAdmin(admin.ModelAdmin):
+    """Admin interface for Destination model."""
+    
+    list_display = ['project', 'destination_type', 'table_name', 'partitioning', 'created_at']
+    list_filter = ['destination_type', 'partitioning', 'created_at']
+    search_fields = ['project__name', 'table_name', 'gcp_project', 'dataset']
+    ordering = ['project__name']
+    
+    fieldsets = (
+        ('Project', {
+            'fields': ['project']
+        }),
+        ('Destination Type', {
+            'fields': ['destination_type', 'table_name']
+        }),
+        ('Table Layout', {
+            'fields': ['partitioning', 'clustering_fields', 'deduplicate_rows', 'classify_crawlers', 'normalize_dimensions']
+        }),
+        ('Local Configuration', {
+            'fields': ['directory'],
+            'classes': ('collapse',)
+        }),
+        ('BigQuery Configuration', {
+            'fields': ['gcp_project', 'dataset', 'location', 'credentials_json'],
+            'classes': ('collapse',)
+        }),
+    )
+
+
+@admin.register(Rollup)
+class RollupAdmin(admin.ModelAdmin):
+    """Admin interface for Rollup model."""
+    
+    list_display = ['name', 'project', 'granularity', 'group_by', 'is_active', 'created_at']
+    list_filter = ['granularity', 'is_active', 'created_at']
+    search_fields = ['project__name', 'name']
+    ordering = ['project__name', 'name']
+
+
 @admin.register(FileFilter)
 class FileFilterAdmin(admin.ModelAdmin):
     """Admin interface for FileFilter model."""
     
-    list_display = ['project', 'filter_type', 'pattern', 'created_at']
-    list_filter = ['filter_type', 'created_at']
+    list_display = ['project', 'filter_type', 'pattern', 'log_format', 'created_at']
+    list_filter = ['filter_type', 'log_format', 'created_at']
     search_fields = ['project__name', 'pattern']
     ordering = ['project__name']
 
@@ -121,7 +195,42 @@ class FileFilterAdmin(admin.ModelAdmin):
 class ScheduleAdmin(admin.ModelAdmin):
     """Admin interface for Schedule model."""
     
-    list_display = ['project', 'cron_expression', 'is_active', 'created_at']
+    list_display = ['project', 'cron_expression', 'is_active', 'next_run_at', 'last_run_at', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['project__name', 'cron_expression']
     ordering = ['project__name']
+    readonly_fields = ['next_run_at', 'last_run_at']
+
+
+@admin.register(ManifestEntry)
+class ManifestEntryAdmin(admin.ModelAdmin):
+    """Admin interface for ManifestEntry model."""
+    
+    list_display = ['path', 'project', 'size', 'offset', 'status', 'content_hash', 'synced_at']
+    list_filter = ['status', 'synced_at']
+    search_fields = ['project__name', 'path']
+    ordering = ['project__name', 'path']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+class JobStageInline(admin.TabularInline):
+    model = JobStage
+    extra = 0
+    can_delete = False
+    fields = ['stage', 'seconds', 'bytes', 'rows', 'files']
+    readonly_fields = ['stage', 'seconds', 'bytes', 'rows', 'files']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    """Admin interface for JobRun model."""
+    
+    list_display = ['project', 'status', 'started_at', 'finished_at', 'peak_memory']
+    list_filter = ['status', 'started_at']
+    search_fields = ['project__name', 'error']
+    ordering = ['-started_at']
+    readonly_fields = ['project', 'status', 'started_at', 'finished_at', 'peak_memory', 'error']
+    inlines = [JobStageInline]
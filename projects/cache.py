@@ -0,0 +1,177 @@
+"""Cache of project configuration for the project and dashboard pages.
+
+Project pages read a project with its log source, file filter, schedule,
+destination and rollups, and render the same configuration cards, on
+every view, although they rarely change. Both are cached here, in the
+``default`` cache, until ``projects.signals`` invalidates them when one
+of the objects they show is saved or deleted.
+
+With a cache shared by every process (e.g. Redis), a change made in one
+process invalidates the pages cached by all of them. With the default
+local-memory cache, each process has its own cache, and only sees the
+changes made by other processes (another site worker, or the scheduler)
+once its cached values expire, after ``CONFIG_CACHE_TIMEOUT`` seconds.
+
+Keys include a generation of the project (or of the dashboards), which
+invalidation increments once the change is committed. A page rendered
+from rows read before the change is then stored under the previous
+generation, where it is never read, so it cannot outlive the change.
+
+Hits and misses of each kind of value are counted in the cache too, so
+that every process adds to the same counters when the cache is shared;
+see ``cache_stats``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.template.loader import render_to_string
+
+from .models import Project
+
+
+# Kinds of cached values, whose hits and misses are counted separately.
+KINDS = ['project', 'fragment', 'dashboard']
+
+# Cache backends that store nothing, so that reading from them is wasted work.
+DISABLED_BACKENDS = [
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+# Generation and counter keys are kept until they are evicted.
+_FOREVER = None
+
+
+def _enabled():
+    return settings.CONFIG_CACHE_TIMEOUT > 0 and settings.CACHES['default']['BACKEND'] not in DISABLED_BACKENDS
+
+
+def _generation(key):
+    """Return the current generation stored at ``key``, starting one if there is none.
+
+    Generations start at the current time in nanoseconds, which is past
+    every generation used before, so a generation key evicted from the
+    cache cannot bring back values stored under an older generation.
+    """
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), _FOREVER)
+        generation = cache.get(key)
+    return generation
+
+
+def _next_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), _FOREVER)
+
+
+def _count(kind, outcome):
+    key = f'config-cache:{kind}:{outcome}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, _FOREVER):
+            cache.incr(key)
+
+
+def _get_or_set(kind, key, compute):
+    value = cache.get(key)
+    if value is not None:
+        _count(kind, 'hits')
+        return value
+    _count(kind, 'misses')
+    value = compute()
+    cache.set(key, value, settings.CONFIG_CACHE_TIMEOUT)
+    return value
+
+
+def _project_generation(project_id):
+    return _generation(f'config-cache:project:{project_id}:generation')
+
+
+def _load_project(project_id):
+    project = (
+        Project.objects
+        .select_related('client', 'created_by', 'log_source', 'file_filter', 'schedule', 'destination')
+        .prefetch_related('rollups')
+        .filter(pk=project_id)
+        .first()
+    )
+    if project is None:
+        raise Http404('No project matches the given query.')
+    return project
+
+
+def get_project(project_id):
+    """Return a project with its client, creator and configuration, or raise ``Http404``.
+
+    Its ``log_source``, ``file_filter``, ``schedule``, ``destination`` and
+    ``rollups`` are read without further queries.
+    """
+    if not _enabled():
+        return _load_project(project_id)
+    key = f'config-cache:project:{project_id}:{_project_generation(project_id)}'
+    return _get_or_set('project', key, lambda: _load_project(project_id))
+
+
+def render_fragment(project, template_name, context):
+    """Render ``template_name`` with ``context``, or return it as last rendered for ``project``.
+
+    The fragment must only show ``project`` and its configuration.
+    """
+    if not _enabled():
+        return render_to_string(template_name, context)
+    key = f'config-cache:fragment:{template_name}:{project.pk}:{_project_generation(project.pk)}'
+    return _get_or_set('fragment', key, lambda: render_to_string(template_name, context))
+
+
+def dashboard_counts(user):
+    """Return how many clients and projects ``user`` created."""
+    def count():
+        return {
+            'clients_count': user.created_clients.count(),
+            'projects_count': user.created_projects.count(),
+        }
+
+    if not _enabled():
+        return count()
+    key = f'config-cache:dashboard:{user.pk}:{_generation("config-cache:dashboard:generation")}'
+    return _get_or_set('dashboard', key, count)
+
+
+def invalidate_projects(project_ids):
+    """Stop serving the cached projects and fragments of ``project_ids`` once committed."""
+    project_ids = list(project_ids)
+
+    def invalidate():
+        for project_id in project_ids:
+            _next_generation(f'config-cache:project:{project_id}:generation')
+
+    if project_ids:
+        transaction.on_commit(invalidate)
+
+
+def invalidate_dashboards():
+    """Stop serving the cached counts of every dashboard once committed."""
+    transaction.on_commit(lambda: _next_generation('config-cache:dashboard:generation'))
+
+
+def stats():
+    """Return the hits and misses of each kind of cached value, across processes."""
+    keys = [f'config-cache:{kind}:{outcome}' for kind in KINDS for outcome in ('hits', 'misses')]
+    counters = cache.get_many(keys)
+    return {
+        kind: {
+            'hits': counters.get(f'config-cache:{kind}:hits', 0),
+            'misses': counters.get(f'config-cache:{kind}:misses', 0),
+        }
+        for kind in KINDS
+    }
+
+
+def reset_stats():
+    cache.delete_many([f'config-cache:{kind}:{outcome}' for kind in KINDS for outcome in ('hits', 'misses')])
@@ -0,0 +1,102 @@
+"""Minimal parser for standard five-field cron expressions."""
+from datetime import datetime, time, timedelta
+
+
+MONTH_NAMES = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+DAY_NAMES = {
+    'sun': 0, 'mon': 1, 'tue': 2, 'wed': 3, 'thu': 4, 'fri': 5, 'sat': 6,
+}
+
+# How far ahead to look for a matching day before giving up (e.g. "0 0 30 2 *").
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def _parse_value(value, names):
+    value = value.lower()
+    if value in names:
+        return names[value]
+    if not value.isdigit():
+        raise ValueError(f'Invalid value "{value}"')
+    return int(value)
+
+
+def _parse_field(field, minimum, maximum, names=None):
+    """Return the sorted values allowed by one cron field."""
+    names = names or {}
+    values = set()
+    for part in field.split(','):
+        range_part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if step < 1:
+            raise ValueError(f'Invalid step in "{part}"')
+        if range_part == '*':
+            start, end = minimum, maximum
+        elif '-' in range_part:
+            start, end = (_parse_value(v, names) for v in range_part.split('-', 1))
+        else:
+            start = _parse_value(range_part, names)
+            end = maximum if step > 1 else start
+        if not minimum <= start <= end <= maximum:
+            raise ValueError(f'"{part}" is out of range {minimum}-{maximum}')
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+class CronExpression:
+    """A parsed ``minute hour day month day_of_week`` expression.
+
+    Follows the usual cron semantics: when both the day-of-month and the
+    day-of-week fields are restricted, a day matching either one matches.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError('Cron expressions must have 5 fields: minute hour day month day_of_week')
+        self.expression = expression
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = set(_parse_field(fields[2], 1, 31))
+        self.months = set(_parse_field(fields[3], 1, 12, MONTH_NAMES))
+        # Both 0 and 7 mean Sunday.
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7, DAY_NAMES)}
+        self._any_day = fields[2].startswith('*')
+        self._any_weekday = fields[4].startswith('*')
+
+    def __str__(self):
+        return self.expression
+
+    def _matches_day(self, date):
+        if date.month not in self.months:
+            return False
+        day_matches = date.day in self.days
+        weekday_matches = (date.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_matches
+        if self._any_weekday:
+            return day_matches
+        return day_matches or weekday_matches
+
+    def next_after(self, moment):
+        """Return the first matching minute strictly after ``moment``.
+
+        The result keeps the timezone of ``moment``.
+        """
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        date = start.date()
+        for _ in range(MAX_LOOKAHEAD_DAYS):
+            if self._matches_day(date):
+                is_first_day = date == start.date()
+                for hour in self.hours:
+                    if is_first_day and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        if is_first_day and hour == start.hour and minute < start.minute:
+                            continue
+                        return datetime.combine(date, time(hour, minute), tzinfo=moment.tzinfo)
+            date += timedelta(days=1)
+        raise ValueError(f'"{self.expression}" never matches')
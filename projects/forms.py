@@ -1,5 +1,10 @@
+import json
+import re
+
 from django import forms
-from .models import Project, LogSource, FileFilter, Schedule
+from django.utils import timezone
+from .cron import CronExpression
+from .models import Project, LogSource, Destination, Rollup, FileFilter, Schedule
 
 
 class ProjectForm(forms.ModelForm):
@@ -21,8 +26,9 @@ class LogSourceForm(forms.ModelForm):
     class Meta:
         model = LogSource
         fields = [
-            'source_type', 'host', 'port', 'username', 'password', 'directory',
-            'bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix'
+            'source_type', 'host', 'port', 'username', 'password', 'directory', 'host_key',
+            'bucket_name', 'region', 'access_key_id', 'secret_access_key', 'prefix',
+            'resume_listing', 'tail_files'
         ]
         widgets = {
             'source_type': forms.Select(attrs={'class': 'form-control'}),
@@ -31,11 +37,14 @@ class LogSourceForm(forms.ModelForm):
             'username': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter username'}),
             'password': forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': 'Enter password'}),
             'directory': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/path/to/logs'}),
+            'host_key': forms.Textarea(attrs={'class': 'form-control font-monospace', 'rows': 2, 'placeholder': 'sftp.example.com ssh-ed25519 AAAA...'}),
             'bucket_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., my-logs-bucket'}),
             'region': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., us-east-1'}),
             'access_key_id': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'AWS Access Key ID'}),
             'secret_access_key': forms.PasswordInput(attrs={'class': 'form-control', 'placeholder': 'AWS Secret Access Key'}),
-            'prefix': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., logs/2024/'})
+            'prefix': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., logs/2024/'}),
+            'resume_listing': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'tail_files': forms.CheckboxInput(attrs={'class': 'form-check-input'})
         }
     
     def __init__(self, *args, **kwargs):
@@ -73,16 +82,113 @@ class LogSourceForm(forms.ModelForm):
         return cleaned_data
 
 
+class DestinationForm(forms.ModelForm):
+    """Form for configuring destinations."""
+    
+    class Meta:
+        model = Destination
+        fields = [
+            'destination_type', 'table_name', 'partitioning', 'clustering_fields', 'deduplicate_rows',
+            'classify_crawlers', 'normalize_dimensions', 'directory', 'gcp_project', 'dataset', 'location', 'credentials_json'
+        ]
+        widgets = {
+            'destination_type': forms.Select(attrs={'class': 'form-control'}),
+            'table_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., access_logs'}),
+            'partitioning': forms.Select(attrs={'class': 'form-control'}),
+            'clustering_fields': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., host,status'}),
+            'deduplicate_rows': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'classify_crawlers': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'normalize_dimensions': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'directory': forms.TextInput(attrs={'class': 'form-control', 'placeholder': '/path/to/warehouse'}),
+            'gcp_project': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., my-gcp-project'}),
+            'dataset': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., logs'}),
+            'location': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., EU'}),
+            'credentials_json': forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Service account key JSON'})
+        }
+    
+    def clean_clustering_fields(self):
+        """Normalize the clustering columns to a comma-separated list without spaces."""
+        clustering_fields = self.cleaned_data['clustering_fields']
+        return ','.join(column.strip() for column in clustering_fields.split(',') if column.strip())
+    
+    def clean(self):
+        """Validate that required fields are filled based on destination type."""
+        cleaned_data = super().clean()
+        destination_type = cleaned_data.get('destination_type')
+        
+        table_name = cleaned_data.get('table_name')
+        if table_name and not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table_name):
+            self.add_error('table_name', 'Table names may only contain letters, digits and underscores.')
+        
+        if destination_type == 'bigquery':
+            if not cleaned_data.get('gcp_project'):
+                self.add_error('gcp_project', 'GCP project is required for BigQuery destinations.')
+            if not cleaned_data.get('dataset'):
+                self.add_error('dataset', 'Dataset is required for BigQuery destinations.')
+            credentials_json = cleaned_data.get('credentials_json')
+            if credentials_json:
+                try:
+                    json.loads(credentials_json)
+                except ValueError:
+                    self.add_error('credentials_json', 'Credentials must be valid JSON.')
+        
+        return cleaned_data
+
+
+class RollupForm(forms.ModelForm):
+    """Form for configuring one rollup of a project."""
+    
+    class Meta:
+        model = Rollup
+        fields = ['name', 'granularity', 'group_by', 'is_active']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., daily_hits'}),
+            'granularity': forms.Select(attrs={'class': 'form-control'}),
+            'group_by': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g., path,status,crawler'}),
+            'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'})
+        }
+    
+    def clean_name(self):
+        """Validate that the name can be appended to a table name."""
+        name = self.cleaned_data['name'].strip()
+        if not re.fullmatch(r'[A-Za-z0-9_]+', name):
+            raise forms.ValidationError('Rollup names may only contain letters, digits and underscores.')
+        return name
+    
+    def clean_group_by(self):
+        """Normalize the group by columns to a comma-separated list without spaces."""
+        group_by = self.cleaned_data['group_by']
+        return ','.join(column.strip() for column in group_by.split(',') if column.strip())
+
+
+RollupFormSet = forms.inlineformset_factory(Project, Rollup, form=RollupForm, extra=1, can_delete=True)
+
+
 class FileFilterForm(forms.ModelForm):
     """Form for configuring file filters."""
     
     class Meta:
         model = FileFilter
-        fields = ['filter_type', 'pattern']
+        fields = ['filter_type', 'pattern', 'log_format']
         widgets = {
             'filter_type': forms.Select(attrs={'class': 'form-control'}),
-            'pattern': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter filter pattern'})
+            'pattern': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Enter filter pattern'}),
+            'log_format': forms.Select(attrs={'class': 'form-control'})
         }
+    
+    def clean(self):
+        """Validate that regex patterns compile."""
+        cleaned_data = super().clean()
+        filter_type = cleaned_data.get('filter_type')
+        pattern = cleaned_data.get('pattern')
+        
+        if filter_type == 'regex' and pattern:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                self.add_error('pattern', f'Invalid regular expression: {e}')
+        
+        return cleaned_data
 
 
 class ScheduleForm(forms.ModelForm):
@@ -98,3 +204,12 @@ class ScheduleForm(forms.ModelForm):
         help_texts = {
             'cron_expression': 'Cron expression format: minute hour day month day_of_week'
         }
+    
+    def clean_cron_expression(self):
+        """Validate the cron expression so the next run time can be computed."""
+        cron_expression = self.cleaned_data['cron_expression'].strip()
+        try:
+            CronExpression(cron_expression).next_after(timezone.now())
+        except ValueError as e:
+            raise forms.ValidationError(f'Invalid cron expression: {e}')
+        return cron_expression
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+from projects import cache as config_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows the hits and misses of the project configuration cache, e.g. for monitoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the counters as JSON')
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        stats = config_cache.stats()
+        if options['json']:
+            self.stdout.write(json.dumps(stats))
+        else:
+            for kind, counters in stats.items():
+                lookups = counters['hits'] + counters['misses']
+                hit_rate = f'{counters["hits"] / lookups:.1%}' if lookups else '-'
+                self.stdout.write(f'{kind}: {counters["hits"]} hits, {counters["misses"]} misses, hit rate {hit_rate}')
+        if options['reset']:
+            config_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
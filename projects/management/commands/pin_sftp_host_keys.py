@@ -0,0 +1,35 @@
+import paramiko
+from django.core.management.base import BaseCommand, CommandError
+from projects.models import LogSource
+from projects.sync.pool import fetch_host_key, host_key_line, pin_host_key
+
+
+class Command(BaseCommand):
+    help = 'Stores the host key SFTP servers present for the log sources that have none, so that syncs accept them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only pin the host key of this project')
+        parser.add_argument('--dry-run', action='store_true', help='Show the host keys without storing them')
+
+    def handle(self, *args, **options):
+        log_sources = LogSource.objects.filter(source_type=LogSource.SourceType.SFTP, host_key='').exclude(host='')
+        if options['project'] is not None:
+            log_sources = log_sources.filter(project_id=options['project'])
+        failed = 0
+        for log_source in log_sources.select_related('project'):
+            try:
+                server_key = fetch_host_key(log_source)
+            except (paramiko.SSHException, OSError) as e:
+                self.stdout.write(self.style.WARNING(f'Could not connect to {log_source.host} ({log_source.project}): {e}'))
+                failed += 1
+                continue
+            self.stdout.write(f'{log_source.project}: {server_key.fingerprint} {host_key_line(log_source, server_key)}')
+            if not options['dry_run']:
+                pin_host_key(log_source, host_key_line(log_source, server_key))
+
+        if failed:
+            raise CommandError(f'{failed} host keys could not be fetched.')
+        if options['dry_run']:
+            self.stdout.write('Dry run: no host key was stored.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Host keys stored; check their fingerprints with the server administrators.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from projects.sync.compression import DecompressionError
+from projects.sync.engine import SyncError, run_project_sync
+from projects.sync.loaders import LoadError
+from projects.sync.parsers import ParseError
+from projects.sync.sources import SourceError
+
+
+class Command(BaseCommand):
+    help = 'Streams the log files of a project from its log source to the destination'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('project_id', type=int, help='ID of the project to sync')
+    
+    def handle(self, *args, **options):
+        try:
+            result = run_project_sync(options['project_id'])
+        except (SyncError, SourceError, LoadError, DecompressionError, ParseError) as e:
+            raise CommandError(str(e))
+        
+        message = (
+            f'Synced {result.files} files ({result.bytes} bytes, {result.rows} rows) '
+            f'for project {options["project_id"]}, '
+            f'{result.skipped} already up to date, {result.duplicates} duplicates.'
+        )
+        if result.failed:
+            self.stdout.write(self.style.WARNING(f'{message} {result.failed} files failed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,47 @@
+import logging
+import signal
+
+from django.core.management.base import BaseCommand
+from projects.sync.scheduler import Scheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs due project syncs in a pool of worker processes until interrupted'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Maximum number of concurrent syncs')
+        parser.add_argument('--max-per-source', type=int, help='Maximum concurrent syncs per SFTP host or S3 bucket')
+        parser.add_argument('--interval', type=int, help='Seconds between checks for due schedules')
+        parser.add_argument('--once', action='store_true', help='Dispatch due schedules once, wait for them and exit')
+    
+    def handle(self, *args, **options):
+        if options['verbosity'] > 0:
+            logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+        
+        scheduler = Scheduler(
+            max_workers=options['workers'],
+            max_jobs_per_source=options['max_per_source'],
+            poll_interval=options['interval'],
+        )
+        
+        def stop(signum, frame):
+            self.stdout.write(self.style.WARNING('Stopping scheduler, waiting for running syncs...'))
+            scheduler.stop()
+        
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        
+        with scheduler:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Scheduler started with {scheduler.max_workers} workers, '
+                    f'{scheduler.max_jobs_per_source} per source.'
+                )
+            )
+            if options['once']:
+                scheduler.tick()
+                scheduler.wait()
+            else:
+                scheduler.run_forever()
+        
+        self.stdout.write(self.style.SUCCESS('Scheduler stopped.'))
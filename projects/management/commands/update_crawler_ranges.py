@@ -0,0 +1,43 @@
+import json
+import os
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from projects.sync.crawlers import CRAWLERS
+
+
+class Command(BaseCommand):
+    help = 'Downloads the IP ranges search engine crawlers publish, used to verify crawler hits without DNS lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=30, help='Seconds to wait for each download')
+
+    def handle(self, *args, **options):
+        root = Path(settings.SYNC_CRAWLER_RANGES_DIR)
+        root.mkdir(parents=True, exist_ok=True)
+        failed = 0
+        for crawler in CRAWLERS:
+            if not crawler.ranges_urls:
+                continue
+            prefixes = []
+            try:
+                # Addresses outside the saved ranges are rejected, so they
+                # are only replaced once every list has been downloaded.
+                for url in crawler.ranges_urls:
+                    with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                        prefixes.extend(json.load(response)['prefixes'])
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.stdout.write(self.style.WARNING(f'Could not download the ranges of {crawler.name}: {e}'))
+                failed += 1
+                continue
+            target = root / f'{crawler.name}.json'
+            partial = target.with_name(f'.{target.name}.tmp')
+            partial.write_text(json.dumps({'prefixes': prefixes}))
+            os.replace(partial, target)
+            self.stdout.write(f'Saved {len(prefixes)} ranges of {crawler.name}.')
+
+        if failed:
+            raise CommandError(f'{failed} crawlers could not be updated.')
+        self.stdout.write(self.style.SUCCESS(f'Crawler ranges saved to {root}.'))
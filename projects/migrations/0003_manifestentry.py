@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_logsource_access_key_id_logsource_bucket_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ManifestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Remote file path or S3 object key', max_length=1024, verbose_name='Path')),
+                ('size', models.BigIntegerField(help_text='Remote file size in bytes', verbose_name='Size')),
+                ('mtime', models.BigIntegerField(blank=True, help_text='Remote modification time as a Unix timestamp', null=True, verbose_name='Modified Time')),
+                ('etag', models.CharField(blank=True, max_length=255, verbose_name='ETag')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Synced At')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='manifest_entries', to='projects.project', verbose_name='Project')),
+            ],
+            options={
+                'verbose_name': 'Manifest Entry',
+                'verbose_name_plural': 'Manifest Entries',
+                'ordering': ['project', 'path'],
+                'unique_together': {('project', 'path')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:35
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from projects.cron import CronExpression
+
+
+def compute_next_run_at(apps, schema_editor):
+    Schedule = apps.get_model('projects', 'Schedule')
+    now = timezone.now()
+    for schedule in Schedule.objects.filter(is_active=True):
+        try:
+            schedule.next_run_at = CronExpression(schedule.cron_expression).next_after(now)
+        except ValueError:
+            continue
+        schedule.save(update_fields=['next_run_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_manifestentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='last_run_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Run At'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Precomputed from the cron expression on save and after each run', null=True, verbose_name='Next Run At'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['is_active', 'next_run_at'], name='schedule_due_idx'),
+        ),
+        migrations.RunPython(compute_next_run_at, migrations.RunPython.noop),
+    ]
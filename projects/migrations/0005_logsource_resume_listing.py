@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_schedule_next_run_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logsource',
+            name='resume_listing',
+            field=models.BooleanField(default=False, help_text='Only list S3 keys sorting after the last synced key (for date-ordered keys)', verbose_name='Resume Listing'),
+        ),
+    ]
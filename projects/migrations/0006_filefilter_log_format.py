@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_logsource_resume_listing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filefilter',
+            name='log_format',
+            field=models.CharField(choices=[('combined', 'Apache/Nginx Combined'), ('cloudfront', 'Amazon CloudFront'), ('alb', 'AWS Application Load Balancer')], default='combined', help_text='Format of the lines in the matched log files', max_length=20, verbose_name='Log Format'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_filefilter_log_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Destination',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('destination_type', models.CharField(choices=[('local', 'Local Parquet Directory'), ('bigquery', 'Google BigQuery')], default='local', max_length=10, verbose_name='Destination Type')),
+                ('table_name', models.CharField(default='access_logs', help_text='Table the log rows are loaded into', max_length=255, verbose_name='Table Name')),
+                ('directory', models.CharField(blank=True, help_text='Directory holding the table files (defaults to the sync destination directory)', max_length=500, verbose_name='Directory')),
+                ('gcp_project', models.CharField(blank=True, help_text='Google Cloud project ID', max_length=255, verbose_name='GCP Project')),
+                ('dataset', models.CharField(blank=True, help_text='BigQuery dataset', max_length=255, verbose_name='Dataset')),
+                ('location', models.CharField(blank=True, help_text='BigQuery location (e.g., EU, US)', max_length=50, verbose_name='Location')),
+                ('credentials_json', models.TextField(blank=True, help_text='Service account key; leave empty to use the default credentials', verbose_name='Credentials JSON')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='destination', to='projects.project', verbose_name='Project')),
+            ],
+            options={
+                'verbose_name': 'Destination',
+                'verbose_name_plural': 'Destinations',
+            },
+        ),
+    ]
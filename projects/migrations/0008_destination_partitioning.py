@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_destination'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='clustering_fields',
+            field=models.CharField(blank=True, default='host,status', help_text='Comma-separated columns to cluster the table by (up to 4)', max_length=255, verbose_name='Clustering Fields'),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='partitioning',
+            field=models.CharField(choices=[('none', 'None'), ('day', 'Daily'), ('hour', 'Hourly')], default='day', help_text='Partition the table by the log timestamp', max_length=4, verbose_name='Partitioning'),
+        ),
+    ]
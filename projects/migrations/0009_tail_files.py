@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0008_destination_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logsource',
+            name='tail_files',
+            field=models.BooleanField(default=False, help_text='Only fetch what was appended since the last sync to uncompressed files that grow in place (e.g. a live access.log)', verbose_name='Tail Growing Files'),
+        ),
+        migrations.AddField(
+            model_name='manifestentry',
+            name='offset',
+            field=models.BigIntegerField(default=0, help_text='Bytes of the file already synced, for files that are tailed', verbose_name='Offset'),
+        ),
+        migrations.AddField(
+            model_name='manifestentry',
+            name='tail_digest',
+            field=models.CharField(blank=True, help_text='Digest of the bytes just before the offset, to detect replaced files', max_length=64, verbose_name='Tail Digest'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_tail_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='deduplicate_rows',
+            field=models.BooleanField(default=False, help_text='Drop rows already loaded into the same partition, e.g. from overlapping files', verbose_name='Deduplicate Rows'),
+        ),
+        migrations.AddField(
+            model_name='manifestentry',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='XXH3-128 digest of the file contents, to skip files synced under another name', max_length=32, verbose_name='Content Hash'),
+        ),
+        migrations.AlterField(
+            model_name='manifestentry',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('synced', 'Synced'), ('failed', 'Failed'), ('duplicate', 'Duplicate')], default='pending', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AddIndex(
+            model_name='manifestentry',
+            index=models.Index(fields=['project', 'content_hash'], name='manifest_content_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_content_deduplication'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=10, verbose_name='Status')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('peak_memory', models.BigIntegerField(blank=True, help_text='Peak resident memory in bytes of the process that ran the job', null=True, verbose_name='Peak Memory')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_runs', to='projects.project', verbose_name='Project')),
+            ],
+            options={
+                'verbose_name': 'Job Run',
+                'verbose_name_plural': 'Job Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JobStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('list', 'List'), ('fetch', 'Fetch'), ('decompress', 'Decompress'), ('parse', 'Parse'), ('load', 'Load')], max_length=10, verbose_name='Stage')),
+                ('seconds', models.FloatField(default=0, verbose_name='Seconds')),
+                ('bytes', models.BigIntegerField(default=0, verbose_name='Bytes')),
+                ('rows', models.BigIntegerField(default=0, verbose_name='Rows')),
+                ('files', models.IntegerField(default=0, verbose_name='Files')),
+                ('job_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='projects.jobrun', verbose_name='Job Run')),
+            ],
+            options={
+                'verbose_name': 'Job Stage',
+                'verbose_name_plural': 'Job Stages',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='jobrun',
+            index=models.Index(fields=['project', '-started_at'], name='job_run_history_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobstage',
+            unique_together={('job_run', 'stage')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_job_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='classify_crawlers',
+            field=models.BooleanField(default=False, help_text='Tag hits from search engine crawlers, and verify their addresses with reverse and forward DNS', verbose_name='Classify Crawlers'),
+        ),
+        migrations.AlterField(
+            model_name='jobstage',
+            name='stage',
+            field=models.CharField(choices=[('list', 'List'), ('fetch', 'Fetch'), ('decompress', 'Decompress'), ('parse', 'Parse'), ('enrich', 'Enrich'), ('load', 'Load')], max_length=10, verbose_name='Stage'),
+        ),
+    ]
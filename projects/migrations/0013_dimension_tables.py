@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_crawler_classification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='normalize_dimensions',
+            field=models.BooleanField(default=False, help_text='Store each distinct path and user agent once, in <table>_paths and <table>_user_agents, and load integer ids in the log rows', verbose_name='Dimension Tables'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0013_dimension_tables'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobstage',
+            name='stage',
+            field=models.CharField(choices=[('list', 'List'), ('fetch', 'Fetch'), ('decompress', 'Decompress'), ('parse', 'Parse'), ('enrich', 'Enrich'), ('aggregate', 'Aggregate'), ('load', 'Load')], max_length=10, verbose_name='Stage'),
+        ),
+        migrations.CreateModel(
+            name='Rollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Suffix of the rollup table, e.g. daily_hits for <table>_daily_hits', max_length=64, verbose_name='Name')),
+                ('granularity', models.CharField(choices=[('day', 'Daily'), ('hour', 'Hourly')], default='day', help_text='Count hits per day, or per day and hour', max_length=4, verbose_name='Granularity')),
+                ('group_by', models.CharField(blank=True, default='path,status,crawler', help_text='Comma-separated columns to count hits by', max_length=255, verbose_name='Group By')),
+                ('is_active', models.BooleanField(default=True, help_text='Aggregate the rows of the next syncs into this rollup', verbose_name='Active')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='projects.project', verbose_name='Project')),
+            ],
+            options={
+                'verbose_name': 'Rollup',
+                'verbose_name_plural': 'Rollups',
+                'ordering': ['name'],
+                'unique_together': {('project', 'name')},
+            },
+        ),
+    ]
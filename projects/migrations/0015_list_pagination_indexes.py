@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_list_pagination_indexes'),
+        ('projects', '0014_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name', 'id'], name='project_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['client', 'name', 'id'], name='project_client_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobrun',
+            name='peak_memory',
+            field=models.BigIntegerField(blank=True, help_text='Peak resident memory in bytes of the process while it ran the job (Linux only)', null=True, verbose_name='Peak Memory'),
+        ),
+    ]
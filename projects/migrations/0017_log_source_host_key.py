@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_job_run_peak_memory_help'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logsource',
+            name='host_key',
+            field=models.TextField(blank=True, help_text='SSH host keys of the server, one known_hosts line each (e.g. from ssh-keyscan)', verbose_name='Host Key'),
+        ),
+    ]
@@ -1,6 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .cron import CronExpression
+from .sync.matchers import get_matcher
+
 
 class Project(models.Model):
     """Project model linked to a client."""
@@ -39,6 +44,11 @@ class Project(models.Model):
         verbose_name_plural = _('Projects')
         ordering = ['name']
         unique_together = ['name', 'client']
+        # Keyset pagination of the project list, overall and by client
+        indexes = [
+            models.Index(fields=['name', 'id'], name='project_name_id_idx'),
+            models.Index(fields=['client', 'name', 'id'], name='project_client_name_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.client.name})"
@@ -100,6 +110,12 @@ class LogSource(models.Model):
         blank=True
     )
     
+    host_key = models.TextField(
+        verbose_name=_('Host Key'),
+        help_text=_('SSH host keys of the server, one known_hosts line each (e.g. from ssh-keyscan)'),
+        blank=True
+    )
+    
     # S3 fields
     bucket_name = models.CharField(
         max_length=255,
@@ -136,6 +152,18 @@ class LogSource(models.Model):
         blank=True
     )
     
+    resume_listing = models.BooleanField(
+        default=False,
+        verbose_name=_('Resume Listing'),
+        help_text=_('Only list S3 keys sorting after the last synced key (for date-ordered keys)')
+    )
+    
+    tail_files = models.BooleanField(
+        default=False,
+        verbose_name=_('Tail Growing Files'),
+        help_text=_('Only fetch what was appended since the last sync to uncompressed files that grow in place (e.g. a live access.log)')
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -149,9 +177,17 @@ class LogSource(models.Model):
         else:
             return f"S3 - {self.bucket_name}/{self.prefix}"
     
+    @property
+    def concurrency_key(self):
+        """Identify the remote endpoint, to cap concurrent jobs against it."""
+        if self.source_type == self.SourceType.SFTP:
+            return f"sftp://{self.host.lower()}:{self.port or 22}"
+        return f"s3://{self.bucket_name}"
+    
     def clean(self):
         """Validate that required fields are filled based on source type."""
         from django.core.exceptions import ValidationError
+        from .sync.pool import parse_host_keys
         
         if self.source_type == self.SourceType.SFTP:
             if not self.host:
@@ -160,6 +196,10 @@ class LogSource(models.Model):
                 raise ValidationError({'username': 'Username is required for SFTP sources.'})
             if not self.directory:
                 raise ValidationError({'directory': 'Directory is required for SFTP sources.'})
+            try:
+                parse_host_keys(self.host_key)
+            except ValueError as e:
+                raise ValidationError({'host_key': str(e)})
         elif self.source_type == self.SourceType.S3:
             if not self.bucket_name:
                 raise ValidationError({'bucket_name': 'Bucket name is required for S3 sources.'})
@@ -171,6 +211,318 @@ class LogSource(models.Model):
                 raise ValidationError({'secret_access_key': 'Secret Access Key is required for S3 sources.'})
 
 
+class Destination(models.Model):
+    """Warehouse table that parsed log rows are loaded into."""
+    
+    class DestinationType(models.TextChoices):
+        LOCAL = 'local', _('Local Parquet Directory')
+        BIGQUERY = 'bigquery', _('Google BigQuery')
+    
+    class Partitioning(models.TextChoices):
+        NONE = 'none', _('None')
+        DAY = 'day', _('Daily')
+        HOUR = 'hour', _('Hourly')
+    
+    # Columns the destination table can be clustered by, in priority order
+    CLUSTERING_COLUMNS = ['host', 'status', 'method', 'path', 'remote_addr']
+    MAX_CLUSTERING_COLUMNS = 4
+    
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='destination',
+        verbose_name=_('Project')
+    )
+    
+    destination_type = models.CharField(
+        max_length=10,
+        choices=DestinationType.choices,
+        default=DestinationType.LOCAL,
+        verbose_name=_('Destination Type')
+    )
+    
+    table_name = models.CharField(
+        max_length=255,
+        default='access_logs',
+        verbose_name=_('Table Name'),
+        help_text=_('Table the log rows are loaded into')
+    )
+    
+    partitioning = models.CharField(
+        max_length=4,
+        choices=Partitioning.choices,
+        default=Partitioning.DAY,
+        verbose_name=_('Partitioning'),
+        help_text=_('Partition the table by the log timestamp')
+    )
+    
+    clustering_fields = models.CharField(
+        max_length=255,
+        blank=True,
+        default='host,status',
+        verbose_name=_('Clustering Fields'),
+        help_text=_('Comma-separated columns to cluster the table by (up to 4)')
+    )
+    
+    deduplicate_rows = models.BooleanField(
+        default=False,
+        verbose_name=_('Deduplicate Rows'),
+        help_text=_('Drop rows already loaded into the same partition, e.g. from overlapping files')
+    )
+    
+    classify_crawlers = models.BooleanField(
+        default=False,
+        verbose_name=_('Classify Crawlers'),
+        help_text=_('Tag hits from search engine crawlers, and verify their addresses with reverse and forward DNS')
+    )
+    
+    normalize_dimensions = models.BooleanField(
+        default=False,
+        verbose_name=_('Dimension Tables'),
+        help_text=_('Store each distinct path and user agent once, in <table>_paths and <table>_user_agents, and load integer ids in the log rows')
+    )
+    
+    # Local fields
+    directory = models.CharField(
+        max_length=500,
+        verbose_name=_('Directory'),
+        help_text=_('Directory holding the table files (defaults to the sync destination directory)'),
+        blank=True
+    )
+    
+    # BigQuery fields
+    gcp_project = models.CharField(
+        max_length=255,
+        verbose_name=_('GCP Project'),
+        help_text=_('Google Cloud project ID'),
+        blank=True
+    )
+    
+    dataset = models.CharField(
+        max_length=255,
+        verbose_name=_('Dataset'),
+        help_text=_('BigQuery dataset'),
+        blank=True
+    )
+    
+    location = models.CharField(
+        max_length=50,
+        verbose_name=_('Location'),
+        help_text=_('BigQuery location (e.g., EU, US)'),
+        blank=True
+    )
+    
+    credentials_json = models.TextField(
+        verbose_name=_('Credentials JSON'),
+        help_text=_('Service account key; leave empty to use the default credentials'),
+        blank=True
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Destination')
+        verbose_name_plural = _('Destinations')
+    
+    def __str__(self):
+        if self.destination_type == self.DestinationType.BIGQUERY:
+            return f"BigQuery - {self.gcp_project}.{self.dataset}.{self.table_name}"
+        return f"Local - {self.table_name}"
+    
+    @property
+    def clustering_columns(self):
+        """The clustering fields as a list of column names."""
+        return [column.strip() for column in self.clustering_fields.split(',') if column.strip()]
+    
+    def clean(self):
+        """Validate that required fields are filled based on destination type."""
+        from django.core.exceptions import ValidationError
+        
+        columns = self.clustering_columns
+        unknown = [column for column in columns if column not in self.CLUSTERING_COLUMNS]
+        if unknown:
+            raise ValidationError({'clustering_fields': f'Unknown clustering columns: {", ".join(unknown)}.'})
+        if len(columns) > self.MAX_CLUSTERING_COLUMNS:
+            raise ValidationError({'clustering_fields': f'At most {self.MAX_CLUSTERING_COLUMNS} clustering columns are allowed.'})
+        
+        if self.destination_type == self.DestinationType.BIGQUERY:
+            if not self.gcp_project:
+                raise ValidationError({'gcp_project': 'GCP project is required for BigQuery destinations.'})
+            if not self.dataset:
+                raise ValidationError({'dataset': 'Dataset is required for BigQuery destinations.'})
+
+
+class Rollup(models.Model):
+    """Hit counts aggregated from a project's log rows while they are loaded.
+    
+    Each rollup is loaded into the companion table ``<table>_<name>`` of
+    the project's destination, as hits and bytes per period and group.
+    """
+    
+    class Granularity(models.TextChoices):
+        DAY = 'day', _('Daily')
+        HOUR = 'hour', _('Hourly')
+    
+    # Columns hits can be counted by
+    GROUP_BY_COLUMNS = ['host', 'path', 'status', 'method', 'crawler', 'crawler_verified']
+    
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        verbose_name=_('Project')
+    )
+    
+    name = models.CharField(
+        max_length=64,
+        verbose_name=_('Name'),
+        help_text=_('Suffix of the rollup table, e.g. daily_hits for <table>_daily_hits')
+    )
+    
+    granularity = models.CharField(
+        max_length=4,
+        choices=Granularity.choices,
+        default=Granularity.DAY,
+        verbose_name=_('Granularity'),
+        help_text=_('Count hits per day, or per day and hour')
+    )
+    
+    group_by = models.CharField(
+        max_length=255,
+        blank=True,
+        default='path,status,crawler',
+        verbose_name=_('Group By'),
+        help_text=_('Comma-separated columns to count hits by')
+    )
+    
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name=_('Active'),
+        help_text=_('Aggregate the rows of the next syncs into this rollup')
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Rollup')
+        verbose_name_plural = _('Rollups')
+        ordering = ['name']
+        unique_together = ['project', 'name']
+    
+    def __str__(self):
+        return f"{self.project.name} - {self.name}"
+    
+    @property
+    def group_by_columns(self):
+        """The group by fields as a list of column names."""
+        return [column.strip() for column in self.group_by.split(',') if column.strip()]
+    
+    def clean(self):
+        """Validate the group by columns."""
+        from django.core.exceptions import ValidationError
+        
+        unknown = [column for column in self.group_by_columns if column not in self.GROUP_BY_COLUMNS]
+        if unknown:
+            raise ValidationError({'group_by': f'Unknown group by columns: {", ".join(unknown)}.'})
+
+
+class ManifestEntry(models.Model):
+    """Record of a remote file seen by the sync engine for a project."""
+    
+    class SyncStatus(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        SYNCED = 'synced', _('Synced')
+        FAILED = 'failed', _('Failed')
+        DUPLICATE = 'duplicate', _('Duplicate')
+    
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='manifest_entries',
+        verbose_name=_('Project')
+    )
+    
+    path = models.CharField(
+        max_length=1024,
+        verbose_name=_('Path'),
+        help_text=_('Remote file path or S3 object key')
+    )
+    
+    size = models.BigIntegerField(
+        verbose_name=_('Size'),
+        help_text=_('Remote file size in bytes')
+    )
+    
+    mtime = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('Modified Time'),
+        help_text=_('Remote modification time as a Unix timestamp')
+    )
+    
+    etag = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_('ETag')
+    )
+    
+    offset = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Offset'),
+        help_text=_('Bytes of the file already synced, for files that are tailed')
+    )
+    
+    tail_digest = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name=_('Tail Digest'),
+        help_text=_('Digest of the bytes just before the offset, to detect replaced files')
+    )
+    
+    content_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        verbose_name=_('Content Hash'),
+        help_text=_('XXH3-128 digest of the file contents, to skip files synced under another name')
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=SyncStatus.choices,
+        default=SyncStatus.PENDING,
+        verbose_name=_('Status')
+    )
+    
+    error = models.TextField(
+        blank=True,
+        verbose_name=_('Error')
+    )
+    
+    synced_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Synced At')
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Manifest Entry')
+        verbose_name_plural = _('Manifest Entries')
+        ordering = ['project', 'path']
+        # Also serves as the (project, path) index used to diff remote listings
+        unique_together = ['project', 'path']
+        indexes = [
+            models.Index(fields=['project', 'content_hash'], name='manifest_content_hash_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.path} ({self.get_status_display()})"
+
+
 class FileFilter(models.Model):
     """File filtering configuration for log files."""
     
@@ -179,6 +531,11 @@ class FileFilter(models.Model):
         CONTAINS = 'contains', _('Contains')
         REGEX = 'regex', _('Regex Match')
     
+    class LogFormat(models.TextChoices):
+        COMBINED = 'combined', _('Apache/Nginx Combined')
+        CLOUDFRONT = 'cloudfront', _('Amazon CloudFront')
+        ALB = 'alb', _('AWS Application Load Balancer')
+    
     project = models.OneToOneField(
         Project,
         on_delete=models.CASCADE,
@@ -199,6 +556,14 @@ class FileFilter(models.Model):
         help_text=_('Pattern to match files (filename pattern, regex, etc.)')
     )
     
+    log_format = models.CharField(
+        max_length=20,
+        choices=LogFormat.choices,
+        default=LogFormat.COMBINED,
+        verbose_name=_('Log Format'),
+        help_text=_('Format of the lines in the matched log files')
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -208,6 +573,25 @@ class FileFilter(models.Model):
     
     def __str__(self):
         return f"{self.get_filter_type_display()}: {self.pattern}"
+    
+    def get_matcher(self):
+        """Return the compiled matcher for this filter."""
+        return get_matcher(self)
+    
+    def matches(self, path):
+        """Return whether the file name of ``path`` matches this filter."""
+        return self.get_matcher().matches(path)
+
+
+class ScheduleQuerySet(models.QuerySet):
+    """QuerySet for schedules."""
+    
+    def due(self, now=None):
+        """Active schedules whose next run time has been reached."""
+        return self.filter(
+            is_active=True,
+            next_run_at__lte=now or timezone.now()
+        ).order_by('next_run_at')
 
 
 class Schedule(models.Model):
@@ -232,12 +616,245 @@ class Schedule(models.Model):
         help_text=_('Whether this schedule is active')
     )
     
+    next_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_('Next Run At'),
+        help_text=_('Precomputed from the cron expression on save and after each run')
+    )
+    
+    last_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_('Last Run At')
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ScheduleQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Schedule')
         verbose_name_plural = _('Schedules')
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_at'], name='schedule_due_idx'),
+        ]
     
     def __str__(self):
         return f"{self.project.name} - {self.cron_expression}"
+    
+    def clean(self):
+        """Validate that the cron expression can be parsed."""
+        from django.core.exceptions import ValidationError
+        
+        try:
+            CronExpression(self.cron_expression)
+        except ValueError as e:
+            raise ValidationError({'cron_expression': f'Invalid cron expression: {e}'})
+    
+    def save(self, *args, **kwargs):
+        """Recompute the next run time whenever the schedule is saved."""
+        self.next_run_at = self.get_next_run() if self.is_active else None
+        super().save(*args, **kwargs)
+    
+    def get_next_run(self, after=None):
+        """Return the next time the cron expression fires after ``after`` (default: now)."""
+        return CronExpression(self.cron_expression).next_after(after or timezone.now())
+    
+    def mark_run(self, started_at=None):
+        """Record a run and move ``next_run_at`` to the following occurrence.
+        
+        The cron expression is read again first, as it may have been edited
+        while the job ran; the row stays locked until it is saved.
+        """
+        with transaction.atomic():
+            try:
+                self.refresh_from_db(
+                    fields=['cron_expression', 'is_active'],
+                    from_queryset=Schedule.objects.select_for_update(),
+                )
+            except Schedule.DoesNotExist:
+                return
+            self.last_run_at = started_at or timezone.now()
+            self.save(update_fields=['last_run_at', 'next_run_at', 'updated_at'])
+
+
+class JobRunQuerySet(models.QuerySet):
+    """QuerySet for job runs."""
+    
+    def with_stage_metrics(self):
+        """Annotate runs with ``<stage>_<metric>`` totals of every stage.
+        
+        The run history of a project is then fetched with one aggregated
+        query rather than one query per run.
+        """
+        annotations = {}
+        for stage in JobStage.Stage.values:
+            for metric in JobStage.METRICS:
+                annotations[f'{stage}_{metric}'] = Sum(f'stages__{metric}', filter=Q(stages__stage=stage))
+        return self.annotate(**annotations)
+
+
+class JobRun(models.Model):
+    """One run of the sync engine for a project."""
+    
+    class Status(models.TextChoices):
+        RUNNING = 'running', _('Running')
+        SUCCEEDED = 'succeeded', _('Succeeded')
+        FAILED = 'failed', _('Failed')
+    
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='job_runs',
+        verbose_name=_('Project')
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.RUNNING,
+        verbose_name=_('Status')
+    )
+    
+    started_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Started At')
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Finished At')
+    )
+    
+    peak_memory = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('Peak Memory'),
+        help_text=_('Peak resident memory in bytes of the process while it ran the job (Linux only)')
+    )
+    
+    error = models.TextField(
+        blank=True,
+        verbose_name=_('Error')
+    )
+    
+    objects = JobRunQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = _('Job Run')
+        verbose_name_plural = _('Job Runs')
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['project', '-started_at'], name='job_run_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.project.name} - {self.started_at:%Y-%m-%d %H:%M} ({self.get_status_display()})"
+    
+    @property
+    def duration(self):
+        """Wall time of the run in seconds, or None while it is running."""
+        if self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+    
+    @property
+    def stage_metrics(self):
+        """Per-stage metrics of a run fetched with ``with_stage_metrics``."""
+        return [
+            JobStage(
+                stage=stage,
+                **{metric: getattr(self, f'{stage}_{metric}') or 0 for metric in JobStage.METRICS}
+            )
+            for stage in JobStage.Stage.values
+        ]
+    
+    def finish(self, metrics, error=None):
+        """Record the end of the run and the ``JobMetrics`` it collected."""
+        self.finished_at = timezone.now()
+        self.status = self.Status.FAILED if error is not None else self.Status.SUCCEEDED
+        self.error = str(error) if error is not None else ''
+        self.peak_memory = metrics.peak_memory
+        self.save(update_fields=['finished_at', 'status', 'error', 'peak_memory'])
+        JobStage.objects.bulk_create([
+            JobStage(
+                job_run=self,
+                stage=stage,
+                **{metric: getattr(stage_metrics, metric) for metric in JobStage.METRICS}
+            )
+            for stage, stage_metrics in metrics.stages.items()
+        ])
+
+
+class JobStage(models.Model):
+    """Time and volume of one stage of a ``JobRun``.
+    
+    Stages stream into each other, so ``seconds`` is the time spent in the
+    stage itself, excluding the stages it pulls data from.
+    """
+    
+    class Stage(models.TextChoices):
+        LIST = 'list', _('List')
+        FETCH = 'fetch', _('Fetch')
+        DECOMPRESS = 'decompress', _('Decompress')
+        PARSE = 'parse', _('Parse')
+        ENRICH = 'enrich', _('Enrich')
+        AGGREGATE = 'aggregate', _('Aggregate')
+        LOAD = 'load', _('Load')
+    
+    # Metrics recorded for every stage.
+    METRICS = ['seconds', 'bytes', 'rows', 'files']
+    
+    job_run = models.ForeignKey(
+        JobRun,
+        on_delete=models.CASCADE,
+        related_name='stages',
+        verbose_name=_('Job Run')
+    )
+    
+    stage = models.CharField(
+        max_length=10,
+        choices=Stage.choices,
+        verbose_name=_('Stage')
+    )
+    
+    seconds = models.FloatField(
+        default=0,
+        verbose_name=_('Seconds')
+    )
+    
+    bytes = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Bytes')
+    )
+    
+    rows = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Rows')
+    )
+    
+    files = models.IntegerField(
+        default=0,
+        verbose_name=_('Files')
+    )
+    
+    class Meta:
+        verbose_name = _('Job Stage')
+        verbose_name_plural = _('Job Stages')
+        unique_together = ['job_run', 'stage']
+    
+    def __str__(self):
+        return f"{self.get_stage_display()}: {self.seconds:.1f}s"
+    
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else None
+    
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else None
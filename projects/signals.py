@@ -0,0 +1,43 @@
+"""Invalidate the cached project configuration as the objects it shows change."""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from clients.models import Client
+from . import cache
+from .models import Destination, FileFilter, LogSource, Project, Rollup, Schedule
+
+
+def project_changed(sender, instance, **kwargs):
+    cache.invalidate_projects([instance.pk])
+    cache.invalidate_dashboards()
+
+
+def configuration_changed(sender, instance, update_fields=None, **kwargs):
+    # Recording a run only updates run times, which no cached page shows.
+    if update_fields is not None and set(update_fields) <= {'last_run_at', 'next_run_at', 'updated_at'}:
+        return
+    cache.invalidate_projects([instance.project_id])
+
+
+def client_changed(sender, instance, **kwargs):
+    # Deleting a client deletes its projects, which invalidate themselves.
+    if kwargs.get('signal') is post_save:
+        cache.invalidate_projects(instance.projects.values_list('pk', flat=True))
+    cache.invalidate_dashboards()
+
+
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logging in only updates ``last_login``, which no cached page shows.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    cache.invalidate_projects(instance.created_projects.values_list('pk', flat=True))
+
+
+post_save.connect(project_changed, sender=Project, dispatch_uid='config-cache-project-save')
+post_delete.connect(project_changed, sender=Project, dispatch_uid='config-cache-project-delete')
+for model in [LogSource, FileFilter, Schedule, Destination, Rollup]:
+    post_save.connect(configuration_changed, sender=model, dispatch_uid=f'config-cache-{model.__name__}-save')
+    post_delete.connect(configuration_changed, sender=model, dispatch_uid=f'config-cache-{model.__name__}-delete')
+post_save.connect(client_changed, sender=Client, dispatch_uid='config-cache-client-save')
+post_delete.connect(client_changed, sender=Client, dispatch_uid='config-cache-client-delete')
+post_save.connect(user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='config-cache-user-save')
@@ -0,0 +1 @@
+"""Log synchronization engine: sources, sinks and the sync pipeline."""
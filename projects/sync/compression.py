@@ -0,0 +1,290 @@
+"""Streaming decompression of rotated (.gz, .bz2, .zst) log files."""
+import bz2
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import zstandard
+from django.conf import settings
+
+
+# Compressed bytes gathered before the members found in them are decoded in parallel.
+PARALLEL_WINDOW = 4 * 1024 * 1024
+
+# Decompressed bytes returned at most by one call to a decoder, so that highly
+# compressed data (or a decompression bomb) is streamed instead of inflated at once.
+OUTPUT_CHUNK = 8 * 1024 * 1024
+
+# zstd decoders take no output limit, so their input is fed in slices this
+# large; zstd inflates at most about 32000:1, so each gives at most 32 MiB.
+ZSTD_INPUT_SLICE = 1024
+
+# Decompressed bytes of a piece of a window decoded ahead on the thread pool;
+# the rest of the piece is decoded when it is reached.
+PIECE_OUTPUT_LIMIT = 64 * 1024 * 1024
+
+# Errors raised by the decoders on corrupt or truncated data.
+DECODER_ERRORS = (OSError, EOFError, zlib.error, zstandard.ZstdError)
+
+
+class DecompressionError(Exception):
+    """Raised when a compressed log file is corrupt or truncated."""
+
+
+class Codec:
+    """A compression format made of independently decodable members.
+
+    gzip members, bzip2 streams and zstd frames can all be concatenated,
+    and tools such as ``pigz --independent``, ``bgzip``, ``pbzip2`` or
+    ``zstd --rsyncable`` produce many of them. ``member_start`` matches
+    the magic bytes every member starts with.
+    """
+
+    def __init__(self, name, extensions, member_start, new_decoder):
+        self.name = name
+        self.extensions = extensions
+        self.member_start = re.compile(member_start)
+        self.new_decoder = new_decoder
+
+    def __repr__(self):
+        return f'<Codec {self.name}>'
+
+    def sniff(self, head):
+        return self.member_start.match(head) is not None
+
+
+class Decoder:
+    """Decoder of one member, whose ``decompress`` yields at most ``OUTPUT_CHUNK`` bytes at a time."""
+
+    def __init__(self, decoder):
+        self._decoder = decoder
+
+    @property
+    def eof(self):
+        return self._decoder.eof
+
+    @property
+    def unused_data(self):
+        return self._decoder.unused_data
+
+    def decompress(self, data):
+        raise NotImplementedError
+
+
+class ZlibDecoder(Decoder):
+    def __init__(self):
+        super().__init__(zlib.decompressobj(16 + zlib.MAX_WBITS))
+
+    def decompress(self, data):
+        while True:
+            output = self._decoder.decompress(data, OUTPUT_CHUNK)
+            if output:
+                yield output
+            data = self._decoder.unconsumed_tail
+            # A full output may leave more output pending without any input left.
+            if self._decoder.eof or (not data and len(output) < OUTPUT_CHUNK):
+                return
+
+
+class BZ2Decoder(Decoder):
+    def __init__(self):
+        super().__init__(bz2.BZ2Decompressor())
+
+    def decompress(self, data):
+        output = self._decoder.decompress(data, OUTPUT_CHUNK)
+        while True:
+            if output:
+                yield output
+            if self._decoder.eof or self._decoder.needs_input:
+                return
+            output = self._decoder.decompress(b'', OUTPUT_CHUNK)
+
+
+class ZstdDecoder(Decoder):
+    def __init__(self):
+        super().__init__(zstandard.ZstdDecompressor().decompressobj())
+        self._unused = b''
+
+    @property
+    def unused_data(self):
+        return self._decoder.unused_data + self._unused
+
+    def decompress(self, data):
+        data = memoryview(data)
+        outputs = []
+        size = 0
+        for start in range(0, len(data), ZSTD_INPUT_SLICE):
+            output = self._decoder.decompress(data[start:start + ZSTD_INPUT_SLICE])
+            outputs.append(output)
+            size += len(output)
+            if self._decoder.eof:
+                self._unused = bytes(data[start + ZSTD_INPUT_SLICE:])
+                break
+            if size >= OUTPUT_CHUNK:
+                yield b''.join(outputs)
+                outputs = []
+                size = 0
+        if size:
+            yield b''.join(outputs)
+
+
+CODECS = [
+    Codec('gzip', ('.gz', '.gzip'), rb'\x1f\x8b\x08', ZlibDecoder),
+    Codec('bzip2', ('.bz2',), rb'BZh[1-9]1AY&SY', BZ2Decoder),
+    Codec('zstd', ('.zst', '.zstd'), rb'\x28\xb5\x2f\xfd', ZstdDecoder),
+]
+
+
+def detect_codec(path, head=b''):
+    """Return the ``Codec`` of a file from its extension or first bytes, or None."""
+    lowered = path.lower()
+    for codec in CODECS:
+        if lowered.endswith(codec.extensions):
+            return codec
+    for codec in CODECS:
+        if codec.sniff(head):
+            return codec
+    return None
+
+
+def decompress_chunks(path, chunks, threads=None):
+    """Yield the decompressed contents of ``path`` from its raw byte chunks.
+
+    Uncompressed files are passed through unchanged. Nothing is written to
+    disk and at most one parallel window of input is buffered.
+    """
+    chunks = iter(chunks)
+    head = b''
+    for chunk in chunks:
+        if chunk:
+            head = chunk
+            break
+    if not head:
+        return
+    codec = detect_codec(path, head)
+    if codec is None:
+        yield head
+        yield from chunks
+        return
+    threads = threads or settings.SYNC_DECOMPRESS_THREADS
+    yield from StreamDecoder(codec, threads).decode(_prepend(head, chunks))
+
+
+class StreamDecoder:
+    """Decode a stream of concatenated members, in parallel where possible.
+
+    Input is gathered into windows of ``PARALLEL_WINDOW`` bytes and split
+    at every position where a member could start. The pieces are decoded
+    speculatively on a thread pool (zlib, bz2 and zstd release the GIL)
+    and the results are then checked in order: a piece is only used if it
+    starts where the previous member ended. A false split point inside a
+    member is simply decoded through by the decoder of that member.
+
+    Files written as a single member (plain ``gzip``, ``zstd``) have no
+    split points, and are decoded sequentially as they stream in.
+    """
+
+    def __init__(self, codec, threads=1):
+        self.codec = codec
+        self.threads = threads
+
+    def decode(self, chunks):
+        if self.threads <= 1:
+            yield from self._decode_sequential(chunks)
+            return
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            buffer = b''
+            decoder = None
+            for chunk in chunks:
+                buffer += chunk
+                if len(buffer) < PARALLEL_WINDOW:
+                    continue
+                starts = self._member_starts(buffer)
+                if len(starts) < 2:
+                    # One large member: stream the rest of the file through one decoder.
+                    yield from self._decode_sequential(_prepend(buffer, chunks), decoder)
+                    return
+                decoder = yield from self._decode_window(executor, buffer, starts, decoder)
+                buffer = buffer[starts[-1]:]
+            if buffer:
+                yield from self._decode_sequential([buffer], decoder)
+
+    def _member_starts(self, buffer):
+        """Return the offsets where a member may start; 0 is always included."""
+        return [0] + [match.start() for match in self.codec.member_start.finditer(buffer, 1)]
+
+    def _decode_window(self, executor, buffer, starts, decoder=None):
+        """Yield the decoded pieces of ``buffer`` between ``starts``.
+
+        ``decoder`` carries a member left open by the previous window. The
+        returned decoder is still inside a member at the last start, or
+        None if that start is a member boundary.
+        """
+        view = memoryview(buffer)
+        spans = list(zip(starts, starts[1:]))
+        speculative = executor.map(lambda span: self._decode_piece(view[span[0]:span[1]]), spans)
+        for (start, end), (outputs, rest, piece_decoder, error) in zip(spans, speculative):
+            try:
+                if decoder is None:
+                    # ``start`` is a known member boundary, so the speculative result is valid.
+                    if error is not None:
+                        raise error
+                    yield from outputs
+                    yield from rest
+                    decoder = piece_decoder
+                else:
+                    # The previous split point was a false match inside a member.
+                    yield from decoder.decompress(view[start:end])
+            except DECODER_ERRORS as e:
+                raise DecompressionError(f'Corrupt {self.codec.name} data: {e}') from e
+            unused = decoder.unused_data if decoder.eof else b''
+            if decoder.eof:
+                decoder = None
+            if unused:
+                # Every member starts with the magic bytes, so a member
+                # ending inside a piece is followed by garbage.
+                raise DecompressionError(f'Trailing garbage after {self.codec.name} data')
+        return decoder
+
+    def _decode_piece(self, piece):
+        """Decode up to ``PIECE_OUTPUT_LIMIT`` bytes of ``piece``; the rest is left in a generator."""
+        decoder = self.codec.new_decoder()
+        rest = decoder.decompress(piece)
+        outputs = []
+        size = 0
+        try:
+            for output in rest:
+                outputs.append(output)
+                size += len(output)
+                if size >= PIECE_OUTPUT_LIMIT:
+                    break
+        except DECODER_ERRORS as e:
+            return None, None, None, e
+        return outputs, rest, decoder, None
+
+    def _decode_sequential(self, chunks, decoder=None):
+        decoder = decoder or self.codec.new_decoder()
+        in_member = True
+        try:
+            for chunk in chunks:
+                while chunk:
+                    if not in_member:
+                        if not chunk.strip(b'\0'):
+                            # Zero padding after the last member, as left by some tape/block tools.
+                            break
+                        decoder = self.codec.new_decoder()
+                        in_member = True
+                    yield from decoder.decompress(chunk)
+                    chunk = b''
+                    if decoder.eof:
+                        chunk = decoder.unused_data
+                        in_member = False
+        except DECODER_ERRORS as e:
+            raise DecompressionError(f'Corrupt {self.codec.name} data: {e}') from e
+        if in_member and not decoder.eof:
+            raise DecompressionError(f'Truncated {self.codec.name} data')
+
+
+def _prepend(first, chunks):
+    yield first
+    yield from chunks
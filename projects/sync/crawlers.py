@@ -0,0 +1,306 @@
+"""Classification of search engine crawler hits, verified with reverse and forward DNS."""
+import ipaddress
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from django.conf import settings
+
+from .parsers import SCHEMA
+
+
+logger = logging.getLogger(__name__)
+
+
+# ``user_agent`` is the regex of the tokens a crawler announces itself
+# with, ``domains`` the suffixes of its reverse DNS names and
+# ``ranges_urls`` where it publishes the IP ranges of all of these user
+# agents, if it does.
+Crawler = namedtuple('Crawler', ['name', 'user_agent', 'domains', 'ranges_urls'])
+
+CRAWLERS = [
+    Crawler(
+        'googlebot',
+        r'Googlebot|Google-InspectionTool|GoogleOther|AdsBot-Google|Mediapartners-Google|Storebot-Google',
+        ('.googlebot.com', '.google.com', '.googleusercontent.com'),
+        (
+            'https://developers.google.com/static/search/apis/ipranges/googlebot.json',
+            # AdsBot-Google and Mediapartners-Google crawl from other ranges.
+            'https://developers.google.com/static/search/apis/ipranges/special-crawlers.json',
+        ),
+    ),
+    Crawler(
+        'bingbot',
+        r'bingbot|BingPreview|msnbot|adidxbot',
+        ('.search.msn.com',),
+        ('https://www.bing.com/toolbox/bingbot.json',),
+    ),
+    Crawler(
+        'applebot',
+        r'Applebot',
+        ('.applebot.apple.com',),
+        ('https://search.developer.apple.com/applebot.json',),
+    ),
+    Crawler(
+        'yandexbot',
+        r'YandexBot|YandexImages|YandexMobileBot',
+        ('.yandex.ru', '.yandex.net', '.yandex.com'),
+        (),
+    ),
+    Crawler(
+        'baiduspider',
+        r'Baiduspider',
+        ('.baidu.com', '.baidu.jp'),
+        (),
+    ),
+]
+
+# Parsed columns followed by the crawler a hit claims to come from, and
+# whether its address belongs to that crawler (null when unknown).
+ENRICHED_SCHEMA = SCHEMA.append(pa.field('crawler', pa.string())).append(pa.field('crawler_verified', pa.bool_()))
+CRAWLER_COLUMNS = ENRICHED_SCHEMA.names[len(SCHEMA):]
+
+# ``h_errno`` of a reverse lookup that may succeed if retried.
+_HOST_TRY_AGAIN = 2
+
+
+class DNSLookupError(Exception):
+    """Raised when a DNS lookup fails temporarily, so its answer is unknown."""
+
+
+class UserAgentClassifier:
+    """Tell which crawler, if any, a user agent claims to be.
+
+    The crawlers' patterns are compiled into a single regex, and each
+    distinct user agent is only matched once: batches are dictionary
+    encoded, and results are kept in an LRU cache across batches.
+    """
+
+    def __init__(self, crawlers=CRAWLERS):
+        self._pattern = re.compile('|'.join(f'(?P<{crawler.name}>{crawler.user_agent})' for crawler in crawlers), re.I)
+        self.classify = lru_cache(maxsize=65536)(self._classify)
+
+    def _classify(self, user_agent):
+        match = self._pattern.search(user_agent)
+        return match.lastgroup if match else None
+
+    def classify_array(self, user_agents):
+        """Return the crawler name claimed by every user agent of an Arrow array, or null."""
+        encoded = pc.dictionary_encode(user_agents)
+        names = pa.array([self.classify(user_agent) for user_agent in encoded.dictionary.to_pylist()], pa.string())
+        return names.take(encoded.indices)
+
+
+class VerificationCache:
+    """LRU cache of verification results, each expiring ``ttl`` seconds after it was stored.
+
+    Shared by every sync of the process, so a crawler address is looked up
+    once a day rather than once per hit.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or settings.SYNC_CRAWLER_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else settings.SYNC_CRAWLER_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached result for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PublishedRanges:
+    """IP ranges published by crawlers, read from ``<root>/<crawler>.json``.
+
+    Files use the format Google and Bing publish them in
+    (``{"prefixes": [{"ipv4Prefix": ...}, {"ipv6Prefix": ...}]}``) and are
+    downloaded by the ``update_crawler_ranges`` command. They hold every
+    range a crawler publishes, so addresses outside them are not the
+    crawler's.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.SYNC_CRAWLER_RANGES_DIR)
+        self._networks = {}
+
+    def contains(self, crawler_name, ip):
+        """Return whether ``ip`` is in the ranges of a crawler, or None if none are known."""
+        networks = self._networks.get(crawler_name)
+        if networks is None:
+            networks = self._networks[crawler_name] = self._load(crawler_name)
+        if not networks:
+            return None
+        return any(ip in network for network in networks)
+
+    def _load(self, crawler_name):
+        try:
+            with open(self.root / f'{crawler_name}.json') as fh:
+                prefixes = json.load(fh).get('prefixes', [])
+            return [
+                ipaddress.ip_network(prefix.get('ipv4Prefix') or prefix.get('ipv6Prefix'), strict=False)
+                for prefix in prefixes
+            ]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning('Ignoring the published ranges of %s: %s', crawler_name, e)
+            return []
+
+
+class SocketResolver:
+    """DNS lookups through the system resolver."""
+
+    def reverse(self, address):
+        """Return the host name of ``address``, or None if it has none."""
+        try:
+            return socket.gethostbyaddr(address)[0]
+        except socket.herror as e:
+            if e.errno == _HOST_TRY_AGAIN:
+                raise DNSLookupError(f'Reverse lookup of {address} failed: {e}') from e
+            return None
+        except OSError as e:
+            raise DNSLookupError(f'Reverse lookup of {address} failed: {e}') from e
+
+    def forward(self, hostname):
+        """Return the addresses ``hostname`` resolves to."""
+        try:
+            infos = socket.getaddrinfo(hostname, None, proto=socket.IPPROTO_TCP)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, 'EAI_NODATA', socket.EAI_NONAME)):
+                return []
+            raise DNSLookupError(f'Lookup of {hostname} failed: {e}') from e
+        return [info[4][0] for info in infos]
+
+
+class CrawlerVerifier:
+    """Check that a hit claiming to be a crawler comes from that crawler.
+
+    An address is verified if it lies in the crawler's published ranges,
+    and rejected if it does not, without any DNS lookup. For crawlers
+    whose ranges are not available, an address is verified if its reverse
+    DNS name is in one of the crawler's domains and that name resolves
+    back to the address, as the search engines recommend. Results are cached by crawler and address in ``cache``;
+    lookups that fail temporarily give an unknown (None) result, which is
+    not cached. Uncached addresses are looked up on ``threads`` threads.
+    """
+
+    def __init__(self, resolver=None, cache=None, ranges=None, threads=None, crawlers=CRAWLERS):
+        self.resolver = resolver or SocketResolver()
+        self.cache = cache if cache is not None else verification_cache
+        self.ranges = ranges or PublishedRanges()
+        self.threads = threads or settings.SYNC_CRAWLER_DNS_THREADS
+        self.crawlers = {crawler.name: crawler for crawler in crawlers}
+        self.lookups = 0
+
+    def verify_many(self, claims):
+        """Return the verification result of every ``(crawler_name, address)`` claim."""
+        results = [self.cache.get(claim) for claim in claims]
+        missing = [index for index, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+        self.lookups += len(missing)
+        with ThreadPoolExecutor(max_workers=min(self.threads, len(missing))) as executor:
+            verified = executor.map(lambda index: self.verify(*claims[index]), missing)
+            for index, result in zip(missing, verified):
+                results[index] = result
+        return results
+
+    def verify(self, crawler_name, address):
+        """Verify one claim without looking at the cache; store a definite result in it."""
+        result = self._verify(self.crawlers[crawler_name], address)
+        if result is not None:
+            self.cache.set((crawler_name, address), result)
+        return result
+
+    def _verify(self, crawler, address):
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        if not ip.is_global:
+            return False
+        in_ranges = self.ranges.contains(crawler.name, ip)
+        if in_ranges is not None:
+            return in_ranges
+        try:
+            hostname = self.resolver.reverse(address)
+            if hostname is None or not hostname.lower().rstrip('.').endswith(crawler.domains):
+                return False
+            return any(_same_address(ip, resolved) for resolved in self.resolver.forward(hostname))
+        except DNSLookupError as e:
+            logger.debug('Could not verify %s as %s: %s', address, crawler.name, e)
+            return None
+
+
+class CrawlerEnricher:
+    """Add the ``crawler`` and ``crawler_verified`` columns of ``ENRICHED_SCHEMA`` to parsed batches.
+
+    Only the distinct ``(crawler, address)`` pairs of a batch are verified.
+    """
+
+    def __init__(self, classifier=None, verifier=None):
+        self.classifier = classifier or user_agent_classifier
+        self.verifier = verifier or CrawlerVerifier()
+
+    def enrich_batches(self, batches):
+        for batch in batches:
+            yield self.enrich(batch)
+
+    def enrich(self, batch):
+        crawler = self.classifier.classify_array(batch.column('user_agent'))
+        claims = pc.binary_join_element_wise(crawler, batch.column('remote_addr'), ' ')
+        unique_claims = pc.unique(claims).drop_null()
+        if len(unique_claims):
+            results = self.verifier.verify_many([tuple(claim.split(' ', 1)) for claim in unique_claims.to_pylist()])
+            verified = pa.array(results, pa.bool_()).take(pc.index_in(claims, value_set=unique_claims))
+        else:
+            verified = pa.nulls(batch.num_rows, pa.bool_())
+        return pa.RecordBatch.from_arrays([*batch.columns, crawler, verified], schema=ENRICHED_SCHEMA)
+
+
+def _same_address(ip, resolved):
+    try:
+        return ipaddress.ip_address(resolved.partition('%')[0]) == ip
+    except ValueError:
+        return False
+
+
+def crawler_enricher(destination):
+    """Return the ``CrawlerEnricher`` of a ``Destination``, or None if disabled."""
+    if not destination.classify_crawlers:
+        return None
+    return CrawlerEnricher()
+
+
+user_agent_classifier = UserAgentClassifier()
+verification_cache = VerificationCache()
@@ -0,0 +1,385 @@
+"""Content hashing of synced files and Bloom-filter deduplication of rows."""
+import logging
+import math
+import os
+import struct
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import xxhash
+from django.conf import settings
+
+from .crawlers import CRAWLER_COLUMNS
+
+
+logger = logging.getLogger(__name__)
+
+
+# Separator between the fields of a row when hashing it.
+FIELD_SEPARATOR = '\x1f'
+
+# Partition key of the row filters by ``Destination.partitioning``.
+PARTITION_KEYS = {
+    'day': '%Y-%m-%d',
+    'hour': '%Y-%m-%d-%H',
+}
+
+# Row filters grow by adding a filter this many times larger than the
+# last one, with this many times its error rate.
+GROWTH = 2
+TIGHTENING = 0.5
+
+# Bits are set one at a time unless one in this many bits of a filter is
+# set at once, which is faster with a single pass over the whole filter.
+BULK_SET_RATIO = 32
+
+_HEADER = struct.Struct('<4sQIQ')
+_MAGIC = b'BLM1'
+_CHAIN_HEADER = struct.Struct('<I')
+_CHAIN_MAGIC = b'BLS1'
+
+
+class ContentHasher:
+    """Iterate over byte chunks while hashing and counting them."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.bytes = 0
+        self._hash = xxhash.xxh3_128()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.bytes += len(chunk)
+            self._hash.update(chunk)
+            yield chunk
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def content_hash(data):
+    """Return the hash ``ContentHasher`` gives for ``data``, a bytes-like object."""
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 128-bit hashes.
+
+    The ``k`` bit positions are derived from the two 64-bit halves of the
+    hash (Kirsch-Mitzenmacher double hashing), so every row is hashed once.
+    Hashes are given as two ``uint64`` arrays, and whole arrays are tested
+    and added with Arrow compute functions.
+    """
+
+    def __init__(self, size, hash_count, bits=None, count=0):
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hash_count)
+
+    @classmethod
+    def read(cls, fh):
+        magic, size, hash_count, count = _HEADER.unpack(fh.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f'{fh.name} is not a Bloom filter file')
+        return cls(size, hash_count, bytearray(fh.read((size + 7) // 8)), count)
+
+    def write(self, fh):
+        fh.write(_HEADER.pack(_MAGIC, self.size, self.hash_count, self.count))
+        fh.write(self.bits)
+
+    def contains(self, low, high):
+        """Return whether each hash was (probably) added already, as a boolean array."""
+        bits = self._array()
+        present = None
+        for positions in self._positions(low, high):
+            found = bits.take(positions)
+            present = found if present is None else pc.and_(present, found)
+        return present
+
+    def add(self, low, high, undo=None):
+        """Add the hashes of the ``low`` and ``high`` arrays.
+
+        The positions of the bits set are appended to ``undo``.
+        """
+        if not len(low):
+            return
+        positions = pa.concat_arrays(list(self._positions(low, high)))
+        bits = self._array()
+        unset = positions.filter(pc.invert(bits.take(positions)))
+        if len(unset) * BULK_SET_RATIO > self.size:
+            self._set(pc.or_(bits, self._mask(unset)))
+        else:
+            for position in unset.to_pylist():
+                self.bits[position >> 3] |= 1 << (position & 7)
+        if undo is not None:
+            undo.append((self, unset))
+        self.count += len(low)
+
+    def clear(self, positions):
+        """Clear the bits at ``positions``, as appended to ``undo`` by ``add``."""
+        if len(positions) * BULK_SET_RATIO > self.size:
+            self._set(pc.and_not(self._array(), self._mask(positions)))
+        else:
+            for position in positions.to_pylist():
+                self.bits[position >> 3] &= ~(1 << (position & 7)) & 0xFF
+
+    def _array(self):
+        # The bits as a boolean array: Arrow also stores the first bit of a byte in its lowest bit.
+        return pa.Array.from_buffers(pa.bool_(), self.size, [None, pa.py_buffer(self.bits)])
+
+    def _set(self, array):
+        self.bits[:] = memoryview(array.buffers()[1])[:len(self.bits)]
+
+    def _mask(self, positions):
+        # Scattering any values leaves exactly the bits at ``positions`` valid.
+        scattered = pc.scatter(pc.is_valid(positions), pc.cast(positions, pa.int64()), max_index=self.size - 1)
+        if scattered.null_count == 0:
+            return pc.is_valid(scattered)
+        return pa.Array.from_buffers(pa.bool_(), self.size, [None, scattered.buffers()[0]], offset=scattered.offset)
+
+    def _positions(self, low, high):
+        # (low + i * high) % size, computed without overflowing 64 bits.
+        size = pa.scalar(self.size, pa.uint64())
+        start = pc.modulo(low, size)
+        step = pc.modulo(high, size)
+        for i in range(self.hash_count):
+            yield pc.modulo(pc.add(start, pc.multiply(step, pa.scalar(i, pa.uint64()))), size)
+
+
+class ScalableBloomFilter:
+    """Bloom filters chained to hold any number of rows at a bounded error rate.
+
+    Rows are added to the last filter of the chain. Once it holds as many
+    rows as it was sized for, a filter ``GROWTH`` times larger is added,
+    at ``TIGHTENING`` times the error rate of the previous one. The error
+    rates of all the filters add up to less than ``error_rate``, however
+    many rows are added (Almeida et al., "Scalable Bloom Filters").
+    """
+
+    def __init__(self, capacity, error_rate, filters=None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.filters = filters or [self._new_filter(0)]
+
+    @classmethod
+    def load(cls, path, capacity, error_rate):
+        with open(path, 'rb') as fh:
+            magic = fh.read(len(_CHAIN_MAGIC))
+            if magic == _MAGIC:
+                # A single filter, as saved before filters were chained.
+                fh.seek(0)
+                return cls(capacity, error_rate, [BloomFilter.read(fh)])
+            if magic != _CHAIN_MAGIC:
+                raise ValueError(f'{path} is not a Bloom filter file')
+            count, = _CHAIN_HEADER.unpack(fh.read(_CHAIN_HEADER.size))
+            return cls(capacity, error_rate, [BloomFilter.read(fh) for _ in range(count)])
+
+    def save(self, path):
+        partial = Path(f'{path}.tmp')
+        with open(partial, 'wb') as fh:
+            fh.write(_CHAIN_MAGIC)
+            fh.write(_CHAIN_HEADER.pack(len(self.filters)))
+            for bloom in self.filters:
+                bloom.write(fh)
+        os.replace(partial, path)
+
+    @property
+    def count(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, hashes, undo=None):
+        """Add the 128-bit ``hashes`` not seen before.
+
+        Return the indices of the hashes added: those (probably) not added
+        before, and the first of hashes repeated within ``hashes``.
+        """
+        low, high = _halves(hashes)
+        present = self.filters[0].contains(low, high)
+        for bloom in self.filters[1:]:
+            present = pc.or_(present, bloom.contains(low, high))
+        candidates = pc.indices_nonzero(pc.invert(present))
+        new = candidates.filter(_first_occurrences(hashes.take(candidates)))
+        added = 0
+        while added < len(new):
+            bloom = self.filters[-1]
+            room = self._capacity(len(self.filters) - 1) - bloom.count
+            if room <= 0:
+                logger.info('Adding a Bloom filter for %s more rows', self._capacity(len(self.filters)))
+                self.filters.append(self._new_filter(len(self.filters)))
+                continue
+            indices = new.slice(added, room)
+            bloom.add(low.take(indices), high.take(indices), undo)
+            added += len(indices)
+        return new
+
+    @property
+    def overfilled(self):
+        """Whether the last filter holds more rows than it was sized for, as unchained filters could."""
+        return self.filters[-1].count > self._capacity(len(self.filters) - 1)
+
+    def _capacity(self, level):
+        return self.capacity * GROWTH ** level
+
+    def _new_filter(self, level):
+        error_rate = self.error_rate * (1 - TIGHTENING) * TIGHTENING ** level
+        return BloomFilter.for_capacity(self._capacity(level), error_rate)
+
+
+class RowDeduplicator:
+    """Drop rows already loaded into the same partition of a table.
+
+    One ``ScalableBloomFilter`` per partition is kept under ``root``,
+    starting with room for ``capacity`` rows and growing as rows are added,
+    so that the rate of unique rows wrongly dropped stays below
+    ``error_rate``. Only the filters of the partitions written by the last
+    load are kept in memory.
+
+    Changes are transactional: ``begin_file``/``rollback_file`` undo the
+    rows of a file that could not be staged, ``commit`` saves the filters
+    after a successful load and ``reset`` forgets everything since the
+    last commit.
+    """
+
+    def __init__(self, root, partitioning, capacity, error_rate):
+        self.root = Path(root)
+        self.partition_key = PARTITION_KEYS.get(partitioning)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rows_dropped = 0
+        self._filters = {}
+        self._dirty = set()
+        self._undo = []
+        self._counts = {}
+
+    def filter_batches(self, batches):
+        for batch in batches:
+            batch = self.filter(batch)
+            if batch.num_rows:
+                yield batch
+
+    def filter(self, batch):
+        """Return the rows of ``batch`` not seen before, remembering them."""
+        if not batch.num_rows:
+            return batch
+        hashes = _row_hashes(batch)
+        if self.partition_key:
+            partitions = pc.fill_null(pc.strftime(batch.column('timestamp'), format=self.partition_key), 'none')
+            kept = []
+            for partition in pc.unique(partitions).to_pylist():
+                rows = pc.indices_nonzero(pc.equal(partitions, partition))
+                new = self._filter_for(partition).add(hashes.take(rows), self._undo)
+                kept.append(rows.take(new))
+            keep = pa.concat_arrays(kept)
+            keep = keep.take(pc.sort_indices(keep))
+        else:
+            keep = self._filter_for('all').add(hashes, self._undo)
+        self.rows_dropped += batch.num_rows - len(keep)
+        return batch.take(keep)
+
+    def begin_file(self):
+        self._undo = []
+        self._counts = {}
+
+    def rollback_file(self):
+        """Forget the rows seen since ``begin_file``."""
+        for bloom, positions in reversed(self._undo):
+            bloom.clear(positions)
+        for chain, counts in self._counts.values():
+            del chain.filters[len(counts):]
+            for bloom, count in zip(chain.filters, counts):
+                bloom.count = count
+        self.begin_file()
+
+    def commit(self):
+        """Save the filters changed since the last commit, and close the others."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for partition in self._dirty:
+            self._filters[partition].save(self._path(partition))
+        self._filters = {partition: self._filters[partition] for partition in self._dirty}
+        self._dirty.clear()
+        self.begin_file()
+
+    def reset(self):
+        """Drop the in-memory changes since the last commit."""
+        for partition in self._dirty:
+            self._filters.pop(partition, None)
+        self._dirty.clear()
+        self.begin_file()
+
+    def _filter_for(self, partition):
+        chain = self._filters.get(partition)
+        if chain is None:
+            path = self._path(partition)
+            if path.exists():
+                chain = ScalableBloomFilter.load(path, self.capacity, self.error_rate)
+                if chain.overfilled:
+                    logger.warning(
+                        'Bloom filter of partition %s holds more rows than it was sized for: '
+                        'more unique rows than SYNC_ROW_DEDUP_ERROR_RATE are dropped from it',
+                        partition,
+                    )
+            else:
+                chain = ScalableBloomFilter(self.capacity, self.error_rate)
+            self._filters[partition] = chain
+        if partition not in self._counts:
+            self._counts[partition] = (chain, [bloom.count for bloom in chain.filters])
+            self._dirty.add(partition)
+        return chain
+
+    def _path(self, partition):
+        return self.root / f'{partition}.bloom'
+
+
+def _first_occurrences(values):
+    """Return a boolean array, true for the first occurrence of each value of ``values``."""
+    if not len(values):
+        return pa.array([], pa.bool_())
+    # Codes are numbered in order of first occurrence: a value occurs first where its code exceeds all before it.
+    codes = pc.cast(pc.dictionary_encode(values).indices, pa.int64())
+    before = pa.concat_arrays([pa.array([-1], pa.int64()), pc.cumulative_max(codes).slice(0, len(codes) - 1)])
+    return pc.greater(codes, before)
+
+
+def _halves(hashes):
+    """Return the low and high 64 bits of a ``fixed_size_binary(16)`` array of hashes."""
+    halves = pa.Array.from_buffers(pa.uint64(), 2 * len(hashes), [None, hashes.buffers()[1]], offset=2 * hashes.offset)
+    pairs = pa.FixedSizeListArray.from_arrays(halves, 2)
+    return pc.list_element(pairs, 0), pc.list_element(pairs, 1)
+
+
+def _row_hashes(batch):
+    """Return a 128-bit hash of every row of ``batch``, as a ``fixed_size_binary(16)`` array.
+
+    The crawler columns are left out, so a verification result that
+    changed cannot make a repeated row look new.
+    """
+    columns = [
+        pc.cast(column, pa.string()) if column.type != pa.string() else column
+        for name, column in zip(batch.schema.names, batch.columns)
+        if name not in CRAWLER_COLUMNS
+    ]
+    joined = pc.binary_join_element_wise(
+        *columns, FIELD_SEPARATOR, null_handling='replace', null_replacement='\x00'
+    )
+    digests = b''.join(map(xxhash.xxh3_128_digest, pc.cast(joined, pa.binary()).to_pylist()))
+    digests = pa.Array.from_buffers(pa.binary(16), len(joined), [None, pa.py_buffer(digests)])
+    # Digests are big-endian: reversed, they read as the low then the high 64 bits.
+    return pc.cast(pc.binary_reverse(pc.cast(digests, pa.binary())), pa.binary(16))
+
+
+def row_deduplicator(destination):
+    """Return the ``RowDeduplicator`` of a ``Destination``, or None if disabled."""
+    if not destination.deduplicate_rows:
+        return None
+    root = Path(settings.SYNC_DESTINATION_DIR) / str(destination.project_id) / 'dedup' / destination.table_name
+    return RowDeduplicator(
+        root, destination.partitioning, settings.SYNC_ROW_DEDUP_CAPACITY, settings.SYNC_ROW_DEDUP_ERROR_RATE,
+    )
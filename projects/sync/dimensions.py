@@ -0,0 +1,200 @@
+"""Dimension tables interning repeated string columns into integer keys."""
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+
+
+# Dimensions of a destination: table suffix and the column it interns.
+# The fact rows hold ``<column>_id`` instead of the column, and the
+# dimension table ``<table>_<suffix>`` maps ``<column>_id`` to ``<column>``.
+DIMENSIONS = [
+    ('paths', 'path'),
+    ('user_agents', 'user_agent'),
+]
+
+# Distinct values of a batch looked up in the store with one query.
+LOOKUP_CHUNK_SIZE = 500
+
+# Seconds to wait for another run writing to the same store.
+STORE_TIMEOUT = 300
+
+
+def fact_schema(schema):
+    """Return ``schema`` with every dimension column replaced by its integer key."""
+    for _, column in DIMENSIONS:
+        index = schema.get_field_index(column)
+        if index >= 0:
+            schema = schema.set(index, pa.field(f'{column}_id', pa.int64()))
+    return schema
+
+
+class Dimension:
+    """Values of one column with stable integer ids, starting at 1.
+
+    Ids are kept in an indexed SQLite store at ``path``, shared by every run
+    loading the same destination table, and only the distinct values of
+    each batch are looked up in it, so memory does not grow with the number
+    of values. New values are assigned ids in a write transaction, so runs
+    of different projects loading the same table never assign the same id.
+
+    Values stay pending in the store until they are appended to the
+    destination's dimension table, ahead of the facts that use them: each
+    load appends every pending value, including those interned by other
+    runs, or by runs that were interrupted, and then marks them as loaded.
+
+    Ids are never reused: new values interned for files that fail are
+    still loaded with the next load, so their ids stay reserved.
+    """
+
+    def __init__(self, suffix, column, path, legacy_root=None):
+        self.suffix = suffix
+        self.column = column
+        self.key = f'{column}_id'
+        self.schema = pa.schema([(self.key, pa.int64()), (column, pa.string())])
+        self._lock = threading.Lock()
+        self._db = _open_store(Path(path), self.key, column, legacy_root)
+
+    def intern(self, values):
+        """Return the ids of an Arrow string array, assigning ids to new values."""
+        encoded = pc.dictionary_encode(values)
+        distinct = encoded.dictionary.to_pylist()
+        with self._lock:
+            ids = self._lookup(distinct)
+            if len(ids) < len(distinct):
+                with _write_transaction(self._db):
+                    # Another run may have interned some of them since.
+                    new = [value for value in distinct if value not in ids]
+                    ids.update(self._lookup(new))
+                    new = [value for value in new if value not in ids]
+                    next_id = self._db.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM ids').fetchone()[0]
+                    assigned = dict(zip(new, range(next_id, next_id + len(new))))
+                    self._db.executemany('INSERT INTO ids (value, id) VALUES (?, ?)', assigned.items())
+                ids.update(assigned)
+        return pa.array([ids[value] for value in distinct], pa.int64()).take(encoded.indices)
+
+    def _lookup(self, values):
+        ids = {}
+        for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+            chunk = values[start:start + LOOKUP_CHUNK_SIZE]
+            query = f'SELECT value, id FROM ids WHERE value IN ({", ".join("?" * len(chunk))})'
+            ids.update(self._db.execute(query, chunk))
+        return ids
+
+    def load(self, loader):
+        """Append the pending values to the dimension table; raises ``LoadError`` on failure.
+
+        The store is not locked while the values are appended, so runs
+        loading at the same time may both append some values: readers of
+        the dimension table should ignore repeated ids, which always map
+        to the same value.
+        """
+        from .loaders import LoadError  # loaders imports this module
+
+        try:
+            with self._lock:
+                pending = self._db.execute('SELECT id, value FROM ids WHERE NOT loaded ORDER BY id').fetchall()
+            if not pending:
+                return
+            keys, values = zip(*pending)
+            table = pa.table([pa.array(keys, pa.int64()), pa.array(values, pa.string())], schema=self.schema)
+            loader.load_companion(self.suffix, table)
+            with self._lock, _write_transaction(self._db):
+                # Values interned since were assigned greater ids and stay pending.
+                self._db.execute('UPDATE ids SET loaded = 1 WHERE NOT loaded AND id <= ?', (keys[-1],))
+        except sqlite3.Error as e:
+            raise LoadError(f'Could not update the {self.suffix} dimension store: {e}') from e
+
+    def close(self):
+        self._db.close()
+
+
+class DimensionSet:
+    """The ``DIMENSIONS`` of a destination table, interned on the parse thread."""
+
+    def __init__(self, root, legacy_root=None):
+        self.dimensions = [
+            Dimension(suffix, column, Path(root) / f'{suffix}.sqlite3', legacy_root and Path(legacy_root) / suffix)
+            for suffix, column in DIMENSIONS
+        ]
+
+    def intern_batches(self, batches):
+        for batch in batches:
+            yield self.intern(batch)
+
+    def intern(self, batch):
+        """Replace the dimension columns of ``batch`` by their ids."""
+        for dimension in self.dimensions:
+            index = batch.schema.get_field_index(dimension.column)
+            batch = batch.set_column(index, dimension.key, dimension.intern(batch.column(index)))
+        return batch
+
+    def load(self, loader):
+        """Load the pending values of every dimension; raises ``LoadError`` on failure."""
+        for dimension in self.dimensions:
+            dimension.load(loader)
+
+    def close(self):
+        for dimension in self.dimensions:
+            dimension.close()
+
+
+def _open_store(path, key, column, legacy_root):
+    """Open the SQLite store of a dimension at ``path``, creating it if needed.
+
+    A new store starts with the ids of ``legacy_root``, where dimensions
+    were kept as Parquet segments per project, so that they are not reused.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(path, timeout=STORE_TIMEOUT, isolation_level=None, check_same_thread=False)
+    try:
+        db.execute('PRAGMA journal_mode = WAL')
+        with _write_transaction(db):
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS ids '
+                '(id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE, loaded BOOLEAN NOT NULL DEFAULT 0)'
+            )
+            if legacy_root is not None and not db.execute('SELECT 1 FROM ids LIMIT 1').fetchone():
+                for segment in sorted(legacy_root.glob('segment-*.parquet')):
+                    for batch in pq.ParquetFile(segment).iter_batches(columns=[key, column]):
+                        db.executemany(
+                            'INSERT OR IGNORE INTO ids (id, value, loaded) VALUES (?, ?, 1)',
+                            zip(batch.column(key).to_pylist(), batch.column(column).to_pylist()),
+                        )
+    except BaseException:
+        db.close()
+        raise
+    return db
+
+
+@contextmanager
+def _write_transaction(db):
+    """Run the block in a transaction holding the store's write lock."""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
+
+
+def dimension_set(loader):
+    """Return the ``DimensionSet`` of a loader's destination table, or None if disabled.
+
+    Dimensions are kept per destination table rather than per project, as
+    the ids in a dimension table must be unique whichever project loads it.
+    """
+    destination = loader.destination
+    if not destination.normalize_dimensions:
+        return None
+    digest = hashlib.sha256(loader.qualified_name.encode()).hexdigest()[:16]
+    root = Path(settings.SYNC_DESTINATION_DIR) / 'dimensions' / f'{destination.table_name}-{digest}'
+    legacy_root = Path(settings.SYNC_DESTINATION_DIR) / str(destination.project_id) / 'dimensions' / destination.table_name
+    return DimensionSet(root, legacy_root)
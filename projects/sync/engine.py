@@ -0,0 +1,517 @@
+"""Sync engine moving a project's log files from its source to a destination."""
+import logging
+import sqlite3
+from collections import Counter, namedtuple
+from itertools import batched
+
+import pyarrow as pa
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import FileFilter, JobRun, Project
+from .compression import DecompressionError, decompress_chunks, detect_codec
+from .crawlers import crawler_enricher
+from .dedup import ContentHasher, content_hash, row_deduplicator
+from .dimensions import dimension_set
+from .listing_cache import fresh_listing
+from .loaders import LoadError, open_loader
+from .manifest import Manifest
+from .metrics import JobMetrics
+from .parsers import ParseError, get_parser
+from .pipeline import FileTask, ThreadedStage, split_files
+from .rollups import rollup_set
+from .sinks import LocalDirectorySink
+from .sources import SourceError, open_source
+from .spool import Spool
+from .tailing import MAX_HELD_BACK_BYTES, TailReader
+
+
+logger = logging.getLogger(__name__)
+
+
+# Number of listed files handed to the file filter at once.
+LISTING_BATCH_SIZE = 10000
+
+# Leading bytes of a spooled file used to detect its compression.
+CODEC_SNIFF_BYTES = 64
+
+# Errors failing a single file, which is retried on the next run while
+# the other files are still synced: unreadable, corrupt or malformed data,
+# and dimension stores that cannot be written to.
+FILE_ERRORS = (SourceError, DecompressionError, ParseError, pa.ArrowException, sqlite3.Error)
+
+
+SyncResult = namedtuple('SyncResult', ['files', 'bytes', 'rows', 'skipped', 'failed', 'duplicates'])
+
+# A parsed file waiting for the next load. ``original`` is the path of an
+# earlier file with the same ``content_hash``, for files that are duplicates.
+_StagedFile = namedtuple('_StagedFile', ['remote_file', 'checkpoint', 'content_hash', 'original'])
+
+
+class SyncError(Exception):
+    """Raised when a project cannot be synced."""
+
+
+class SyncEngine:
+    """Move the files matched by a project's filter out of its log source.
+
+    Projects with a ``Destination`` have their files decompressed, parsed
+    and bulk loaded into the destination table. Projects without one have
+    their raw files mirrored into a sink.
+
+    Files are hashed while they stream in, and a file whose contents were
+    already synced under another path is recorded as a duplicate instead
+    of being loaded or mirrored again. Tailed files are not hashed, as
+    their contents keep changing.
+    """
+
+    def __init__(self, project, sink=None, loader=None, metrics=None):
+        self.project = project
+        self.sink = sink or LocalDirectorySink()
+        self.loader = loader
+        self.metrics = metrics or JobMetrics()
+
+    def run(self):
+        log_source = getattr(self.project, 'log_source', None)
+        if log_source is None:
+            raise SyncError(f'Project "{self.project.name}" has no log source configured.')
+        file_filter = getattr(self.project, 'file_filter', None)
+        destination = getattr(self.project, 'destination', None)
+
+        manifest = Manifest(self.project)
+        start_after = manifest.resume_after() if log_source.resume_listing else None
+        with open_source(log_source) as source:
+            listing = fresh_listing(source, start_after=start_after)
+            remote_files = self.metrics.count_files('list', self.matching_files(listing, file_filter))
+            if self.loader is None and destination is None:
+                return self._mirror(source, remote_files, manifest, log_source.tail_files)
+            log_format = file_filter.log_format if file_filter else FileFilter.LogFormat.COMBINED
+            with self.loader or open_loader(destination) as loader:
+                return self._load(source, remote_files, manifest, loader, log_format, log_source.tail_files)
+
+    @staticmethod
+    def _tail_reader(source, remote_file, manifest, tail_files):
+        """Return a ``TailReader`` if ``remote_file`` can be tailed, else None.
+
+        Only uncompressed files can be read from an offset.
+        """
+        if not tail_files or detect_codec(remote_file.path) is not None:
+            return None
+        return TailReader(source, remote_file.path, *manifest.tail_position(remote_file))
+
+    def _mirror(self, source, remote_files, manifest, tail_files=False):
+        """Copy raw files into the sink, appending to tailed files.
+
+        Files are fetched on a separate thread, so the next file downloads
+        while the previous one is written.
+        """
+        files = failed = duplicates = 0
+        total_bytes = 0
+        listing = Counter()
+        metrics = self.metrics
+        fetch = self._fetch_files(source, remote_files, manifest, tail_files, listing, mirror=True)
+        with ThreadedStage(fetch, settings.SYNC_PIPELINE_DEPTH, 'sync-fetch') as fetched:
+            for task, chunks in split_files(metrics.waiting(fetched)):
+                remote_file = task.remote_file
+                if task.original is not None:
+                    self._record_duplicate(task, manifest)
+                    duplicates += 1
+                    continue
+                logger.info('Syncing %s for project %s', remote_file.path, self.project.pk)
+                try:
+                    with metrics.measure('load'):
+                        written = self.sink.write(self.project, remote_file, chunks, offset=task.offset)
+                except SourceError as e:
+                    logger.warning('Failed to sync %s for project %s: %s', remote_file.path, self.project.pk, e)
+                    manifest.mark_failed(remote_file, e)
+                    failed += 1
+                    continue
+                total_bytes += written
+                metrics['load'].bytes += written
+                if task.reader is None:
+                    original = manifest.duplicate_of(remote_file, task.content_hash)
+                    if original is not None:
+                        logger.info(
+                            'Skipping %s for project %s: duplicate of %s', remote_file.path, self.project.pk, original,
+                        )
+                        self.sink.remove(self.project, remote_file)
+                        manifest.mark_duplicate(remote_file, task.content_hash, original)
+                        duplicates += 1
+                        continue
+                manifest.mark_synced(remote_file, *task.checkpoint, content_hash=task.content_hash)
+                metrics['load'].files += 1
+                files += 1
+        return SyncResult(
+            files=files, bytes=total_bytes, rows=0, skipped=listing['skipped'], failed=failed, duplicates=duplicates,
+        )
+
+    def _load(self, source, remote_files, manifest, loader, log_format, tail_files=False):
+        """Parse files into staging files and bulk load them into the destination.
+
+        Fetching, parsing and loading run as a pipeline of three threads
+        connected by bounded queues: file N+1 downloads while file N is
+        parsed and file N-1 is staged or loaded. Only this thread touches
+        the database and the loader.
+
+        Files are only marked as synced once the load containing their rows
+        has succeeded; files of a failed load are retried on the next run.
+        Tailed files hold back an incomplete last line until the next run.
+        With row deduplication, rows already loaded into the same partition
+        are dropped before staging. With crawler classification, parsed
+        batches are enriched with the crawler they claim to come from, and
+        whether that claim was verified, on the parse thread. With
+        dimension tables, paths and user agents are then replaced by their
+        ids, and new values are loaded into the dimension tables ahead of
+        each load. With rollups, the staged rows are aggregated into hit
+        counts on this thread, which are loaded into the rollup tables
+        after each load.
+
+        Files retried after a failed run are kept in the project's spool
+        until their load has succeeded, so a load failing again does not
+        download them once more on the following runs.
+        """
+        files = failed = rows = duplicates = 0
+        total_bytes = 0
+        staged = []
+        # Content hashes of the files staged for the next load.
+        pending = {}
+        deduplicator = row_deduplicator(loader.destination)
+        enricher = crawler_enricher(loader.destination)
+        dimensions = dimension_set(loader)
+        rollups = rollup_set(loader.destination)
+        spool = Spool.for_project(self.project)
+        listing = Counter()
+        metrics = self.metrics
+        depth = settings.SYNC_PIPELINE_DEPTH
+        fetch = self._fetch_files(source, remote_files, manifest, tail_files, listing, spool=spool)
+        with ThreadedStage(fetch, depth, 'sync-fetch') as fetched, \
+                ThreadedStage(self._parse_files(fetched, log_format, enricher, dimensions), depth, 'sync-parse') as parsed:
+            for task, batches in split_files(metrics.waiting(parsed)):
+                remote_file = task.remote_file
+                if task.original is not None:
+                    self._record_duplicate(task, manifest)
+                    duplicates += 1
+                    continue
+                logger.info('Loading %s for project %s', remote_file.path, self.project.pk)
+                if deduplicator is not None:
+                    deduplicator.begin_file()
+                    batches = deduplicator.filter_batches(batches)
+                if rollups is not None:
+                    rollups.begin_file()
+                    batches = self._aggregate(batches, rollups)
+                try:
+                    with metrics.measure('load'):
+                        file_rows = loader.stage(batches)
+                except FILE_ERRORS as e:
+                    logger.warning('Failed to load %s for project %s: %s', remote_file.path, self.project.pk, e)
+                    if deduplicator is not None:
+                        deduplicator.rollback_file()
+                    if rollups is not None:
+                        rollups.rollback_file()
+                    if spool is not None:
+                        # The copy may be what is corrupt: download it again next time.
+                        spool.discard(remote_file)
+                    manifest.mark_failed(remote_file, e)
+                    failed += 1
+                    continue
+                parser = task.parser
+                if parser.lines_rejected:
+                    logger.warning(
+                        'Skipped %s of %s lines of %s not in %s format',
+                        parser.lines_rejected, parser.lines_seen, remote_file.path, log_format,
+                    )
+                total_bytes += task.bytes
+                content_hash = task.content_hash
+                original = content_hash and (
+                    manifest.duplicate_of(remote_file, content_hash) or pending.get(content_hash)
+                )
+                if original:
+                    logger.info('Skipping %s for project %s: duplicate of %s', remote_file.path, self.project.pk, original)
+                    if file_rows:
+                        loader.unstage_last()
+                    if deduplicator is not None:
+                        deduplicator.rollback_file()
+                    if rollups is not None:
+                        rollups.rollback_file()
+                else:
+                    rows += file_rows
+                    if rollups is not None:
+                        rollups.commit_file()
+                    if content_hash:
+                        pending[content_hash] = remote_file.path
+                staged.append(_StagedFile(remote_file, task.checkpoint, content_hash, original or None))
+                if loader.needs_flush:
+                    loaded, duplicated = self._flush(loader, staged, manifest, deduplicator, spool, dimensions, rollups)
+                    files += loaded
+                    duplicates += duplicated
+                    failed += len(staged) - loaded - duplicated
+                    staged = []
+                    pending = {}
+        loaded, duplicated = self._flush(loader, staged, manifest, deduplicator, spool, dimensions, rollups)
+        files += loaded
+        duplicates += duplicated
+        failed += len(staged) - loaded - duplicated
+        if dimensions is not None:
+            dimensions.close()
+        if deduplicator is not None and deduplicator.rows_dropped:
+            logger.info('Dropped %s duplicate rows for project %s', deduplicator.rows_dropped, self.project.pk)
+        if enricher is not None:
+            lookups = enricher.verifier.lookups
+            logger.info('Verified crawler addresses for project %s with %s DNS lookups', self.project.pk, lookups)
+        return SyncResult(
+            files=files, bytes=total_bytes, rows=rows, skipped=listing['skipped'], failed=failed,
+            duplicates=duplicates,
+        )
+
+    def _fetch_files(self, source, remote_files, manifest, tail_files, listing, mirror=False, spool=None):
+        """Yield ``(task, chunk)`` pairs for the files that need syncing.
+
+        Runs on the fetch thread, which also consumes the listing. Files
+        already up to date are only counted in ``listing``, and files known
+        to be duplicates from their listing are passed on without their
+        contents, as are files read from the ``spool``. Downloaded files
+        that failed on an earlier run are written through to the spool.
+        Fetch errors are stored on the task.
+        """
+        metrics = self.metrics
+        requests = self._fetch_requests(source, remote_files, manifest, tail_files, listing, mirror, spool)
+        for task, chunks in source.iter_files(requests):
+            reader = task.reader
+            if task.original is not None:
+                yield task, None
+                continue
+            if task.spooled is not None:
+                with metrics.measure('fetch'):
+                    task.content_hash = content_hash(task.spooled)
+                task.bytes = len(task.spooled)
+                yield task, None
+                continue
+            try:
+                if reader is None:
+                    if spool is not None and spool.accepts(task.remote_file) and manifest.failed_before(task.remote_file):
+                        chunks = spool.write_through(task.remote_file, chunks)
+                    counter = ContentHasher(metrics.count_bytes('fetch', chunks))
+                else:
+                    with metrics.measure('fetch'):
+                        task.offset = reader.open()
+                    counter = _ByteCounter(metrics.count_bytes('fetch', reader))
+                for chunk in counter:
+                    yield task, chunk
+            except SourceError as e:
+                task.error = e
+            else:
+                metrics['fetch'].files += 1
+                task.bytes = counter.bytes
+                if reader is None:
+                    task.content_hash = counter.hexdigest()
+                elif mirror:
+                    task.checkpoint = reader.checkpoint()
+            yield task, None
+
+    def _fetch_requests(self, source, remote_files, manifest, tail_files, listing, mirror=False, spool=None):
+        """Yield ``(task, remote_file)`` for ``source.iter_files``.
+
+        ``remote_file`` is None for tailed files, which are read from their
+        ``TailReader``, for spooled files, which are read from the spool,
+        and for duplicates, which are not read at all.
+        """
+        for remote_file in remote_files:
+            if manifest.is_current(remote_file):
+                listing['skipped'] += 1
+                continue
+            reader = self._tail_reader(source, remote_file, manifest, tail_files)
+            task = FileTask(remote_file, reader)
+            if reader is None:
+                task.original = manifest.duplicate_by_etag(remote_file)
+                if task.original is None and spool is not None:
+                    task.spooled = spool.open(remote_file)
+                    if task.spooled is not None:
+                        logger.info('Reading %s for project %s from the spool', remote_file.path, self.project.pk)
+                yield task, remote_file if task.original is None and task.spooled is None else None
+                continue
+            if mirror and (self.sink.size(self.project, remote_file) or 0) < reader.offset:
+                # The local copy is gone or shorter than recorded: copy the whole file again.
+                reader.offset = 0
+            yield task, None
+
+    def _parse_files(self, fetched, log_format, enricher=None, dimensions=None):
+        """Yield ``(task, batch)`` pairs parsed from the fetched chunks.
+
+        Runs on the parse thread, which also enriches the batches when
+        given an ``enricher`` and interns their ``dimensions``.
+        Errors failing the file (FILE_ERRORS) are stored on the task.
+        """
+        metrics = self.metrics
+        for task, chunks in split_files(metrics.waiting(fetched)):
+            if task.original is not None:
+                yield task, None
+                continue
+            task.parser = parser = get_parser(log_format)
+            try:
+                if task.spooled is not None:
+                    batches = metrics.count_rows('parse', self._parse_spooled(task.remote_file, task.spooled, parser))
+                elif task.reader is None:
+                    decompressed = metrics.count_bytes('decompress', decompress_chunks(task.remote_file.path, chunks))
+                    batches = metrics.count_rows('parse', parser.parse_stream(decompressed))
+                else:
+                    batches = metrics.count_rows('parse', _complete_lines(parser, chunks))
+                if enricher is not None or dimensions is not None:
+                    batches = metrics.count_rows('enrich', _enrich(batches, enricher, dimensions))
+                for batch in batches:
+                    yield task, batch
+            except FILE_ERRORS as e:
+                task.error = task.error or e
+            else:
+                metrics['parse'].files += 1
+                if task.reader is not None:
+                    task.checkpoint = task.reader.checkpoint(held_back=len(parser.remainder))
+            finally:
+                # Unmapped once the batches parsed from it are released.
+                task.spooled = None
+            yield task, None
+
+    def _parse_spooled(self, remote_file, mapped, parser):
+        """Yield record batches parsed from the memory-mapped spool copy of a file.
+
+        Uncompressed files are parsed in place, without copying them into
+        memory; compressed files are decompressed from slices of the map.
+        """
+        decompress = self.metrics['decompress']
+        if detect_codec(remote_file.path, mapped[:CODEC_SNIFF_BYTES]) is None:
+            decompress.bytes += len(mapped)
+            yield from parser.parse_buffer(mapped)
+            return
+        chunk_size = settings.SYNC_CHUNK_SIZE
+        chunks = (mapped[offset:offset + chunk_size] for offset in range(0, len(mapped), chunk_size))
+        decompressed = self.metrics.count_bytes('decompress', decompress_chunks(remote_file.path, chunks))
+        yield from parser.parse_stream(decompressed)
+
+    def _flush(self, loader, staged, manifest, deduplicator=None, spool=None, dimensions=None, rollups=None):
+        """Load the staged files; return how many were loaded and how many were duplicates.
+
+        Duplicates of files in the same load are only recorded once that
+        load has succeeded, and fail along with it otherwise. The spooled
+        copies of the staged files are dropped once they are loaded. New
+        dimension values are loaded first, so the ids of loaded rows
+        always resolve. Rollup rows are loaded last, and only count rows
+        that were loaded; if their load fails they are retried later.
+        """
+        if not staged:
+            return 0, 0
+        staged_bytes, staged_rows = loader.staged_bytes, loader.staged_rows
+        try:
+            with self.metrics.measure('load'):
+                if dimensions is not None:
+                    dimensions.load(loader)
+                loader.flush()
+        except LoadError as e:
+            logger.error('Load of %s files for project %s failed: %s', len(staged), self.project.pk, e)
+            if deduplicator is not None:
+                deduplicator.reset()
+            if rollups is not None:
+                rollups.reset()
+            for staged_file in staged:
+                manifest.mark_failed(staged_file.remote_file, e)
+            return 0, 0
+        if deduplicator is not None:
+            deduplicator.commit()
+        if rollups is not None:
+            with self.metrics.measure('aggregate'):
+                rollups.commit()
+            with self.metrics.measure('load'):
+                rollups.load(loader)
+        load = self.metrics['load']
+        load.bytes += staged_bytes
+        load.rows += staged_rows
+        duplicates = 0
+        for remote_file, (offset, tail_digest), content_hash, original in staged:
+            if original:
+                manifest.mark_duplicate(remote_file, content_hash, original)
+                duplicates += 1
+            else:
+                manifest.mark_synced(remote_file, offset, tail_digest, content_hash)
+            if spool is not None:
+                spool.discard(remote_file)
+        load.files += len(staged) - duplicates
+        return len(staged) - duplicates, duplicates
+
+    def _aggregate(self, batches, rollups):
+        """Yield ``batches`` while adding them to the ``rollups`` of the current file."""
+        aggregate = self.metrics['aggregate']
+        for batch in batches:
+            with self.metrics.measure('aggregate'):
+                rollups.add(batch)
+            aggregate.rows += batch.num_rows
+            yield batch
+
+    def _record_duplicate(self, task, manifest):
+        """Record a file found to be a duplicate from its listing."""
+        path, content_hash = task.original
+        logger.info('Skipping %s for project %s: duplicate of %s', task.remote_file.path, self.project.pk, path)
+        manifest.mark_duplicate(task.remote_file, content_hash, path)
+
+    @staticmethod
+    def matching_files(remote_files, file_filter):
+        """Yield the files of a listing accepted by ``file_filter``, batch by batch."""
+        if file_filter is None:
+            yield from remote_files
+            return
+        matcher = file_filter.get_matcher()
+        for batch in batched(remote_files, LISTING_BATCH_SIZE):
+            yield from matcher.filter(batch)
+
+
+def run_project_sync(project_id):
+    """Sync a single project by primary key, record its ``JobRun`` and advance its schedule."""
+    try:
+        project = Project.objects.select_related(
+            'client', 'log_source', 'file_filter', 'schedule', 'destination'
+        ).get(pk=project_id)
+    except Project.DoesNotExist:
+        raise SyncError(f'Project with id {project_id} does not exist.')
+    started_at = timezone.now()
+    job_run = JobRun.objects.create(project=project, started_at=started_at)
+    metrics = JobMetrics()
+    metrics.start_peak_memory()
+    try:
+        result = SyncEngine(project, metrics=metrics).run()
+    except Exception as e:
+        metrics.record_peak_memory()
+        job_run.finish(metrics, error=e)
+        raise
+    else:
+        metrics.record_peak_memory()
+        job_run.finish(metrics)
+        return result
+    finally:
+        schedule = getattr(project, 'schedule', None)
+        if schedule is not None:
+            schedule.mark_run(started_at)
+
+
+def _enrich(batches, enricher, dimensions):
+    if enricher is not None:
+        batches = enricher.enrich_batches(batches)
+    if dimensions is not None:
+        batches = dimensions.intern_batches(batches)
+    return batches
+
+
+def _complete_lines(parser, chunks):
+    """Parse ``chunks``, leaving a short incomplete last line in ``parser.remainder``."""
+    yield from parser.parse_chunks(chunks)
+    if len(parser.remainder) > MAX_HELD_BACK_BYTES:
+        yield from parser.parse_final()
+
+
+class _ByteCounter:
+    """Iterate over byte chunks while counting them."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.bytes = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.bytes += len(chunk)
+            yield chunk
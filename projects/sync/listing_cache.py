@@ -0,0 +1,139 @@
+"""On-disk cache of remote listings for file filter previews, refreshed by sync runs."""
+import hashlib
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .sources import RemoteFile
+
+
+# Listed files written to or read from a cached listing at once.
+CACHE_BATCH_SIZE = 10000
+
+# ``LogSource`` fields that decide what a listing returns.
+LISTING_FIELDS = ['source_type', 'host', 'port', 'username', 'directory', 'bucket_name', 'region', 'prefix']
+
+LISTING_SCHEMA = pa.schema([
+    ('path', pa.string()),
+    ('size', pa.int64()),
+    ('mtime', pa.float64()),
+    ('etag', pa.string()),
+])
+
+_START_AFTER = b'start_after'
+
+
+class ListingCache:
+    """Listing of a ``LogSource``, kept on disk for ``ttl`` seconds.
+
+    Listing a large prefix takes minutes, so repeated previews of a file
+    filter reuse one listing while it is fresh. Sync runs never read it:
+    a stale listing would miss new files and the growth of tailed files.
+    They list the source live and replace the cached listing as they go.
+    The cache is keyed on the source's connection and location fields, so
+    editing them starts a new listing.
+
+    Listings are written as Parquet under ``root``, one file per source,
+    so they are shared by the web and worker processes.
+    """
+
+    def __init__(self, log_source, root=None, ttl=None):
+        self.log_source = log_source
+        self.root = Path(root or settings.SYNC_LISTING_CACHE_DIR)
+        self.ttl = ttl if ttl is not None else settings.SYNC_LISTING_CACHE_TTL
+        identity = '\0'.join(str(getattr(log_source, field)) for field in LISTING_FIELDS)
+        fingerprint = hashlib.sha256(identity.encode()).hexdigest()[:16]
+        self.path = self.root / f'{log_source.pk}-{fingerprint}.parquet'
+
+    def list_files(self, source, start_after=None):
+        """Yield the ``RemoteFile`` listing of ``source``, from the cache if fresh.
+
+        A listing resumed after ``start_after`` is only reused by later
+        requests resuming at or after the same key.
+        """
+        if self.ttl <= 0:
+            yield from source.list_files(start_after=start_after)
+            return
+        cached = self._open(start_after)
+        if cached is None:
+            yield from self._list_through(source, start_after)
+            return
+        skip = start_after if source.resumes_listing else None
+        for batch in cached.iter_batches(batch_size=CACHE_BATCH_SIZE):
+            for path, size, mtime, etag in zip(*(column.to_pylist() for column in batch.columns)):
+                if skip is None or path > skip:
+                    yield RemoteFile(path, size, mtime, etag)
+
+    def refresh(self, source, start_after=None):
+        """Yield a live listing of ``source``, replacing the cached one with it."""
+        if self.ttl <= 0:
+            yield from source.list_files(start_after=start_after)
+            return
+        yield from self._list_through(source, start_after)
+
+    def invalidate(self):
+        self.path.unlink(missing_ok=True)
+
+    def _open(self, start_after):
+        try:
+            age = time.time() - self.path.stat().st_mtime
+            if age >= self.ttl:
+                return None
+            cached = pq.ParquetFile(self.path)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        cached_start = (cached.schema_arrow.metadata or {}).get(_START_AFTER)
+        if cached_start is not None and (start_after is None or start_after.encode() < cached_start):
+            return None
+        return cached
+
+    def _list_through(self, source, start_after):
+        """Yield a live listing while writing it to the cache.
+
+        The cache is only replaced once the listing is complete.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        schema = LISTING_SCHEMA
+        if start_after is not None:
+            schema = schema.with_metadata({_START_AFTER: start_after.encode()})
+        partial = self.path.with_name(f'.{self.path.name}.{uuid.uuid4().hex}.part')
+        try:
+            with pq.ParquetWriter(partial, schema) as writer:
+                batch = []
+                for remote_file in source.list_files(start_after=start_after):
+                    batch.append(remote_file)
+                    yield remote_file
+                    if len(batch) >= CACHE_BATCH_SIZE:
+                        writer.write_batch(_to_record_batch(batch, schema))
+                        batch = []
+                if batch:
+                    writer.write_batch(_to_record_batch(batch, schema))
+            os.replace(partial, self.path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        for stale in self.root.glob(f'{self.log_source.pk}-*.parquet'):
+            if stale != self.path:
+                stale.unlink(missing_ok=True)
+
+
+def _to_record_batch(remote_files, schema):
+    columns = zip(*remote_files)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, field.type) for column, field in zip(columns, schema)], schema=schema,
+    )
+
+
+def cached_listing(source, start_after=None):
+    """Yield the listing of an open source through its ``ListingCache``."""
+    return ListingCache(source.log_source).list_files(source, start_after=start_after)
+
+
+def fresh_listing(source, start_after=None):
+    """Yield a live listing of an open source, refreshing its ``ListingCache``."""
+    return ListingCache(source.log_source).refresh(source, start_after=start_after)
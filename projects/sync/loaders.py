@@ -0,0 +1,456 @@
+"""Loaders moving parsed log batches into a project's destination table."""
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from collections import namedtuple
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .crawlers import ENRICHED_SCHEMA
+from .dimensions import fact_schema
+from .parsers import SCHEMA
+
+
+# Compression of staging and local table files.
+PARQUET_COMPRESSION = 'zstd'
+
+# Hive-style partition directories by ``Destination.partitioning``.
+PARTITION_PATTERNS = {
+    'day': 'date=%Y-%m-%d',
+    'hour': 'date=%Y-%m-%d/hour=%H',
+}
+
+# Partition value of rows without a timestamp, as named by Hive.
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# BigQuery time partitioning types by ``Destination.partitioning``.
+BIGQUERY_PARTITION_TYPES = {
+    'day': 'DAY',
+    'hour': 'HOUR',
+}
+
+
+# Rows per row group of local table files.
+ROW_GROUP_ROWS = 128 * 1024
+
+# Rows read from each sorted run at a time while merging runs.
+MERGE_BATCH_ROWS = 16 * 1024
+
+# Column marking the last row read from a sorted run while merging runs.
+_RUN_COLUMN = '__run'
+
+
+StagedFile = namedtuple('StagedFile', ['path', 'rows', 'size'])
+
+
+class LoadError(Exception):
+    """Raised when staged rows cannot be loaded into the destination."""
+
+
+class BaseLoader:
+    """Base class for destination loaders.
+
+    Rows are never inserted one at a time. The batches of each source file
+    are written to their own Parquet staging file, and staged files are
+    combined and loaded with a single bulk load once ``batch_bytes`` have
+    accumulated (see ``needs_flush``) or when ``flush`` is called.
+
+    Loaders are context managers: the staging directory is created on
+    enter and removed, with anything left in it, on exit.
+    """
+
+    def __init__(self, destination, staging_dir=None, batch_bytes=None):
+        self.destination = destination
+        self.staging_root = Path(staging_dir or settings.SYNC_STAGING_DIR)
+        self.batch_bytes = batch_bytes or settings.SYNC_LOAD_BATCH_BYTES
+        self._staging = None
+        self._staged = []
+
+    def __enter__(self):
+        self.staging_root.mkdir(parents=True, exist_ok=True)
+        self._staging = Path(tempfile.mkdtemp(prefix=f'project-{self.destination.project_id}-', dir=self.staging_root))
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        finally:
+            shutil.rmtree(self._staging, ignore_errors=True)
+            self._staging = None
+            self._staged = []
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def load(self, path):
+        """Load the Parquet file at ``path`` into the destination table."""
+        raise NotImplementedError
+
+    def load_companion(self, suffix, table, partition_field=None):
+        """Append the rows of an Arrow ``table`` to the companion table ``<table>_<suffix>``.
+
+        Companion tables hold dimensions and rollups next to the destination
+        table. ``partition_field`` names a date column to partition by, where
+        the destination supports it.
+        """
+        raise NotImplementedError
+
+    @property
+    def qualified_name(self):
+        """Name of the destination table, unique across projects and destination types."""
+        raise NotImplementedError
+
+    @property
+    def schema(self):
+        """Schema of the rows loaded into the destination table."""
+        schema = ENRICHED_SCHEMA if self.destination.classify_crawlers else SCHEMA
+        if self.destination.normalize_dimensions:
+            schema = fact_schema(schema)
+        return schema
+
+    @property
+    def staged_bytes(self):
+        return sum(staged.size for staged in self._staged)
+
+    @property
+    def staged_rows(self):
+        return sum(staged.rows for staged in self._staged)
+
+    @property
+    def needs_flush(self):
+        return self.staged_bytes >= self.batch_bytes
+
+    def stage(self, batches):
+        """Write ``batches`` to a new staging file and return the number of rows.
+
+        If consuming ``batches`` raises, nothing is left staged.
+        """
+        path = self._staging / f'{uuid.uuid4().hex}.parquet'
+        rows = 0
+        writer = pq.ParquetWriter(path, self.schema, compression=PARQUET_COMPRESSION)
+        try:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+            writer.close()
+        except BaseException:
+            writer.close()
+            path.unlink(missing_ok=True)
+            raise
+        if not rows:
+            path.unlink()
+            return 0
+        self._staged.append(StagedFile(path, rows, path.stat().st_size))
+        return rows
+
+    def unstage_last(self):
+        """Discard the file staged by the last ``stage`` call that returned rows."""
+        self._staged.pop().path.unlink(missing_ok=True)
+
+    def flush(self):
+        """Load everything staged so far with one load job.
+
+        Staging files are discarded whether or not the load succeeds; the
+        caller decides which source files to retry.
+        """
+        staged, self._staged = self._staged, []
+        if not staged:
+            return
+        combined = self._staging / f'batch-{uuid.uuid4().hex}.parquet'
+        try:
+            _combine([file.path for file in staged], combined)
+            self.load(combined)
+        finally:
+            combined.unlink(missing_ok=True)
+            for file in staged:
+                file.path.unlink(missing_ok=True)
+
+
+class LocalLoader(BaseLoader):
+    """Append Parquet files to a table directory on the local filesystem.
+
+    Partitioned tables use hive-style directories under
+    ``<directory>/<table>/`` (``date=2026-10-16/`` or
+    ``date=2026-10-16/hour=13/``), and each load adds one ``part-*.parquet``
+    file to every partition it has rows for. Rows are sorted by the
+    clustering columns within each file, so readers can skip row groups
+    using the Parquet column statistics. DuckDB queries the table with
+    ``read_parquet('<table>/**/*.parquet', hive_partitioning = true)``.
+
+    Files are written under temporary names and only renamed into place
+    once every partition of the load has been written.
+    """
+
+    @property
+    def table_dir(self):
+        directory = self.destination.directory or Path(settings.SYNC_DESTINATION_DIR) / str(self.destination.project_id) / 'warehouse'
+        return Path(directory) / self.destination.table_name
+
+    @property
+    def qualified_name(self):
+        return f'local:{self.table_dir.resolve()}'
+
+    def load(self, path):
+        table_dir = self.table_dir
+        name = f'part-{uuid.uuid4().hex}.parquet'
+        written = []
+        try:
+            for partition, partition_path in self._split_partitions(path):
+                target = table_dir / partition / name
+                partial = target.with_name(f'.{name}.tmp')
+                target.parent.mkdir(parents=True, exist_ok=True)
+                written.append((partial, target))
+                self._write_sorted(partition_path, partial)
+                partition_path.unlink()
+            for partial, target in written:
+                os.replace(partial, target)
+        except OSError as e:
+            for partial, _ in written:
+                partial.unlink(missing_ok=True)
+            raise LoadError(f'Could not load into {table_dir}: {e}') from e
+
+    def _write_sorted(self, path, target):
+        """Write the rows of the Parquet file ``path`` to ``target``, sorted by the clustering columns.
+
+        At most ``SYNC_SORT_RUN_ROWS`` rows are sorted in memory: larger
+        files are sorted in runs of that many rows, written next to
+        ``path``, and the runs are then merged.
+        """
+        parquet_file = pq.ParquetFile(path)
+        sort_keys = [(column, 'ascending') for column in self.destination.clustering_columns]
+        run_rows = settings.SYNC_SORT_RUN_ROWS
+        with _RowGroupWriter(target, parquet_file.schema_arrow) as writer:
+            if not sort_keys:
+                for batch in parquet_file.iter_batches():
+                    writer.write(pa.Table.from_batches([batch]))
+            elif parquet_file.metadata.num_rows <= run_rows:
+                writer.write(parquet_file.read().sort_by(sort_keys))
+            else:
+                runs = []
+                try:
+                    for batch in parquet_file.iter_batches(batch_size=run_rows):
+                        runs.append(path.with_name(f'{path.stem}-run-{len(runs)}.parquet'))
+                        rows = pa.Table.from_batches([batch]).sort_by(sort_keys)
+                        pq.write_table(rows, runs[-1], compression=PARQUET_COMPRESSION)
+                    _merge_runs(runs, sort_keys, writer)
+                finally:
+                    for run in runs:
+                        run.unlink(missing_ok=True)
+
+    def load_companion(self, suffix, table, partition_field=None):
+        table_dir = self.table_dir.with_name(f'{self.destination.table_name}_{suffix}')
+        name = f'part-{uuid.uuid4().hex}.parquet'
+        partial = table_dir / f'.{name}.tmp'
+        try:
+            table_dir.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table, partial, compression=PARQUET_COMPRESSION)
+            os.replace(partial, table_dir / name)
+        except OSError as e:
+            partial.unlink(missing_ok=True)
+            raise LoadError(f'Could not load into {table_dir}: {e}') from e
+
+    def _split_partitions(self, path):
+        """Split a staging file by partition; return ``(directory, path)`` pairs."""
+        pattern = PARTITION_PATTERNS.get(self.destination.partitioning)
+        if pattern is None:
+            return [('', path)]
+        default = '/'.join(f'{segment.partition("=")[0]}={HIVE_DEFAULT_PARTITION}' for segment in pattern.split('/'))
+        writers = {}
+        paths = {}
+        try:
+            parquet_file = pq.ParquetFile(path)
+            for batch in parquet_file.iter_batches():
+                keys = pc.fill_null(pc.strftime(batch.column('timestamp'), format=pattern), default)
+                for key in pc.unique(keys).to_pylist():
+                    if key not in writers:
+                        paths[key] = path.with_name(f'{path.stem}-{len(writers)}.parquet')
+                        writers[key] = pq.ParquetWriter(paths[key], parquet_file.schema_arrow, compression=PARQUET_COMPRESSION)
+                    writers[key].write_batch(batch.filter(pc.equal(keys, key)))
+        finally:
+            for writer in writers.values():
+                writer.close()
+        return sorted(paths.items())
+
+
+class BigQueryLoader(BaseLoader):
+    """Load staged Parquet files into BigQuery with batch load jobs.
+
+    Load jobs are free, unlike streaming inserts, and the table is created
+    from the Parquet schema on the first load, partitioned on ``timestamp``
+    and clustered as configured on the destination; BigQuery routes every
+    row to its partition. Requires the optional ``google-cloud-bigquery``
+    package.
+    """
+
+    def __init__(self, destination, staging_dir=None, batch_bytes=None):
+        super().__init__(destination, staging_dir, batch_bytes)
+        self._client = None
+        self._bigquery = None
+
+    @property
+    def table_id(self):
+        return f'{self.destination.gcp_project}.{self.destination.dataset}.{self.destination.table_name}'
+
+    @property
+    def qualified_name(self):
+        return f'bigquery:{self.table_id}'
+
+    def connect(self):
+        try:
+            from google.cloud import bigquery
+            from google.oauth2 import service_account
+        except ImportError as e:
+            raise LoadError('BigQuery destinations require the google-cloud-bigquery package.') from e
+        credentials = None
+        if self.destination.credentials_json:
+            credentials = service_account.Credentials.from_service_account_info(
+                json.loads(self.destination.credentials_json)
+            )
+        self._bigquery = bigquery
+        self._client = bigquery.Client(
+            project=self.destination.gcp_project,
+            credentials=credentials,
+            location=self.destination.location or None,
+        )
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def load(self, path):
+        from google.api_core.exceptions import GoogleAPIError
+
+        bigquery = self._bigquery
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+            # Tables created before crawler classification was enabled gain its columns.
+            schema_update_options=[bigquery.SchemaUpdateOption.ALLOW_FIELD_ADDITION],
+        )
+        partition_type = BIGQUERY_PARTITION_TYPES.get(self.destination.partitioning)
+        if partition_type:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_=partition_type, field='timestamp')
+        if self.destination.clustering_columns:
+            job_config.clustering_fields = self.destination.clustering_columns
+        try:
+            with open(path, 'rb') as fh:
+                job = self._client.load_table_from_file(fh, self.table_id, job_config=job_config)
+            job.result()
+        except GoogleAPIError as e:
+            raise LoadError(f'Load job into {self.table_id} failed: {e}') from e
+
+    def load_companion(self, suffix, table, partition_field=None):
+        from google.api_core.exceptions import GoogleAPIError
+
+        bigquery = self._bigquery
+        table_id = f'{self.table_id}_{suffix}'
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            create_disposition=bigquery.CreateDisposition.CREATE_IF_NEEDED,
+        )
+        if partition_field:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_='DAY', field=partition_field)
+        path = self._staging / f'{suffix}-{uuid.uuid4().hex}.parquet'
+        try:
+            pq.write_table(table, path, compression=PARQUET_COMPRESSION)
+            with open(path, 'rb') as fh:
+                job = self._client.load_table_from_file(fh, table_id, job_config=job_config)
+            job.result()
+        except GoogleAPIError as e:
+            raise LoadError(f'Load job into {table_id} failed: {e}') from e
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def _combine(paths, target):
+    """Concatenate Parquet staging files into ``target``."""
+    # Parquet has no second-resolution timestamps, so read back the stored schema.
+    schema = pq.read_schema(paths[0])
+    with pq.ParquetWriter(target, schema, compression=PARQUET_COMPRESSION) as writer:
+        for path in paths:
+            for batch in pq.ParquetFile(path).iter_batches():
+                writer.write_batch(batch)
+
+
+class _RowGroupWriter:
+    """Parquet writer buffering the tables it is given into row groups of ``ROW_GROUP_ROWS``."""
+
+    def __init__(self, path, schema):
+        self._writer = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+        self._buffer = []
+        self._rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None and self._rows:
+                self._writer.write_table(pa.concat_tables(self._buffer), row_group_size=ROW_GROUP_ROWS)
+        finally:
+            self._writer.close()
+
+    def write(self, table):
+        self._buffer.append(table)
+        self._rows += table.num_rows
+        if self._rows >= ROW_GROUP_ROWS:
+            rows = pa.concat_tables(self._buffer)
+            full = self._rows - self._rows % ROW_GROUP_ROWS
+            self._writer.write_table(rows.slice(0, full), row_group_size=ROW_GROUP_ROWS)
+            self._buffer = [rows.slice(full)]
+            self._rows -= full
+
+
+def _merge_runs(paths, sort_keys, writer):
+    """Merge Parquet files, each sorted by ``sort_keys``, into ``writer``.
+
+    The runs are read a batch at a time. The last row of each batch is
+    marked with its run: once sorted, the rows up to the first marked one
+    are in their final order, as no run has rows left before it, and the
+    run whose batch ended there is read next.
+    """
+    batches = [pq.ParquetFile(path).iter_batches(batch_size=MERGE_BATCH_ROWS) for path in paths]
+    pending = None
+    refill = range(len(paths))
+    while True:
+        tables = [] if pending is None else [pending]
+        for run in refill:
+            batch = next(batches[run], None)
+            if batch is not None:
+                marker = pa.concat_arrays([pa.nulls(batch.num_rows - 1, pa.int64()), pa.array([run], pa.int64())])
+                tables.append(pa.Table.from_batches([batch]).append_column(_RUN_COLUMN, marker))
+        if not tables:
+            return
+        rows = pa.concat_tables(tables)
+        # Taken rather than sliced, so that no output holds on to every row read.
+        order = pc.sort_indices(rows, sort_keys)
+        markers = rows.column(_RUN_COLUMN).take(order)
+        end = pc.index(pc.is_valid(markers), True).as_py()
+        if end < 0:
+            writer.write(rows.take(order).drop_columns([_RUN_COLUMN]))
+            return
+        writer.write(rows.take(order.slice(0, end + 1)).drop_columns([_RUN_COLUMN]))
+        pending = rows.take(order.slice(end + 1)) if end + 1 < rows.num_rows else None
+        refill = [markers[end].as_py()]
+
+
+def open_loader(destination, **kwargs):
+    """Return the loader implementation for a ``Destination``."""
+    if destination.destination_type == destination.DestinationType.LOCAL:
+        return LocalLoader(destination, **kwargs)
+    if destination.destination_type == destination.DestinationType.BIGQUERY:
+        return BigQueryLoader(destination, **kwargs)
+    raise LoadError(f'Unsupported destination type: {destination.destination_type}')
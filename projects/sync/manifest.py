@@ -0,0 +1,151 @@
+"""Per-project manifest of remote files already handled by the sync engine."""
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from ..models import ManifestEntry
+
+
+# Statuses of files that need no further work while unchanged.
+DONE_STATUSES = [ManifestEntry.SyncStatus.SYNCED, ManifestEntry.SyncStatus.DUPLICATE]
+
+
+class Manifest:
+    """In-memory view of a project's ``ManifestEntry`` rows.
+
+    The whole manifest is loaded with a single query so that diffing a
+    remote listing against it costs one dictionary lookup per file instead
+    of one query per file.
+
+    Content hashes of synced files are kept too, so a file already synced
+    under another path (a copy, or a file re-uploaded after a rename) is
+    recognized as a duplicate.
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self._entries = {}
+        self._hashes = {}
+        self._etags = {}
+        for path, size, mtime, etag, status, content_hash in ManifestEntry.objects.filter(
+            project=project
+        ).values_list('path', 'size', 'mtime', 'etag', 'status', 'content_hash').iterator():
+            self._entries[path] = (size, mtime, etag, status)
+            if status == ManifestEntry.SyncStatus.SYNCED and content_hash:
+                self._remember_hash(path, size, etag, content_hash)
+        self._tails = {
+            path: (offset, tail_digest)
+            for path, offset, tail_digest in ManifestEntry.objects.filter(
+                project=project, offset__gt=0
+            ).values_list('path', 'offset', 'tail_digest').iterator()
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_current(self, remote_file):
+        """Return whether ``remote_file`` was already synced in its current state."""
+        entry = self._entries.get(remote_file.path)
+        if entry is None:
+            return False
+        size, mtime, etag, status = entry
+        return (
+            status in DONE_STATUSES
+            and size == remote_file.size
+            and mtime == _mtime(remote_file)
+            and etag == remote_file.etag
+        )
+
+    def tail_position(self, remote_file):
+        """Return ``(offset, digest)`` to resume a tailed file from, or ``(0, '')``."""
+        offset, digest = self._tails.get(remote_file.path, (0, ''))
+        if offset > remote_file.size:
+            # Truncated or rotated in place: start over.
+            return 0, ''
+        return offset, digest
+
+    def failed_before(self, remote_file):
+        """Return whether ``remote_file`` failed to sync on an earlier run, in its current state."""
+        entry = self._entries.get(remote_file.path)
+        return entry == (remote_file.size, _mtime(remote_file), remote_file.etag, ManifestEntry.SyncStatus.FAILED)
+
+    def duplicate_by_etag(self, remote_file):
+        """Return ``(path, content_hash)`` of a synced file with the same ETag and size, or None.
+
+        Lets S3 objects be recognized as duplicates without downloading them.
+        """
+        if not remote_file.etag:
+            return None
+        original = self._etags.get((remote_file.etag, remote_file.size))
+        if original is None or original[0] == remote_file.path:
+            return None
+        return original
+
+    def duplicate_of(self, remote_file, content_hash):
+        """Return the path of another synced file with ``content_hash``, or None."""
+        path = self._hashes.get(content_hash)
+        if path == remote_file.path:
+            return None
+        return path
+
+    def resume_after(self):
+        """Return the path a listing can safely resume after, or ``None``.
+
+        This is the last synced path that is not preceded by a file still
+        pending or failed, so such files keep being listed and retried.
+        """
+        entries = ManifestEntry.objects.filter(project=self.project)
+        first_unsynced = entries.exclude(
+            status__in=DONE_STATUSES
+        ).aggregate(path=Min('path'))['path']
+        synced = entries.filter(status__in=DONE_STATUSES)
+        if first_unsynced is not None:
+            synced = synced.filter(path__lt=first_unsynced)
+        return synced.aggregate(path=Max('path'))['path']
+
+    def mark_synced(self, remote_file, offset=0, tail_digest='', content_hash=''):
+        self._record(
+            remote_file, ManifestEntry.SyncStatus.SYNCED,
+            synced_at=timezone.now(), error='', offset=offset, tail_digest=tail_digest,
+            content_hash=content_hash,
+        )
+        if offset:
+            self._tails[remote_file.path] = (offset, tail_digest)
+        else:
+            self._tails.pop(remote_file.path, None)
+        if content_hash:
+            self._remember_hash(remote_file.path, remote_file.size, remote_file.etag, content_hash)
+
+    def mark_duplicate(self, remote_file, content_hash, original):
+        self._record(
+            remote_file, ManifestEntry.SyncStatus.DUPLICATE,
+            synced_at=timezone.now(), error=f'Duplicate of {original}', offset=0, tail_digest='',
+            content_hash=content_hash,
+        )
+        self._tails.pop(remote_file.path, None)
+
+    def mark_failed(self, remote_file, error):
+        # The offset is kept, so the next attempt still only reads the new bytes.
+        self._record(remote_file, ManifestEntry.SyncStatus.FAILED, error=str(error))
+
+    def _record(self, remote_file, status, **extra):
+        ManifestEntry.objects.update_or_create(
+            project=self.project,
+            path=remote_file.path,
+            defaults={
+                'size': remote_file.size,
+                'mtime': _mtime(remote_file),
+                'etag': remote_file.etag,
+                'status': status,
+                **extra,
+            },
+        )
+        self._entries[remote_file.path] = (remote_file.size, _mtime(remote_file), remote_file.etag, status)
+
+    def _remember_hash(self, path, size, etag, content_hash):
+        self._hashes.setdefault(content_hash, path)
+        if etag:
+            self._etags.setdefault((etag, size), (path, content_hash))
+
+
+def _mtime(remote_file):
+    return int(remote_file.mtime) if remote_file.mtime is not None else None
@@ -0,0 +1,49 @@
+"""Compiled file name matchers built from ``FileFilter`` configuration."""
+import re
+from functools import lru_cache
+from itertools import compress
+
+
+class FileMatcher:
+    """Match remote file names against a compiled filter pattern.
+
+    Every filter type is compiled to a regular expression once, so the
+    per-file cost is a single C-level ``match``/``search`` call on the
+    file name (the part of the path after the last ``/``).
+    """
+
+    def __init__(self, filter_type, pattern):
+        self.filter_type = filter_type
+        self.pattern = pattern
+        if filter_type == 'starts_with':
+            self._test = re.compile(re.escape(pattern)).match
+        elif filter_type == 'contains':
+            self._test = re.compile(re.escape(pattern)).search
+        elif filter_type == 'regex':
+            self._test = re.compile(pattern).search
+        else:
+            raise ValueError(f'Unknown filter type: {filter_type}')
+
+    def matches(self, path):
+        """Return whether the file name of ``path`` matches."""
+        return self._test(path.rpartition('/')[2]) is not None
+
+    def filter(self, remote_files):
+        """Return the ``RemoteFile`` objects of a listing whose names match."""
+        remote_files = list(remote_files)
+        names = [remote_file.path.rpartition('/')[2] for remote_file in remote_files]
+        return list(compress(remote_files, map(self._test, names)))
+
+
+@lru_cache(maxsize=1024)
+def _compile(project_id, updated_at, filter_type, pattern):
+    return FileMatcher(filter_type, pattern)
+
+
+def get_matcher(file_filter):
+    """Return the cached matcher for a ``FileFilter``.
+
+    Matchers are cached per ``(project_id, updated_at)``, so saving the
+    filter produces a new key and stale matchers simply age out.
+    """
+    return _compile(file_filter.project_id, file_filter.updated_at, file_filter.filter_type, file_filter.pattern)
@@ -0,0 +1,139 @@
+"""Per-stage time and volume of a sync job."""
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Stages of a sync job, in pipeline order (see ``JobStage.Stage``).
+STAGES = ['list', 'fetch', 'decompress', 'parse', 'enrich', 'aggregate', 'load']
+
+
+class StageMetrics:
+    """Running totals of one stage."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+        self.files = 0
+
+
+class JobMetrics:
+    """Accumulate the time spent in each stage of a sync job.
+
+    Stages stream into each other: staging pulls parsed batches, which pull
+    decompressed chunks, which pull fetched chunks. Each stage is charged
+    only its own time, excluding the stages it pulls from (like the self
+    time of a profiler) and the time spent waiting for another thread of
+    the pipeline. As the pipeline threads run concurrently, stage times
+    can add up to more than the job's wall time.
+
+    Each stage must only be measured from one thread.
+    """
+
+    def __init__(self):
+        self.stages = {stage: StageMetrics() for stage in STAGES}
+        self.peak_memory = None
+        self._peak_memory_reset = False
+        self._local = threading.local()
+
+    def __getitem__(self, stage):
+        return self.stages[stage]
+
+    @contextmanager
+    def measure(self, stage):
+        """Charge the time spent in the block to ``stage``, or to no stage if None."""
+        active = self._local.__dict__.setdefault('active', [])
+        active.append(stage)
+        start = time.perf_counter()
+        try:
+            yield self.stages.get(stage)
+        finally:
+            elapsed = time.perf_counter() - start
+            active.pop()
+            if stage is not None:
+                self.stages[stage].seconds += elapsed
+            if active and active[-1] is not None:
+                self.stages[active[-1]].seconds -= elapsed
+
+    def waiting(self, items):
+        """Yield from ``items`` without charging the time to any stage."""
+        iterator = iter(items)
+        while True:
+            with self.measure(None):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count_files(self, stage, files):
+        """Yield from ``files``, timing and counting them as ``stage``."""
+        return self._timed(stage, files, _add_file)
+
+    def count_bytes(self, stage, chunks):
+        """Yield from byte ``chunks``, timing and counting them as ``stage``."""
+        return self._timed(stage, chunks, _add_bytes)
+
+    def count_rows(self, stage, batches):
+        """Yield from record ``batches``, timing and counting their rows as ``stage``."""
+        return self._timed(stage, batches, _add_rows)
+
+    def start_peak_memory(self):
+        """Measure the peak memory of the job from now on."""
+        self._peak_memory_reset = reset_peak_memory()
+
+    def record_peak_memory(self):
+        """Record the peak memory since ``start_peak_memory``, if it could be measured."""
+        self.peak_memory = peak_memory() if self._peak_memory_reset else None
+
+    def _timed(self, stage, iterable, add):
+        iterator = iter(iterable)
+        metrics = self.stages[stage]
+        while True:
+            with self.measure(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            add(metrics, item)
+            yield item
+
+
+def reset_peak_memory():
+    """Restart the peak resident memory of this process at its current size; return whether it could.
+
+    Scheduler workers run many jobs, so their lifetime peak would be the
+    peak of their largest job so far. Linux lets a process reset its peak
+    (``/proc/self/clear_refs``); other platforms report no peak.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def peak_memory():
+    """Return the peak resident memory of this process in bytes since its last reset, or None if unknown."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _add_file(metrics, remote_file):
+    metrics.files += 1
+
+
+def _add_bytes(metrics, chunk):
+    metrics.bytes += len(chunk)
+
+
+def _add_rows(metrics, batch):
+    metrics.rows += batch.num_rows
@@ -0,0 +1,266 @@
+"""Columnar access-log parsers producing Arrow record batches.
+
+Raw bytes are split into lines and matched against the format's regex
+inside Arrow (RE2), so no per-line Python objects are created. Every
+parser produces batches with the same ``SCHEMA`` regardless of format.
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('s', tz='UTC')),
+    ('remote_addr', pa.string()),
+    ('host', pa.string()),
+    ('method', pa.string()),
+    ('path', pa.string()),
+    ('protocol', pa.string()),
+    ('status', pa.int16()),
+    ('bytes', pa.int64()),
+    ('referer', pa.string()),
+    ('user_agent', pa.string()),
+])
+
+# Target number of lines per record batch.
+DEFAULT_BATCH_LINES = 65536
+
+# Quoted field allowing backslash-escaped quotes, e.g. user agents.
+QUOTED = r'(?:[^"\\]|\\.)*'
+
+
+class ParseError(Exception):
+    """Raised when a log format is unknown or its data cannot be parsed."""
+
+
+class LogParser:
+    """Base class for access-log parsers.
+
+    Subclasses set ``pattern`` (an RE2 regex with named groups) and
+    implement ``build_columns`` to turn the extracted string fields into
+    the typed columns of ``SCHEMA``.
+    """
+
+    name = None
+    pattern = None
+    comment_prefix = None
+    # Whether lines whose timestamp cannot be parsed are rejected.
+    timestamp_required = False
+
+    def __init__(self, batch_lines=DEFAULT_BATCH_LINES):
+        self.batch_lines = batch_lines
+        self.lines_seen = 0
+        self.lines_rejected = 0
+        self.remainder = b''
+
+    def parse_chunks(self, chunks):
+        """Yield record batches parsed from an iterable of byte chunks.
+
+        Chunks may split lines anywhere; the incomplete tail of a chunk is
+        carried over to the next one. ``self.remainder`` holds whatever
+        follows the last newline once ``chunks`` is exhausted.
+        """
+        pending = []
+        pending_size = 0
+        remainder = b''
+        for chunk in chunks:
+            if not chunk:
+                continue
+            end = chunk.rfind(b'\n')
+            if end < 0:
+                remainder += chunk
+                continue
+            pending.append(remainder + chunk[:end])
+            remainder = bytes(chunk[end + 1:])
+            pending_size += end
+            if pending_size >= self.batch_lines * 128:
+                yield from self._parse_text(pending)
+                pending = []
+                pending_size = 0
+        if pending:
+            yield from self._parse_text(pending)
+        self.remainder = remainder
+
+    def parse_final(self):
+        """Parse the unterminated last line left by ``parse_chunks``, if any."""
+        if self.remainder:
+            yield from self._parse_text([self.remainder])
+            self.remainder = b''
+
+    def parse_stream(self, chunks):
+        """Yield record batches for a whole file given as byte chunks."""
+        yield from self.parse_chunks(chunks)
+        yield from self.parse_final()
+
+    def parse_buffer(self, buffer):
+        """Yield record batches for a whole file held in ``buffer``, such as an mmap.
+
+        The buffer is sliced at line boundaries and handed to Arrow without
+        being copied into Python bytes first.
+        """
+        data = pa.py_buffer(buffer)
+        window = self.batch_lines * 128
+        start = 0
+        while start < len(data):
+            end = len(data)
+            if end - start > window:
+                end = buffer.rfind(b'\n', start, start + window) + 1
+                if end <= start:
+                    # A line longer than the window: extend to its end.
+                    end = buffer.find(b'\n', start + window) + 1 or len(data)
+            yield from self._parse_buffer_window(data.slice(start, end - start))
+            start = end
+
+    def parse_lines(self, lines):
+        """Parse an Arrow string array of lines into a record batch."""
+        lines = pc.utf8_rtrim(lines, characters='\r')
+        if self.comment_prefix:
+            lines = lines.filter(pc.invert(pc.starts_with(lines, self.comment_prefix)))
+        lines = lines.filter(pc.not_equal(lines, ''))
+        fields = pc.extract_regex(lines, self.pattern)
+        valid = pc.is_valid(fields)
+        fields = fields.filter(valid)
+        self.lines_seen += len(lines)
+        self.lines_rejected += len(lines) - len(fields)
+        columns = {
+            name: fields.field(index)
+            for index, name in enumerate(field.name for field in fields.type)
+        }
+        built = self.build_columns(columns)
+        batch = pa.RecordBatch.from_arrays(
+            [built.get(field.name, pa.nulls(len(fields), field.type)).cast(field.type) for field in SCHEMA],
+            schema=SCHEMA,
+        )
+        if self.timestamp_required and batch.column('timestamp').null_count:
+            self.lines_rejected += batch.column('timestamp').null_count
+            batch = batch.filter(pc.is_valid(batch.column('timestamp')))
+        return batch
+
+    def build_columns(self, columns):
+        raise NotImplementedError
+
+    def _parse_text(self, blocks):
+        text = b'\n'.join(blocks).decode('utf-8', errors='replace')
+        yield from self._parse_split(pa.array([text], pa.large_string()))
+
+    def _parse_buffer_window(self, data):
+        offsets = pa.array([0, len(data)], pa.int64()).buffers()[1]
+        binary = pa.Array.from_buffers(pa.large_binary(), 1, [None, offsets, data])
+        try:
+            text = binary.cast(pa.large_string())
+        except pa.ArrowInvalid:
+            # Not valid UTF-8: decode with replacement characters instead.
+            yield from self._parse_text([data.to_pybytes()])
+            return
+        yield from self._parse_split(text)
+
+    def _parse_split(self, text):
+        lines = pc.split_pattern(text, '\n').flatten()
+        for offset in range(0, len(lines), self.batch_lines):
+            batch = self.parse_lines(lines.slice(offset, self.batch_lines).cast(pa.string()))
+            if batch.num_rows:
+                yield batch
+
+
+def _dash_to_null(array):
+    """Treat the ``-`` placeholder used by access logs as a missing value."""
+    return pc.if_else(pc.equal(array, '-'), pa.scalar(None, array.type), array)
+
+
+def _empty_to_null(array):
+    return pc.if_else(pc.equal(array, ''), pa.scalar(None, array.type), array)
+
+
+class CombinedLogParser(LogParser):
+    """Apache/Nginx combined log format; also accepts the common log format."""
+
+    name = 'combined'
+    pattern = (
+        r'^(?P<remote_addr>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] '
+        r'"(?:(?P<method>[A-Z]+) (?P<path>\S+)(?: (?P<protocol>[^"]*))?|' + QUOTED + r')" '
+        r'(?P<status>\d{3}) (?P<bytes>\d+|-)'
+        r'(?: "(?P<referer>' + QUOTED + r')" "(?P<user_agent>' + QUOTED + r')")?'
+    )
+
+    def build_columns(self, columns):
+        return {
+            'timestamp': pc.strptime(columns['time'], format='%d/%b/%Y:%H:%M:%S %z', unit='s', error_is_null=True),
+            'remote_addr': columns['remote_addr'],
+            'method': _empty_to_null(columns['method']),
+            'path': _empty_to_null(columns['path']),
+            'protocol': _empty_to_null(columns['protocol']),
+            'status': columns['status'],
+            'bytes': _dash_to_null(columns['bytes']),
+            'referer': _dash_to_null(_empty_to_null(columns['referer'])),
+            'user_agent': _dash_to_null(_empty_to_null(columns['user_agent'])),
+        }
+
+
+class CloudFrontLogParser(LogParser):
+    """Amazon CloudFront standard (tab-separated) access logs."""
+
+    name = 'cloudfront'
+    comment_prefix = '#'
+    pattern = (
+        r'^(?P<date>[^\t]+)\t(?P<time>[^\t]+)\t[^\t]*\t(?P<bytes>\d+|-)\t(?P<remote_addr>[^\t]*)\t'
+        r'(?P<method>[^\t]*)\t(?P<host>[^\t]*)\t(?P<path>[^\t]*)\t(?P<status>\d{3}|-)\t'
+        r'(?P<referer>[^\t]*)\t(?P<user_agent>[^\t]*)\t(?P<query>[^\t]*)'
+    )
+
+    def build_columns(self, columns):
+        timestamp = pc.binary_join_element_wise(columns['date'], columns['time'], ' ')
+        query = _dash_to_null(columns['query'])
+        path = pc.if_else(
+            pc.is_null(query),
+            columns['path'],
+            pc.binary_join_element_wise(columns['path'], query, '?'),
+        )
+        return {
+            'timestamp': pc.strptime(timestamp, format='%Y-%m-%d %H:%M:%S', unit='s', error_is_null=True),
+            'remote_addr': columns['remote_addr'],
+            'host': _dash_to_null(columns['host']),
+            'method': columns['method'],
+            'path': path,
+            'status': _dash_to_null(columns['status']),
+            'bytes': _dash_to_null(columns['bytes']),
+            'referer': _dash_to_null(columns['referer']),
+            # CloudFront URL-encodes spaces in user agents.
+            'user_agent': pc.replace_substring(_dash_to_null(columns['user_agent']), '%20', ' '),
+        }
+
+
+class ALBLogParser(LogParser):
+    """AWS Application Load Balancer access logs."""
+
+    name = 'alb'
+    timestamp_required = True
+    pattern = (
+        r'^\S+ (?P<time>\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?Z \S+ (?P<remote_addr>[^ ]+?):\d+ \S+ \S+ \S+ \S+ '
+        r'(?P<status>\d{3}|-) \S+ \S+ (?P<bytes>\d+|-) '
+        r'"(?P<method>\S+) (?:[a-zA-Z][a-zA-Z0-9+.-]*://(?P<host>[^/ ]*))?(?P<path>\S*) (?P<protocol>[^"]*)" '
+        r'"(?P<user_agent>' + QUOTED + r')"'
+    )
+
+    def build_columns(self, columns):
+        return {
+            # Fractions of a second are left out by the pattern.
+            'timestamp': pc.strptime(columns['time'], format='%Y-%m-%dT%H:%M:%S', unit='s', error_is_null=True),
+            'remote_addr': columns['remote_addr'],
+            'host': _empty_to_null(columns['host']),
+            'method': columns['method'],
+            'path': columns['path'],
+            'protocol': columns['protocol'],
+            'status': _dash_to_null(columns['status']),
+            'bytes': _dash_to_null(columns['bytes']),
+            'user_agent': _dash_to_null(columns['user_agent']),
+        }
+
+
+PARSERS = {parser.name: parser for parser in (CombinedLogParser, CloudFrontLogParser, ALBLogParser)}
+
+
+def get_parser(log_format, **kwargs):
+    """Return a new parser instance for ``log_format``."""
+    try:
+        return PARSERS[log_format](**kwargs)
+    except KeyError:
+        raise ParseError(f'Unknown log format: {log_format}')
@@ -0,0 +1,150 @@
+"""Threaded stages overlapping the fetch, parse and load steps of a sync."""
+import queue
+import threading
+
+
+_DONE = object()
+
+
+class FileTask:
+    """A remote file travelling through the pipeline.
+
+    Each stage fills in what it learns about the file (its content hash,
+    parser, tail checkpoint or error) before emitting the file's end marker,
+    so later stages can read it once they reach that marker. ``spooled`` is
+    a memory map of the file's spooled copy, for files that are not fetched.
+    """
+
+    def __init__(self, remote_file, reader=None):
+        self.remote_file = remote_file
+        self.reader = reader
+        self.spooled = None
+        self.offset = 0
+        self.bytes = 0
+        self.content_hash = ''
+        self.original = None
+        self.parser = None
+        self.checkpoint = (0, '')
+        self.error = None
+
+
+class ThreadedStage:
+    """Run an iterator on its own thread, at most ``depth`` items ahead of the consumer.
+
+    The bounded queue between the thread and the consumer applies the
+    backpressure: once it is full, the thread blocks until the consumer
+    catches up, so a slow loader stalls parsing and fetching instead of
+    letting buffered data grow. Errors raised by the iterator are raised
+    again in the consumer. Leaving the context stops the thread.
+    """
+
+    def __init__(self, iterable, depth, name=None):
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(iterable,), name=name, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+
+    def _run(self, iterable):
+        try:
+            for item in iterable:
+                if not self._put(item):
+                    return
+        except BaseException as e:
+            self._put(_Failure(e))
+        else:
+            self._put(_DONE)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def split_files(items):
+    """Group a stream of ``(task, item)`` pairs into ``(task, items)`` per file.
+
+    The items of every file end with a ``(task, None)`` marker. Each file's
+    items must be read before moving on to the next file; whatever is left
+    of a file its consumer gave up on is skipped. A file that failed in an
+    earlier stage raises ``task.error`` once its items are exhausted.
+    """
+    items = iter(items)
+    for task, item in items:
+        file_items = FileItems(task, item, items)
+        yield task, file_items
+        file_items.drain()
+
+
+class FileItems:
+    """Iterator over the items of one file in a ``split_files`` stream.
+
+    This is a plain iterator rather than a generator, so consumers that
+    close the generators wrapping it cannot cut the shared stream short.
+    """
+
+    def __init__(self, task, first, items):
+        self.task = task
+        self._first = first
+        self._items = items
+        self._started = False
+        self._done = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        if self._started:
+            _, item = next(self._items)
+        else:
+            item = self._first
+            self._started = True
+        if item is None:
+            self._done = True
+            if self.task.error is not None:
+                raise self.task.error
+            raise StopIteration
+        return item
+
+    def drain(self):
+        """Skip the rest of the file, without raising its error."""
+        while not self._done:
+            try:
+                next(self)
+            except StopIteration:
+                return
+            except Exception as e:
+                if e is not self.task.error:
+                    raise
+                return
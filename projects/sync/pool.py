@@ -0,0 +1,252 @@
+"""Process-wide pool of authenticated SFTP sessions."""
+import base64
+import binascii
+import hashlib
+import logging
+import socket
+import threading
+import time
+
+import paramiko
+from django.conf import settings
+from django.db import transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Leading words of the key types of known_hosts lines without a host name.
+_KEY_TYPE_PREFIXES = ('ssh-', 'ecdsa-', 'sk-')
+
+
+class HostKeyError(paramiko.SSHException):
+    """Raised when an SFTP server's host key is not the one stored for its log source."""
+
+
+def parse_host_keys(text):
+    """Return the ``(key type, base64 key)`` pairs of ``text``, one known_hosts line per key.
+
+    Lines may omit the host names, as in ``ssh-ed25519 AAAA...``. Raises
+    ``ValueError`` for lines that are not host keys.
+    """
+    keys = set()
+    for line in (text or '').splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        if not fields[0].startswith(_KEY_TYPE_PREFIXES):
+            fields = fields[1:]
+        if len(fields) < 2 or not fields[0].startswith(_KEY_TYPE_PREFIXES):
+            raise ValueError(f'Not a host key: {line.strip()}')
+        try:
+            base64.b64decode(fields[1], validate=True)
+        except binascii.Error:
+            raise ValueError(f'Not a host key: {line.strip()}')
+        keys.add((fields[0], fields[1]))
+    return keys
+
+
+def verify_host_key(log_source, server_key):
+    """Check ``server_key`` against the host keys of ``log_source``, before any credentials are sent.
+
+    A server without stored host keys is refused, unless
+    ``SFTP_TRUST_NEW_HOST_KEYS`` is set: its key is then stored and
+    required from then on, like OpenSSH's ``StrictHostKeyChecking=accept-new``.
+    Keys of existing log sources can be stored with ``pin_sftp_host_keys``.
+    """
+    presented = (server_key.get_name(), server_key.get_base64())
+    known = parse_host_keys(log_source.host_key)
+    if presented in known:
+        return
+    line = host_key_line(log_source, server_key)
+    if known:
+        raise HostKeyError(
+            f'Host key of {log_source.host} ({server_key.fingerprint}) does not match the stored host key; '
+            'the server may be impersonated'
+        )
+    if not settings.SFTP_TRUST_NEW_HOST_KEYS:
+        raise HostKeyError(
+            f'Host key of {log_source.host} is unknown ({server_key.fingerprint}); '
+            f'check it and add it to the log source, or store it with manage.py pin_sftp_host_keys: {line}'
+        )
+    logger.warning('Trusting new host key of %s: %s', log_source.host, server_key.fingerprint)
+    pin_host_key(log_source, line)
+
+
+def host_key_line(log_source, server_key):
+    """Return the known_hosts line of ``server_key``, as stored on ``log_source``."""
+    return f'{log_source.host} {server_key.get_name()} {server_key.get_base64()}'
+
+
+def pin_host_key(log_source, line):
+    """Store ``line`` as the host key of ``log_source``, unless another key was stored meanwhile.
+
+    The log source is saved, so that the cached pages and the search index
+    showing it are updated.
+    """
+    log_source.host_key = line
+    if log_source.pk is None:
+        return
+    with transaction.atomic():
+        stored = (
+            type(log_source)._default_manager.select_for_update()
+            .filter(pk=log_source.pk).values_list('host_key', flat=True).first()
+        )
+        if stored == '':
+            log_source.save(update_fields=['host_key'])
+
+
+def fetch_host_key(log_source):
+    """Return the host key the SFTP server of ``log_source`` presents, without authenticating."""
+    timeout = settings.SFTP_TIMEOUT
+    sock = socket.create_connection((log_source.host, log_source.port or 22), timeout=timeout)
+    try:
+        transport = paramiko.Transport(sock)
+    except BaseException:
+        sock.close()
+        raise
+    try:
+        transport.banner_timeout = transport.handshake_timeout = timeout
+        transport.start_client(timeout=timeout)
+        return transport.get_remote_server_key()
+    finally:
+        transport.close()
+
+
+class SFTPConnection:
+    """An authenticated SSH transport with its SFTP channel."""
+
+    def __init__(self, key, transport, sftp):
+        self.key = key
+        self.transport = transport
+        self.sftp = sftp
+        self.last_used = time.monotonic()
+
+    def is_alive(self):
+        return self.transport.is_active() and self.transport.is_authenticated()
+
+    def ping(self):
+        """Round-trip a cheap request to make sure the server still answers."""
+        try:
+            self.sftp.normalize('.')
+        except (paramiko.SSHException, OSError):
+            return False
+        return True
+
+    def close(self):
+        try:
+            self.sftp.close()
+        finally:
+            self.transport.close()
+
+
+class SFTPConnectionPool:
+    """Reuse SFTP sessions across files and projects in the same process.
+
+    Connections are keyed by ``(host, port, username, password digest,
+    host key digest)``, so every project pointing at the same server with
+    the same credentials and host keys shares sessions. Idle connections are closed after ``idle_timeout``
+    seconds, and a connection idle for more than ``health_check_after``
+    seconds is pinged before being handed out again.
+    """
+
+    def __init__(self, idle_timeout=None, health_check_after=None, max_idle_per_key=None):
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.SFTP_POOL_IDLE_TIMEOUT
+        self.health_check_after = (
+            health_check_after if health_check_after is not None else settings.SFTP_POOL_HEALTH_CHECK_AFTER
+        )
+        self.max_idle_per_key = max_idle_per_key or settings.SFTP_POOL_MAX_IDLE_PER_HOST
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(log_source):
+        password_digest = hashlib.sha256((log_source.password or '').encode()).hexdigest()
+        host_key_digest = hashlib.sha256(log_source.host_key.encode()).hexdigest()
+        return (log_source.host.lower(), log_source.port or 22, log_source.username, password_digest, host_key_digest)
+
+    def acquire(self, log_source):
+        """Return a healthy connection for ``log_source``, opening one if needed."""
+        key = self.key_for(log_source)
+        self.evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                connection = idle.pop() if idle else None
+            if connection is None:
+                return self._connect(key, log_source)
+            idle_for = time.monotonic() - connection.last_used
+            if connection.is_alive() and (idle_for < self.health_check_after or connection.ping()):
+                return connection
+            logger.info('Discarding stale SFTP connection to %s:%s', key[0], key[1])
+            connection.close()
+
+    def release(self, connection, healthy=True):
+        """Return ``connection`` to the pool, or close it if it is not reusable."""
+        if not healthy or not connection.is_alive():
+            connection.close()
+            return
+        connection.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle.setdefault(connection.key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def evict_idle(self):
+        """Close connections that have been idle for longer than ``idle_timeout``."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for key, idle in list(self._idle.items()):
+                expired.extend(connection for connection in idle if connection.last_used < cutoff)
+                idle[:] = [connection for connection in idle if connection.last_used >= cutoff]
+                if not idle:
+                    del self._idle[key]
+        for connection in expired:
+            connection.close()
+
+    def close_all(self):
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+    def _connect(self, key, log_source):
+        """Open a connection, verifying the server's host key before authenticating.
+
+        Connecting, the SSH handshake and every later SFTP request give up
+        after ``SFTP_TIMEOUT`` seconds, so a hung server fails the job
+        instead of blocking its worker.
+        """
+        logger.info('Opening SFTP connection to %s:%s', key[0], key[1])
+        timeout = settings.SFTP_TIMEOUT
+        sock = socket.create_connection((log_source.host, log_source.port or 22), timeout=timeout)
+        try:
+            transport = paramiko.Transport(sock)
+        except BaseException:
+            sock.close()
+            raise
+        try:
+            transport.banner_timeout = transport.handshake_timeout = transport.auth_timeout = timeout
+            transport.set_keepalive(settings.SFTP_POOL_KEEPALIVE)
+            transport.start_client(timeout=timeout)
+            verify_host_key(log_source, transport.get_remote_server_key())
+            # A newly trusted host key is part of the key the connection is pooled under.
+            key = self.key_for(log_source)
+            if not log_source.password:
+                raise paramiko.AuthenticationException(
+                    f'No password set for {log_source.username}@{log_source.host}; '
+                    'only password authentication is supported'
+                )
+            transport.auth_password(log_source.username, log_source.password)
+            sftp = paramiko.SFTPClient.from_transport(transport)
+            sftp.get_channel().settimeout(timeout)
+        except BaseException:
+            transport.close()
+            raise
+        return SFTPConnection(key, transport, sftp)
+
+
+sftp_pool = SFTPConnectionPool()
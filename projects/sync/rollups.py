@@ -0,0 +1,174 @@
+"""Rollup tables of hit counts, aggregated from log rows while they are loaded."""
+import logging
+import os
+import uuid
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .crawlers import ENRICHED_SCHEMA
+from .loaders import PARQUET_COMPRESSION, LoadError
+
+
+logger = logging.getLogger(__name__)
+
+
+# Measures of every rollup row. Rows of a rollup table are partial
+# aggregates: the rows of one group from different loads add up.
+MEASURES = ['hits', 'bytes']
+
+# Partial aggregates of a file merged into one table once there are more.
+MAX_FILE_PARTIALS = 16
+
+
+class RollupAggregator:
+    """Partial aggregates of one ``Rollup`` over the rows being loaded.
+
+    Every batch is reduced to its hits and bytes per period and group as
+    it is staged. Partials are mergeable, so the partials of a file are
+    merged into those of its load once the file is staged, and the ones
+    of a file that fails are dropped.
+
+    Columns grouped by are replaced by their ids with dimension tables,
+    and are null if the rows do not have them, e.g. ``crawler`` without
+    crawler classification.
+    """
+
+    def __init__(self, suffix, granularity, group_by):
+        self.suffix = suffix
+        self.periods = ['date', 'hour'] if granularity == 'hour' else ['date']
+        self.group_by = group_by
+        self.keys = None
+        self._file = []
+        self._staged = []
+
+    def add(self, batch):
+        """Aggregate the rows of a record batch into the current file."""
+        timestamp = batch.column('timestamp')
+        columns = {'date': pc.cast(timestamp, pa.date32())}
+        if 'hour' in self.periods:
+            columns['hour'] = pc.hour(timestamp)
+        names = batch.schema.names
+        for column in self.group_by:
+            if column in names:
+                columns[column] = batch.column(column)
+            elif f'{column}_id' in names:
+                columns[f'{column}_id'] = batch.column(f'{column}_id')
+            else:
+                columns[column] = pa.nulls(batch.num_rows, ENRICHED_SCHEMA.field(column).type)
+        self.keys = list(columns)
+        columns['bytes'] = batch.column('bytes')
+        partial = pa.table(columns).group_by(self.keys, use_threads=False).aggregate([
+            ('bytes', 'count', pc.CountOptions(mode='all')),
+            ('bytes', 'sum'),
+        ])
+        self._file.append(pa.table({
+            **{key: partial.column(key) for key in self.keys},
+            'hits': partial.column('bytes_count'),
+            'bytes': pc.fill_null(partial.column('bytes_sum'), 0),
+        }))
+        if len(self._file) > MAX_FILE_PARTIALS:
+            self._file = [self._merge(self._file)]
+
+    def begin_file(self):
+        self._file = []
+
+    def commit_file(self):
+        """Merge the partials of the current file into those of the load."""
+        if self._file:
+            self._staged = [self._merge(self._staged + self._file)]
+        self._file = []
+
+    def take(self):
+        """Return the merged partials of the load, or None if it had no rows, and start a new load."""
+        staged, self._staged = self._staged, []
+        self._file = []
+        return staged[0] if staged else None
+
+    def _merge(self, partials):
+        merged = pa.concat_tables(partials).group_by(self.keys, use_threads=False).aggregate(
+            [(measure, 'sum') for measure in MEASURES]
+        )
+        return pa.table({
+            **{key: merged.column(key) for key in self.keys},
+            **{measure: merged.column(f'{measure}_sum') for measure in MEASURES},
+        })
+
+
+class RollupSet:
+    """The active rollups of a project, loaded after the rows they count.
+
+    Like ``RowDeduplicator``, changes are transactional: ``begin_file``/
+    ``rollback_file`` drop the partials of a file that is not staged,
+    ``reset`` those of a load that failed, and ``commit`` writes those of
+    a successful load to ``root``. Committed rollup rows are then appended
+    to their tables by ``load``; rows that fail to load stay in ``root``
+    and are retried with the next load, so every loaded hit is counted
+    once.
+    """
+
+    def __init__(self, aggregators, root):
+        self.aggregators = aggregators
+        self.root = Path(root)
+
+    def add(self, batch):
+        for aggregator in self.aggregators:
+            aggregator.add(batch)
+
+    def begin_file(self):
+        for aggregator in self.aggregators:
+            aggregator.begin_file()
+
+    rollback_file = begin_file
+
+    def commit_file(self):
+        for aggregator in self.aggregators:
+            aggregator.commit_file()
+
+    def reset(self):
+        for aggregator in self.aggregators:
+            aggregator.take()
+
+    def commit(self):
+        """Write the rollup rows of the loaded files to ``root``, pending their load."""
+        for aggregator in self.aggregators:
+            table = aggregator.take()
+            if table is None:
+                continue
+            self.root.mkdir(parents=True, exist_ok=True)
+            path = self.root / f'{aggregator.suffix}-{uuid.uuid4().hex}.parquet'
+            partial = path.with_name(f'.{path.name}.tmp')
+            try:
+                pq.write_table(table, partial, compression=PARQUET_COMPRESSION)
+                os.replace(partial, path)
+            except BaseException:
+                partial.unlink(missing_ok=True)
+                raise
+
+    def load(self, loader):
+        """Append the pending rollup rows to their tables; return how many rows were loaded."""
+        rows = 0
+        for path in sorted(self.root.glob('*.parquet')):
+            suffix = path.name.rpartition('-')[0]
+            table = pq.read_table(path)
+            try:
+                loader.load_companion(suffix, table, partition_field='date')
+            except LoadError as e:
+                logger.warning('Rollup rows of %s stay pending: %s', suffix, e)
+                continue
+            path.unlink()
+            rows += table.num_rows
+        return rows
+
+
+def rollup_set(destination):
+    """Return the ``RollupSet`` of a ``Destination``'s project, or None if it has no active rollups."""
+    rollups = destination.project.rollups.filter(is_active=True)
+    aggregators = [RollupAggregator(rollup.name, rollup.granularity, rollup.group_by_columns) for rollup in rollups]
+    if not aggregators:
+        return None
+    root = Path(settings.SYNC_DESTINATION_DIR) / str(destination.project_id) / 'rollups' / destination.table_name
+    return RollupSet(aggregators, root)
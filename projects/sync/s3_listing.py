@@ -0,0 +1,186 @@
+"""Concurrent ListObjectsV2 listing of large S3 prefixes."""
+import queue
+import string
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Characters probed when splitting a flat (delimiter-less) key space.
+PROBE_CHARACTERS = sorted(set(string.digits + string.ascii_letters + '-_.=!'))
+
+# Pages buffered between the listing threads and the consumer.
+MAX_BUFFERED_PAGES = 32
+
+_DONE = object()
+
+
+# Keys listed by a partition: ``prefix`` and ``start_after < key < end_before``.
+# ``None`` bounds are open.
+Partition = namedtuple('Partition', ['prefix', 'start_after', 'end_before'])
+
+
+class ParallelS3Lister:
+    """List a bucket prefix by fanning out over derived sub-prefixes.
+
+    The prefix is first split into partitions: common prefixes returned
+    with ``Delimiter='/'`` (date folders, hex shard folders, ...), expanded
+    up to ``max_depth`` levels until there are enough of them to keep
+    ``concurrency`` threads busy. A flat level is split into key ranges
+    bounded by real keys found with one-key probes, so no key can fall
+    between partitions whatever characters it contains.
+
+    Partitions are listed concurrently and their objects merged into a
+    single stream, in no particular order.
+    """
+
+    def __init__(self, client, bucket, prefix='', concurrency=8, max_depth=3):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix or ''
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+
+    def iter_objects(self, start_after=None):
+        """Yield ``ListObjectsV2`` content entries for every key after ``start_after``."""
+        if self.concurrency <= 1:
+            yield from self._list(Partition(self.prefix, None, None), start_after)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            partitions, loose_objects = self._partition(executor, start_after)
+            yield from loose_objects
+            yield from self._merge(executor, partitions, start_after)
+
+    def _partition(self, executor, start_after):
+        """Return ``(partitions, objects)`` covering every key under the prefix.
+
+        ``objects`` are keys found directly at an expanded folder level,
+        which are not part of any partition.
+        """
+        partitions = [self.prefix]
+        loose_objects = []
+        for _ in range(self.max_depth):
+            if len(partitions) >= self.concurrency:
+                break
+            levels = list(executor.map(lambda prefix: self._delimited_level(prefix, start_after), partitions))
+            if all(not children for children, _ in levels):
+                break
+            expanded = []
+            for prefix, (children, objects) in zip(partitions, levels):
+                if children:
+                    expanded.extend(children)
+                    loose_objects.extend(objects)
+                else:
+                    expanded.append(prefix)
+            partitions = expanded
+
+        if len(partitions) == 1:
+            partitions, boundary_objects = self._split_flat(executor, partitions[0])
+            loose_objects.extend(
+                obj for obj in boundary_objects
+                if start_after is None or obj['Key'] > start_after
+            )
+            return partitions, loose_objects
+        return [Partition(prefix, None, None) for prefix in partitions], loose_objects
+
+    def _delimited_level(self, prefix, start_after):
+        """Return the sub-prefixes and objects directly under ``prefix``."""
+        children = []
+        objects = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            children.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+            objects.extend(
+                obj for obj in page.get('Contents', [])
+                if start_after is None or obj['Key'] > start_after
+            )
+        return children, objects
+
+    def _split_flat(self, executor, prefix):
+        """Split a flat prefix into key ranges bounded by probed keys.
+
+        Returns ``(partitions, boundary_objects)``: each range starts after
+        a boundary key and stops before the next one, so the boundary
+        objects themselves are returned separately.
+        """
+        def first_object(character):
+            response = self.client.list_objects_v2(Bucket=self.bucket, Prefix=prefix + character, MaxKeys=1)
+            contents = response.get('Contents')
+            return contents[0] if contents else None
+
+        boundaries = sorted(
+            (obj for obj in executor.map(first_object, PROBE_CHARACTERS) if obj is not None),
+            key=lambda obj: obj['Key'],
+        )
+        if not boundaries:
+            return [Partition(prefix, None, None)], []
+        keys = [obj['Key'] for obj in boundaries]
+        partitions = [Partition(prefix, None, keys[0])]
+        partitions.extend(
+            Partition(prefix, key, next_key)
+            for key, next_key in zip(keys, keys[1:] + [None])
+        )
+        return partitions, boundaries
+
+    def _merge(self, executor, partitions, start_after):
+        results = queue.Queue(maxsize=MAX_BUFFERED_PAGES)
+        stop = threading.Event()
+
+        def produce(partition):
+            if stop.is_set():
+                return
+            try:
+                batch = []
+                for obj in self._list(partition, start_after):
+                    if stop.is_set():
+                        return
+                    batch.append(obj)
+                    if len(batch) >= 1000:
+                        _put(results, batch, stop)
+                        batch = []
+                if batch:
+                    _put(results, batch, stop)
+            except Exception as e:
+                _put(results, e, stop)
+            finally:
+                _put(results, _DONE, stop)
+
+        for partition in partitions:
+            executor.submit(produce, partition)
+
+        remaining = len(partitions)
+        try:
+            while remaining:
+                item = results.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            stop.set()
+
+    def _list(self, partition, start_after):
+        lower = partition.start_after
+        if start_after is not None and (lower is None or start_after > lower):
+            lower = start_after
+        kwargs = {'Bucket': self.bucket, 'Prefix': partition.prefix}
+        if lower is not None:
+            kwargs['StartAfter'] = lower
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**kwargs):
+            for obj in page.get('Contents', []):
+                if partition.end_before is not None and obj['Key'] >= partition.end_before:
+                    return
+                yield obj
+
+
+def _put(results, item, stop):
+    while not stop.is_set():
+        try:
+            results.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
@@ -0,0 +1,154 @@
+"""Scheduler dispatching due project syncs to a pool of worker processes."""
+import logging
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import JobRun, Project, Schedule
+from . import worker
+from .engine import SyncResult
+
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Poll for due schedules and run their syncs in a bounded process pool.
+
+    At most ``max_workers`` syncs run at once, and at most
+    ``max_jobs_per_source`` of them against the same SFTP host or S3
+    bucket. Schedules that cannot start because of these caps stay due and
+    are picked up on a later tick.
+
+    Jobs whose worker died, or failed before recording their run, are
+    recorded as failed runs by the scheduler, and their schedule moves on
+    to its next occurrence, so that they are not dispatched again at once.
+    """
+
+    def __init__(self, max_workers=None, max_jobs_per_source=None, poll_interval=None):
+        self.max_workers = max_workers or settings.SCHEDULER_MAX_WORKERS
+        self.max_jobs_per_source = max_jobs_per_source or settings.SCHEDULER_MAX_JOBS_PER_SOURCE
+        self.poll_interval = poll_interval or settings.SCHEDULER_POLL_INTERVAL
+        self._running = {}
+        self._jobs_per_source = Counter()
+        self._stopping = False
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = self._create_executor()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+    def stop(self):
+        """Stop dispatching new jobs; running jobs are allowed to finish."""
+        self._stopping = True
+
+    def run_forever(self):
+        while not self._stopping:
+            self.tick()
+            self.wait(self.poll_interval)
+        self.wait()
+
+    def tick(self):
+        """Dispatch every due schedule that fits within the concurrency caps."""
+        close_old_connections()
+        dispatched = 0
+        due = Schedule.objects.due().exclude(
+            project_id__in=list(self._running)
+        ).select_related('project__log_source')
+        for schedule in due.iterator():
+            if len(self._running) >= self.max_workers:
+                break
+            log_source = getattr(schedule.project, 'log_source', None)
+            if log_source is None:
+                # Nothing to sync; move on to the next occurrence.
+                schedule.mark_run()
+                continue
+            source_key = log_source.concurrency_key
+            if self._jobs_per_source[source_key] >= self.max_jobs_per_source:
+                continue
+            self._submit(schedule.project_id, source_key)
+            dispatched += 1
+        return dispatched
+
+    def wait(self, timeout=None):
+        """Wait for running jobs, up to ``timeout`` seconds, and reap finished ones."""
+        if not self._running:
+            if timeout:
+                time.sleep(timeout)
+            return
+        futures = [future for future, _, _ in self._running.values()]
+        if timeout is None:
+            wait(futures)
+        else:
+            wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        self._reap()
+
+    def _create_executor(self):
+        # Spawned (not forked) workers never inherit the parent's database
+        # connections or open SFTP sessions.
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=worker.setup,
+        )
+
+    def _submit(self, project_id, source_key):
+        logger.info('Dispatching sync for project %s (%s)', project_id, source_key)
+        # Taken first, so that the run the worker records never starts before it.
+        dispatched_at = timezone.now()
+        future = self._executor.submit(worker.run_job, project_id)
+        self._running[project_id] = (future, source_key, dispatched_at)
+        self._jobs_per_source[source_key] += 1
+
+    def _reap(self):
+        broken = False
+        for project_id, (future, source_key, dispatched_at) in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[project_id]
+            self._jobs_per_source[source_key] -= 1
+            if not self._jobs_per_source[source_key]:
+                del self._jobs_per_source[source_key]
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                broken = True
+            if error is not None:
+                logger.error('Sync for project %s failed: %s', project_id, error)
+                self._record_failure(project_id, dispatched_at, error)
+            else:
+                result = SyncResult(*future.result())
+                logger.info(
+                    'Sync for project %s finished: %s files, %s bytes, %s rows, %s skipped, %s failed, %s duplicates',
+                    project_id, result.files, result.bytes, result.rows, result.skipped, result.failed,
+                    result.duplicates,
+                )
+        if broken and not self._running:
+            logger.warning('Worker pool terminated abruptly, starting a new one')
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+
+    def _record_failure(self, project_id, dispatched_at, error):
+        """Fail the run of a job, and move its schedule on, unless its worker did."""
+        close_old_connections()
+        runs = JobRun.objects.filter(project_id=project_id, started_at__gte=dispatched_at)
+        runs.filter(status=JobRun.Status.RUNNING).update(
+            status=JobRun.Status.FAILED, finished_at=timezone.now(), error=str(error)
+        )
+        if not runs.exists() and Project.objects.filter(pk=project_id).exists():
+            JobRun.objects.create(
+                project_id=project_id, started_at=dispatched_at, finished_at=timezone.now(),
+                status=JobRun.Status.FAILED, error=str(error),
+            )
+        schedule = Schedule.objects.filter(project_id=project_id).first()
+        if schedule is not None and (schedule.last_run_at is None or schedule.last_run_at < dispatched_at):
+            schedule.mark_run(dispatched_at)
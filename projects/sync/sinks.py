@@ -0,0 +1,72 @@
+"""Destinations that synced log files are streamed into."""
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+from .sources import SourceError
+
+
+class LocalDirectorySink:
+    """Mirror remote files into a local directory, one folder per project.
+
+    Chunks are appended to a ``.part`` file which is renamed into place once
+    the whole file has been written, so readers never see partial files.
+    Tailed files are the exception: their new bytes are appended in place.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.SYNC_DESTINATION_DIR)
+
+    def path_for(self, project, remote_file):
+        """Return the local path of ``remote_file``.
+
+        Raises ``SourceError`` for remote paths, such as S3 keys containing
+        ``..``, that would point outside the project's folder.
+        """
+        folder = (self.root / str(project.pk)).resolve()
+        target = (folder / remote_file.path.lstrip('/')).resolve()
+        if target == folder or not target.is_relative_to(folder):
+            raise SourceError(f'Remote path {remote_file.path!r} points outside the destination folder.')
+        return target
+
+    def size(self, project, remote_file):
+        """Return the size of the local copy of ``remote_file``, or None."""
+        try:
+            return self.path_for(project, remote_file).stat().st_size
+        except (FileNotFoundError, SourceError):
+            return None
+
+    def remove(self, project, remote_file):
+        """Delete the local copy of ``remote_file``, if any."""
+        self.path_for(project, remote_file).unlink(missing_ok=True)
+
+    def write(self, project, remote_file, chunks, offset=0):
+        """Write ``chunks`` for ``remote_file`` and return the number of bytes written.
+
+        With an ``offset``, the chunks replace whatever follows that offset
+        in the existing local copy.
+        """
+        target = self.path_for(project, remote_file)
+        if offset:
+            written = 0
+            with open(target, 'r+b') as fh:
+                fh.seek(offset)
+                fh.truncate()
+                for chunk in chunks:
+                    fh.write(chunk)
+                    written += len(chunk)
+            return written
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(target.name + '.part')
+        written = 0
+        try:
+            with open(partial, 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    written += len(chunk)
+            os.replace(partial, target)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return written
@@ -0,0 +1,289 @@
+"""Remote log sources that are listed and read in fixed-size chunks."""
+import posixpath
+import stat
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import paramiko
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+from .pool import sftp_pool
+from .s3_listing import ParallelS3Lister
+
+
+# Largest read paramiko issues in a single SFTP request.
+SFTP_BLOCK_SIZE = 32768
+
+
+RemoteFile = namedtuple('RemoteFile', ['path', 'size', 'mtime', 'etag'])
+
+
+class SourceError(Exception):
+    """Raised when a remote log source cannot be listed or read."""
+
+
+class BaseSource:
+    """Base class for remote log sources.
+
+    Sources are context managers: the connection is opened on enter and
+    closed on exit. File contents are only ever exposed as an iterator of
+    ``chunk_size`` byte strings so callers never hold a whole file in memory.
+    """
+
+    # Whether ``list_files`` honours ``start_after``.
+    resumes_listing = False
+
+    def __init__(self, log_source, chunk_size=None):
+        self.log_source = log_source
+        self.chunk_size = chunk_size or settings.SYNC_CHUNK_SIZE
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connect(self):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def list_files(self, start_after=None):
+        """Yield a ``RemoteFile`` for every file under the configured location.
+
+        Sources able to resume a listing skip paths sorting at or before
+        ``start_after``; the others ignore it.
+        """
+        raise NotImplementedError
+
+    def iter_chunks(self, path, offset=0):
+        """Yield the contents of ``path`` from byte ``offset`` on as successive chunks."""
+        raise NotImplementedError
+
+    def iter_files(self, requests):
+        """Yield ``(key, chunks)`` for every ``(key, remote_file)`` request, in order.
+
+        ``chunks`` iterates over the contents of ``remote_file`` like
+        ``iter_chunks``, or is None for requests without a file, and must be
+        consumed before the next file is requested. Sources may read
+        upcoming files before the consumer gets to them; read errors are
+        raised while iterating the chunks of the failed file.
+        """
+        for key, remote_file in requests:
+            yield key, self.iter_chunks(remote_file.path) if remote_file is not None else None
+
+
+class SFTPSource(BaseSource):
+    """Log source reading from an SFTP server directory.
+
+    Sessions are borrowed from the process-wide ``sftp_pool`` and handed
+    back on close, so consecutive files and projects on the same server
+    reuse one authenticated connection.
+
+    Directories of many small files are dominated by the round trips of
+    opening, reading and closing each file. ``iter_files`` therefore reads
+    files of up to ``SFTP_READ_AHEAD_MAX_SIZE`` bytes ahead of the
+    consumer, on ``SFTP_READ_AHEAD_CHANNELS`` extra SFTP channels of the
+    same SSH connection, so their round trips overlap.
+    """
+
+    def __init__(self, log_source, chunk_size=None, pool=None):
+        super().__init__(log_source, chunk_size)
+        self.pool = pool or sftp_pool
+        self._connection = None
+        self._sftp = None
+        self._healthy = True
+
+    def connect(self):
+        try:
+            self._connection = self.pool.acquire(self.log_source)
+        except (paramiko.SSHException, OSError) as e:
+            raise SourceError(f'Could not connect to {self.log_source.host}: {e}') from e
+        self._sftp = self._connection.sftp
+        self._healthy = True
+
+    def close(self):
+        if self._connection is not None:
+            self.pool.release(self._connection, healthy=self._healthy)
+            self._connection = None
+            self._sftp = None
+
+    def list_files(self, start_after=None):
+        directory = self.log_source.directory
+        try:
+            for attrs in self._sftp.listdir_attr(directory):
+                if not stat.S_ISREG(attrs.st_mode or 0):
+                    continue
+                yield RemoteFile(
+                    path=posixpath.join(directory, attrs.filename),
+                    size=attrs.st_size,
+                    mtime=attrs.st_mtime,
+                    etag='',
+                )
+        except (paramiko.SSHException, OSError) as e:
+            self._healthy = False
+            raise SourceError(f'Could not list {directory}: {e}') from e
+
+    def iter_chunks(self, path, offset=0):
+        return self._read_chunks(self._sftp, path, offset)
+
+    def iter_files(self, requests):
+        channels = settings.SFTP_READ_AHEAD_CHANNELS
+        if channels <= 1:
+            yield from super().iter_files(requests)
+            return
+        # ``(key, remote_file, future)``, with a future for files being read ahead.
+        pending = deque()
+        with _ChannelReader(self, channels) as reader:
+            for key, remote_file in requests:
+                future = None
+                if remote_file is not None and remote_file.size <= settings.SFTP_READ_AHEAD_MAX_SIZE:
+                    future = reader.submit(remote_file.path)
+                pending.append((key, remote_file, future))
+                # Keep every channel busy while the consumer works through the queue.
+                while len(pending) > 2 * channels:
+                    yield self._resolve(*pending.popleft())
+            while pending:
+                yield self._resolve(*pending.popleft())
+
+    def _resolve(self, key, remote_file, future):
+        if future is not None:
+            return key, _future_chunks(future)
+        if remote_file is not None:
+            return key, self.iter_chunks(remote_file.path)
+        return key, None
+
+    def _read_chunks(self, sftp, path, offset=0):
+        try:
+            with sftp.open(path, 'rb') as remote_file:
+                size = remote_file.stat().st_size
+                while offset < size:
+                    # readv() pipelines the block requests of one chunk, which
+                    # keeps the link busy without prefetching the whole file.
+                    end = min(offset + self.chunk_size, size)
+                    blocks = [
+                        (start, min(SFTP_BLOCK_SIZE, end - start))
+                        for start in range(offset, end, SFTP_BLOCK_SIZE)
+                    ]
+                    yield b''.join(remote_file.readv(blocks))
+                    offset = end
+        except (paramiko.SSHException, OSError) as e:
+            self._healthy = False
+            raise SourceError(f'Could not read {path}: {e}') from e
+
+
+class S3Source(BaseSource):
+    """Log source reading objects from an S3 bucket prefix.
+
+    Listings fan out over sub-prefixes of the configured prefix, see
+    ``ParallelS3Lister``.
+    """
+
+    resumes_listing = True
+
+    def __init__(self, log_source, chunk_size=None):
+        super().__init__(log_source, chunk_size)
+        self._client = None
+
+    def connect(self):
+        self._client = boto3.client(
+            's3',
+            region_name=self.log_source.region,
+            aws_access_key_id=self.log_source.access_key_id,
+            aws_secret_access_key=self.log_source.secret_access_key,
+            endpoint_url=settings.SYNC_S3_ENDPOINT_URL or None,
+            config=Config(max_pool_connections=max(10, settings.S3_LIST_CONCURRENCY)),
+        )
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def list_files(self, start_after=None):
+        lister = ParallelS3Lister(
+            self._client,
+            self.log_source.bucket_name,
+            self.log_source.prefix,
+            concurrency=settings.S3_LIST_CONCURRENCY,
+            max_depth=settings.S3_LIST_MAX_DEPTH,
+        )
+        try:
+            for obj in lister.iter_objects(start_after=start_after):
+                if obj['Key'].endswith('/'):
+                    continue
+                yield RemoteFile(
+                    path=obj['Key'],
+                    size=obj['Size'],
+                    mtime=obj['LastModified'].timestamp(),
+                    etag=obj['ETag'].strip('"'),
+                )
+        except (BotoCoreError, ClientError) as e:
+            raise SourceError(f'Could not list s3://{self.log_source.bucket_name}/{self.log_source.prefix}: {e}') from e
+
+    def iter_chunks(self, path, offset=0):
+        kwargs = {'Range': f'bytes={offset}-'} if offset else {}
+        try:
+            response = self._client.get_object(Bucket=self.log_source.bucket_name, Key=path, **kwargs)
+            body = response['Body']
+            try:
+                yield from body.iter_chunks(self.chunk_size)
+            finally:
+                body.close()
+        except (BotoCoreError, ClientError) as e:
+            raise SourceError(f'Could not read s3://{self.log_source.bucket_name}/{path}: {e}') from e
+
+
+class _ChannelReader:
+    """Read whole files on a thread pool, one extra SFTP channel per thread."""
+
+    def __init__(self, source, channels):
+        self.source = source
+        self._executor = ThreadPoolExecutor(max_workers=channels, thread_name_prefix='sftp-read-ahead')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._channels = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for sftp in self._channels:
+            sftp.close()
+
+    def submit(self, path):
+        return self._executor.submit(self._read, path)
+
+    def _read(self, path):
+        sftp = getattr(self._local, 'sftp', None)
+        if sftp is None:
+            try:
+                sftp = paramiko.SFTPClient.from_transport(self.source._connection.transport)
+                sftp.get_channel().settimeout(settings.SFTP_TIMEOUT)
+            except (paramiko.SSHException, OSError) as e:
+                self.source._healthy = False
+                raise SourceError(f'Could not open an SFTP channel: {e}') from e
+            self._local.sftp = sftp
+            with self._lock:
+                self._channels.append(sftp)
+        return list(self.source._read_chunks(sftp, path))
+
+
+def _future_chunks(future):
+    yield from future.result()
+
+
+def open_source(log_source, chunk_size=None):
+    """Return the source implementation for a ``LogSource``."""
+    if log_source.source_type == log_source.SourceType.SFTP:
+        return SFTPSource(log_source, chunk_size)
+    if log_source.source_type == log_source.SourceType.S3:
+        return S3Source(log_source, chunk_size)
+    raise SourceError(f'Unsupported source type: {log_source.source_type}')
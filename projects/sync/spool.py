@@ -0,0 +1,128 @@
+"""Disk spool keeping fetched files for a second pass without downloading them again."""
+import hashlib
+import logging
+import mmap
+import os
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class Spool:
+    """Local copies of remote files, kept under a byte quota.
+
+    Files retried after a failed run are written through to the spool
+    while they are fetched, and dropped once their rows are loaded. A file
+    whose load failed again stays in the spool, so later runs read it from
+    disk, memory-mapped, instead of fetching it again, as long as its
+    size, mtime and ETag are unchanged. Files are not spooled on their
+    first attempt, as most loads succeed and the copy would only cost
+    disk writes.
+
+    A spooled file's modification time records its last use. Whenever a
+    write takes the spool over ``quota`` bytes, the least recently used
+    files are removed. Several worker processes may share one spool
+    directory; each only counts its own writes between two evictions, so
+    a shared spool can briefly exceed its quota.
+    """
+
+    def __init__(self, project, root=None, quota=None):
+        self.project = project
+        self.root = Path(root or settings.SYNC_SPOOL_DIR)
+        self.quota = quota if quota is not None else settings.SYNC_SPOOL_QUOTA_BYTES
+        self._usage = None
+
+    @classmethod
+    def for_project(cls, project):
+        """Return the spool of ``project``, or None if spooling is disabled."""
+        if settings.SYNC_SPOOL_QUOTA_BYTES <= 0:
+            return None
+        return cls(project)
+
+    def path_for(self, remote_file):
+        identity = (self.project.pk, remote_file.path, remote_file.size, remote_file.mtime, remote_file.etag)
+        identity = '\0'.join(str(value) for value in identity)
+        return self.root / hashlib.sha256(identity.encode()).hexdigest()
+
+    def accepts(self, remote_file):
+        return 0 < remote_file.size <= self.quota
+
+    def open(self, remote_file):
+        """Return a read-only mmap of the spooled copy of ``remote_file``, or None."""
+        path = self.path_for(remote_file)
+        try:
+            with open(path, 'rb') as fh:
+                if os.fstat(fh.fileno()).st_size != remote_file.size:
+                    path.unlink(missing_ok=True)
+                    return None
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        # Mark the file as recently used.
+        os.utime(path)
+        return mapped
+
+    def write_through(self, remote_file, chunks):
+        """Yield ``chunks`` while copying them to the spool.
+
+        The copy only replaces the spooled file once every chunk has been
+        read; an interrupted copy is removed.
+        """
+        path = self.path_for(remote_file)
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.part')
+        try:
+            with open(partial, 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+                    yield chunk
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        if self._usage is None:
+            self.evict()
+        else:
+            self._usage += remote_file.size
+            if self._usage > self.quota:
+                self.evict()
+
+    def discard(self, remote_file):
+        try:
+            self.path_for(remote_file).unlink()
+        except FileNotFoundError:
+            return
+        if self._usage is not None:
+            self._usage = max(0, self._usage - remote_file.size)
+
+    def evict(self):
+        """Remove the least recently used files until the spool fits its quota."""
+        entries = []
+        total = 0
+        with os.scandir(self.root) as scan:
+            for entry in scan:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                if not entry.name.startswith('.'):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.quota:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Still open elsewhere on platforms that cannot delete open files.
+                logger.debug('Could not evict %s from the spool: %s', path, e)
+                continue
+            total -= size
+        self._usage = total
@@ -0,0 +1,86 @@
+"""Incremental reads of append-only files from the offset synced last time."""
+import hashlib
+
+
+# Bytes before the resume offset that must be unchanged for a file to be
+# considered appended to rather than replaced (SFTP has no inode numbers,
+# and S3 ETags change on every write).
+OVERLAP_BYTES = 4096
+
+# Longest incomplete last line that can be held back until the next sync.
+MAX_HELD_BACK_BYTES = 64 * 1024
+
+
+def overlap_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TailReader:
+    """Read ``path`` from ``offset`` on, if the file was only appended to.
+
+    ``open`` reads the ``OVERLAP_BYTES`` before ``offset`` and compares them
+    with ``digest``. If they differ, or there is no offset, the whole file
+    is read instead; ``open`` returns the offset iteration starts from.
+    ``checkpoint`` then gives the offset and digest to store for next time.
+    """
+
+    def __init__(self, source, path, offset=0, digest=''):
+        self.source = source
+        self.path = path
+        self.offset = offset
+        self.digest = digest
+        self.start = 0
+        self.position = 0
+        self._recent = b''
+        self._chunks = None
+
+    def open(self):
+        if self.offset and self.digest:
+            overlap_start = max(0, self.offset - OVERLAP_BYTES)
+            chunks = self.source.iter_chunks(self.path, offset=overlap_start)
+            overlap = b''
+            rest = b''
+            for chunk in chunks:
+                needed = self.offset - overlap_start - len(overlap)
+                overlap += chunk[:needed]
+                if len(overlap) == self.offset - overlap_start:
+                    rest = chunk[needed:]
+                    break
+            if len(overlap) == self.offset - overlap_start and overlap_digest(overlap) == self.digest:
+                self.start = self.position = self.offset
+                self._recent = overlap
+                self._chunks = _prepend(rest, chunks)
+                return self.start
+            chunks.close()
+        self.start = self.position = 0
+        self._recent = b''
+        self._chunks = self.source.iter_chunks(self.path)
+        return self.start
+
+    def __iter__(self):
+        if self._chunks is None:
+            self.open()
+        for chunk in self._chunks:
+            self.position += len(chunk)
+            # Keep enough trailing bytes to checkpoint before a held-back partial line.
+            self._recent = (self._recent + chunk)[-(OVERLAP_BYTES + MAX_HELD_BACK_BYTES):]
+            yield chunk
+
+    def checkpoint(self, held_back=0):
+        """Return ``(offset, digest)`` to resume from, ignoring the last ``held_back`` bytes.
+
+        ``held_back`` is typically an incomplete last line, at most
+        ``MAX_HELD_BACK_BYTES`` long, that will be read again next time.
+        """
+        offset = self.position - held_back
+        end = len(self._recent) - held_back
+        overlap = self._recent[max(0, end - OVERLAP_BYTES):max(0, end)]
+        if offset <= 0 or len(overlap) < min(OVERLAP_BYTES, offset):
+            return 0, ''
+        return offset, overlap_digest(overlap)
+
+
+def _prepend(first, chunks):
+    if first:
+        yield first
+    yield from chunks
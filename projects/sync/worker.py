@@ -0,0 +1,32 @@
+"""Entry points executed inside scheduler worker processes.
+
+This module must stay importable before Django is set up: worker
+processes unpickle these functions before ``setup()`` has run.
+"""
+
+
+def setup():
+    """Initialize Django in a freshly spawned worker process.
+
+    Ctrl+C sends SIGINT to the whole process group: workers ignore it, so
+    that the scheduler stops dispatching while running syncs finish.
+    """
+    import signal
+
+    import django
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+
+
+def run_job(project_id):
+    """Sync one project and return its ``SyncResult`` as a plain tuple."""
+    from django.db import close_old_connections
+
+    from .engine import run_project_sync
+
+    close_old_connections()
+    try:
+        return tuple(run_project_sync(project_id))
+    finally:
+        close_old_connections()
@@ -1,3 +1,1087 @@
-from django.test import TestCase
+import bz2
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import paramiko
+import pyarrow.parquet as pq
+import zstandard
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from clients.models import Client
+from . import cache
+from .cron import CronExpression
+from .models import Destination, FileFilter, JobRun, LogSource, ManifestEntry, Project, Rollup, Schedule
+from .sync import compression, loaders, worker
+from .sync.compression import DecompressionError, decompress_chunks
+from .sync.crawlers import CrawlerVerifier, DNSLookupError, PublishedRanges, UserAgentClassifier, VerificationCache
+from .sync.engine import run_project_sync
+from .sync.matchers import FileMatcher
+from .sync.parsers import ParseError, get_parser
+from .sync.pool import sftp_pool
+from .sync.scheduler import Scheduler
+from .sync.sources import RemoteFile, SFTPSource, SourceError, open_source
+from .sync.tailing import OVERLAP_BYTES
+
+
+GOOGLEBOT = 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)'
+BROWSER = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0'
+
+
+def access_lines(start, stop, day=16, address='66.249.66.1', user_agent=GOOGLEBOT):
+    """Return combined log lines requesting ``/p/<n>`` for ``start <= n < stop``."""
+    return b''.join(
+        b'%s - - [%02d/Oct/2026:13:%02d:36 +0000] "GET /p/%d HTTP/1.1" 200 %d "-" "%s"\n'
+        % (address.encode(), day, n % 60, n, n, user_agent.encode())
+        for n in range(start, stop)
+    )
+
+
+class SyncDirectoriesMixin:
+    """Point every directory the sync engine writes to at a temporary directory."""
+    
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        directories = override_settings(
+            SYNC_DESTINATION_DIR=str(self.tmp / 'data'),
+            SYNC_STAGING_DIR=str(self.tmp / 'staging'),
+            SYNC_SPOOL_DIR=str(self.tmp / 'spool'),
+            SYNC_LISTING_CACHE_DIR=str(self.tmp / 'listings'),
+            SYNC_CRAWLER_RANGES_DIR=str(self.tmp / 'ranges'),
+            SYNC_LISTING_CACHE_TTL=0,
+        )
+        directories.enable()
+        self.addCleanup(directories.disable)
+
+
+class _SFTPServerInterface(paramiko.ServerInterface):
+    
+    def get_allowed_auths(self, username):
+        return 'password'
+    
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == 'secret' else paramiko.AUTH_FAILED
+    
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED
+
+
+class _SFTPHandle(paramiko.SFTPHandle):
+    
+    def stat(self):
+        return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+
+
+class _LocalSFTPInterface(paramiko.SFTPServerInterface):
+    """Serve the files of a local directory, read-only."""
+    
+    def __init__(self, server, root):
+        super().__init__(server)
+        self.root = root
+    
+    def _local(self, path):
+        return os.path.join(self.root, path.lstrip('/'))
+    
+    def list_folder(self, path):
+        try:
+            names = os.listdir(self._local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        entries = []
+        for name in names:
+            attrs = paramiko.SFTPAttributes.from_stat(os.stat(os.path.join(self._local(path), name)))
+            attrs.filename = name
+            entries.append(attrs)
+        return entries
+    
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self._local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+    
+    lstat = stat
+    
+    def open(self, path, flags, attr):
+        try:
+            handle = _SFTPHandle(flags)
+            handle.readfile = open(self._local(path), 'rb')
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle.filename = path
+        return handle
+
+
+logging.getLogger('projects.tests.sftp').setLevel(logging.CRITICAL)
+
+
+class SFTPTestServer:
+    """SFTP server on a local port serving ``root``, accepting the password ``secret``."""
+    
+    host_key = paramiko.RSAKey.generate(2048)
+    
+    def __init__(self, root):
+        self.root = root
+        self.handshakes = 0
+        self._transports = []
+        self._socket = socket.socket()
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+    
+    def _serve(self):
+        while True:
+            try:
+                sock, _ = self._socket.accept()
+            except OSError:
+                return
+            self.handshakes += 1
+            transport = paramiko.Transport(sock)
+            # Clients hanging up once they have the host key are not errors here.
+            transport.set_log_channel('projects.tests.sftp')
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _LocalSFTPInterface, self.root)
+            transport.start_server(server=_SFTPServerInterface())
+            self._transports.append(transport)
+    
+    def host_key_line(self):
+        return f'127.0.0.1 {self.host_key.get_name()} {self.host_key.get_base64()}'
+    
+    def stop(self):
+        # Closing alone does not wake up a pending accept().
+        self._socket.shutdown(socket.SHUT_RDWR)
+        self._socket.close()
+        for transport in self._transports:
+            transport.close()
+        self._thread.join()
+
+
+class SFTPServerMixin:
+    """Run an ``SFTPTestServer`` for the test case, serving a fresh directory per test."""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.remote_root = Path(tempfile.mkdtemp())
+        cls.server = SFTPTestServer(str(cls.remote_root))
+    
+    @classmethod
+    def tearDownClass(cls):
+        sftp_pool.close_all()
+        cls.server.stop()
+        shutil.rmtree(cls.remote_root, ignore_errors=True)
+        super().tearDownClass()
+    
+    def setUp(self):
+        super().setUp()
+        self.remote_dir = self.remote_root / self._testMethodName
+        self.remote_dir.mkdir()
+    
+    def put(self, name, data):
+        (self.remote_dir / name).write_bytes(data)
+    
+    def sftp_log_source(self, project, **kwargs):
+        fields = {
+            'source_type': LogSource.SourceType.SFTP, 'host': '127.0.0.1', 'port': self.server.port,
+            'username': 'sync', 'password': 'secret', 'directory': f'/{self._testMethodName}',
+            'host_key': self.server.host_key_line(),
+        }
+        fields.update(kwargs)
+        return LogSource.objects.create(project=project, **fields)
+
+
+class ParserTests(SimpleTestCase):
+    """Parsers turn access-log lines into batches of the common schema."""
+    
+    def parse(self, log_format, data, chunk_size=None):
+        parser = get_parser(log_format)
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] if chunk_size else [data]
+        rows = [row for batch in parser.parse_stream(chunks) for row in batch.to_pylist()]
+        return rows, parser
+    
+    def test_combined(self):
+        data = (
+            b'66.249.66.1 - - [16/Oct/2026:13:55:36 +0200] "GET /a/b?x=1 HTTP/1.1" 200 2326 "https://ref/" '
+            b'"Mozilla/5.0 (compatible; Googlebot/2.1)"\n'
+            b'1.2.3.4 - frank [16/Oct/2026:13:55:37 +0000] "-" 400 - "-" "-"\n'
+            b'1.2.3.4 - - [16/Oct/2026:13:55:38 +0000] "POST /x HTTP/2.0" 301 0\n'
+            b'garbage line\n'
+            b'5.6.7.8 - - [16/Oct/2026:13:55:39 +0000] "GET /q HTTP/1.1" 200 5 "-" "curl"'
+        )
+        # Lines split across chunks anywhere parse the same.
+        for chunk_size in (None, 7, 50):
+            rows, parser = self.parse('combined', data, chunk_size)
+            self.assertEqual(rows[0], {
+                'timestamp': datetime(2026, 10, 16, 11, 55, 36, tzinfo=dt_timezone.utc),
+                'remote_addr': '66.249.66.1', 'host': None, 'method': 'GET', 'path': '/a/b?x=1',
+                'protocol': 'HTTP/1.1', 'status': 200, 'bytes': 2326, 'referer': 'https://ref/',
+                'user_agent': 'Mozilla/5.0 (compatible; Googlebot/2.1)',
+            })
+            self.assertEqual(
+                [(row['method'], row['path'], row['status'], row['bytes']) for row in rows[1:]],
+                [(None, None, 400, None), ('POST', '/x', 301, 0), ('GET', '/q', 200, 5)],
+            )
+            self.assertEqual(rows[2]['user_agent'], None)
+            self.assertEqual((parser.lines_seen, parser.lines_rejected), (5, 1))
+    
+    def test_combined_keeps_lines_with_an_invalid_timestamp(self):
+        rows, parser = self.parse('combined', b'1.2.3.4 - - [99/Xyz/2026:13:55:36 +0000] "GET / HTTP/1.1" 200 1\n')
+        self.assertEqual(len(rows), 1)
+        self.assertIsNone(rows[0]['timestamp'])
+        self.assertEqual(parser.lines_rejected, 0)
+    
+    def test_cloudfront(self):
+        data = (
+            b'#Version: 1.0\n'
+            b'#Fields: date time x-edge-location sc-bytes c-ip cs-method cs(Host) cs-uri-stem sc-status\n'
+            b'2026-10-16\t13:55:36\tLHR62-C2\t2390\t66.249.66.1\tGET\td111.cloudfront.net\t/index.html\t200\t-\t'
+            b'Mozilla/5.0%20(compatible;%20Googlebot/2.1)\ta=b\tHit\n'
+        )
+        rows, parser = self.parse('cloudfront', data)
+        self.assertEqual(rows, [{
+            'timestamp': datetime(2026, 10, 16, 13, 55, 36, tzinfo=dt_timezone.utc),
+            'remote_addr': '66.249.66.1', 'host': 'd111.cloudfront.net', 'method': 'GET',
+            'path': '/index.html?a=b', 'protocol': None, 'status': 200, 'bytes': 2390, 'referer': None,
+            'user_agent': 'Mozilla/5.0 (compatible; Googlebot/2.1)',
+        }])
+        self.assertEqual(parser.lines_rejected, 0)
+    
+    def test_alb(self):
+        data = (
+            b'https 2018-07-02T22:23:00.186641Z app/my-loadbalancer/50dc6c495c0c9188 192.168.131.39:2817 '
+            b'10.0.0.1:80 0.086 0.048 0.037 200 200 0 57 "GET https://www.example.com:443/p?q=1 HTTP/1.1" '
+            b'"curl/7.46.0" ECDHE-RSA-AES128-GCM-SHA256 TLSv1.2\n'
+            b'https notatime app/x 1.2.3.4:1 - 0 0 0 200 200 0 57 "GET https://a:443/ HTTP/1.1" "ua" - -\n'
+        )
+        rows, parser = self.parse('alb', data)
+        self.assertEqual(rows, [{
+            'timestamp': datetime(2018, 7, 2, 22, 23, 0, tzinfo=dt_timezone.utc),
+            'remote_addr': '192.168.131.39', 'host': 'www.example.com:443', 'method': 'GET', 'path': '/p?q=1',
+            'protocol': 'HTTP/1.1', 'status': 200, 'bytes': 57, 'referer': None, 'user_agent': 'curl/7.46.0',
+        }])
+        # ALB lines without a timestamp are rejected rather than loaded.
+        self.assertEqual(parser.lines_rejected, 1)
+    
+    def test_large_input_is_split_into_batches(self):
+        parser = get_parser('combined', batch_lines=1000)
+        data = access_lines(0, 5000)
+        batches = list(parser.parse_stream([data[i:i + 65536] for i in range(0, len(data), 65536)]))
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(sum(batch.num_rows for batch in batches), 5000)
+        self.assertEqual([row['path'] for batch in batches for row in batch.select(['path']).to_pylist()][-1], '/p/4999')
+    
+    def test_unknown_format(self):
+        with self.assertRaises(ParseError):
+            get_parser('w3c')
+
+
+class DecompressionTests(SimpleTestCase):
+    """Compressed files are decoded member by member, in parallel or not, with bounded chunks."""
+    
+    data = access_lines(0, 20000)
+    
+    def pieces(self, count):
+        size = len(self.data) // count + 1
+        return [self.data[i:i + size] for i in range(0, len(self.data), size)]
+    
+    def decompress(self, path, blob, threads, chunk_size=10000):
+        chunks = [blob[i:i + chunk_size] for i in range(0, len(blob), chunk_size)]
+        return list(decompress_chunks(path, chunks, threads=threads))
+    
+    def test_single_and_multi_member_files(self):
+        cases = {
+            'access.log.gz': gzip.compress(self.data),
+            'access.log.bz2': bz2.compress(self.data),
+            'access.log.zst': zstandard.ZstdCompressor().compress(self.data),
+            'multi.log.gz': b''.join(gzip.compress(piece) for piece in self.pieces(7)),
+            'multi.log.bz2': b''.join(bz2.compress(piece) for piece in self.pieces(7)),
+            'multi.log.zst': b''.join(zstandard.ZstdCompressor().compress(piece) for piece in self.pieces(7)),
+            # Compression is recognized from the content when the name does not tell.
+            'rotated-gzip': b''.join(gzip.compress(piece) for piece in self.pieces(3)),
+            'access.log': self.data,
+        }
+        with mock.patch.object(compression, 'PARALLEL_WINDOW', 64 * 1024):
+            for path, blob in cases.items():
+                for threads in (1, 4):
+                    with self.subTest(path=path, threads=threads):
+                        self.assertEqual(b''.join(self.decompress(path, blob, threads)), self.data)
+    
+    def test_truncated_and_trailing_garbage(self):
+        cases = {
+            'truncated.gz': gzip.compress(self.data)[:-100],
+            'truncated.zst': zstandard.ZstdCompressor().compress(self.data)[:-50],
+            'garbage.gz': b''.join(gzip.compress(piece) for piece in self.pieces(3)) + b'junkjunk',
+        }
+        with mock.patch.object(compression, 'PARALLEL_WINDOW', 64 * 1024):
+            for path, blob in cases.items():
+                for threads in (1, 4):
+                    with self.subTest(path=path, threads=threads), self.assertRaises(DecompressionError):
+                        self.decompress(path, blob, threads)
+    
+    def test_output_chunks_are_bounded(self):
+        output_chunk = 64 * 1024
+        data = self.data
+        cases = {
+            'access.log.gz': b''.join(gzip.compress(data) for _ in range(3)),
+            'access.log.bz2': b''.join(bz2.compress(data) for _ in range(3)),
+            'access.log.zst': b''.join(zstandard.ZstdCompressor().compress(data) for _ in range(3)),
+        }
+        with mock.patch.object(compression, 'OUTPUT_CHUNK', output_chunk):
+            for path, blob in cases.items():
+                for threads in (1, 4):
+                    with self.subTest(path=path, threads=threads):
+                        chunks = self.decompress(path, blob, threads, chunk_size=len(blob))
+                        self.assertEqual(b''.join(chunks), data * 3)
+                        # zstd output may exceed a chunk by what one input slice decodes to.
+                        limit = output_chunk + 128 * 1024 if path.endswith('.zst') else output_chunk
+                        self.assertLessEqual(max(map(len, chunks)), limit)
+
+
+class FileMatcherTests(SimpleTestCase):
+    
+    files = [
+        RemoteFile('logs/access.log', 10, 0, ''),
+        RemoteFile('logs/access.log.1.gz', 10, 0, ''),
+        RemoteFile('logs/error.log', 10, 0, ''),
+        RemoteFile('access/other.txt', 10, 0, ''),
+    ]
+    
+    def paths(self, filter_type, pattern):
+        return [remote_file.path for remote_file in FileMatcher(filter_type, pattern).filter(self.files)]
+    
+    def test_filter_types_match_the_file_name(self):
+        self.assertEqual(self.paths('starts_with', 'access'), ['logs/access.log', 'logs/access.log.1.gz'])
+        self.assertEqual(self.paths('contains', '.log'), ['logs/access.log', 'logs/access.log.1.gz', 'logs/error.log'])
+        self.assertEqual(self.paths('regex', r'\.\d+\.gz$'), ['logs/access.log.1.gz'])
+    
+    def test_patterns_are_literal_unless_regex(self):
+        self.assertEqual(self.paths('contains', '.*'), [])
+    
+    def test_unknown_filter_type(self):
+        with self.assertRaises(ValueError):
+            FileMatcher('glob', '*.log')
+
+
+class CronExpressionTests(SimpleTestCase):
+    
+    def next_after(self, expression, moment):
+        return CronExpression(expression).next_after(moment)
+    
+    def test_next_after(self):
+        moment = datetime(2026, 10, 16, 10, 7, 30, tzinfo=dt_timezone.utc)  # A Friday.
+        self.assertEqual(self.next_after('*/15 * * * *', moment), moment.replace(minute=15, second=0))
+        self.assertEqual(self.next_after('7 10 * * *', moment), datetime(2026, 10, 17, 10, 7, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.next_after('0 9 * * mon-fri', moment), datetime(2026, 10, 19, 9, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.next_after('0 0 1 jan *', moment), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+    
+    def test_day_of_month_or_day_of_week(self):
+        moment = datetime(2026, 10, 16, 10, 0, tzinfo=dt_timezone.utc)
+        # The 20th, or any Sunday (0 and 7 both mean Sunday), whichever comes first.
+        self.assertEqual(self.next_after('0 0 20 * 0', moment), datetime(2026, 10, 18, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.next_after('0 0 20 * 7', moment), datetime(2026, 10, 18, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.next_after('0 0 17 * 0', moment), datetime(2026, 10, 17, tzinfo=dt_timezone.utc))
+    
+    def test_invalid_expressions(self):
+        for expression in ['* * * *', '60 * * * *', '* * * foo *', '*/0 * * * *']:
+            with self.subTest(expression=expression), self.assertRaises(ValueError):
+                CronExpression(expression)
+        with self.assertRaises(ValueError):
+            self.next_after('0 0 31 2 *', timezone.now())
+
+
+class ScheduleTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.acme = Client.objects.create(name='Acme', created_by=cls.user)
+        cls.project = Project.objects.create(name='Site', client=cls.acme, created_by=cls.user)
+    
+    def test_next_run_at_is_computed_on_save(self):
+        schedule = Schedule.objects.create(project=self.project, cron_expression='*/5 * * * *')
+        now = timezone.now()
+        self.assertGreater(schedule.next_run_at, now - timedelta(minutes=1))
+        self.assertLessEqual(schedule.next_run_at, now + timedelta(minutes=5))
+        self.assertEqual(schedule.next_run_at.minute % 5, 0)
+        schedule.is_active = False
+        schedule.save()
+        self.assertIsNone(schedule.next_run_at)
+    
+    def test_due(self):
+        schedule = Schedule.objects.create(project=self.project, cron_expression='0 * * * *')
+        self.assertFalse(Schedule.objects.due(schedule.next_run_at - timedelta(seconds=1)).exists())
+        self.assertEqual(list(Schedule.objects.due(schedule.next_run_at)), [schedule])
+        schedule.is_active = False
+        schedule.save()
+        self.assertFalse(Schedule.objects.due(timezone.now() + timedelta(days=1)).exists())
+    
+    def test_mark_run_moves_to_the_next_occurrence(self):
+        schedule = Schedule.objects.create(project=self.project, cron_expression='0 * * * *')
+        started_at = schedule.next_run_at + timedelta(seconds=5)
+        # The expression was edited while the job ran.
+        Schedule.objects.filter(pk=schedule.pk).update(cron_expression='30 * * * *')
+        schedule.mark_run(started_at)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.last_run_at, started_at)
+        self.assertEqual(schedule.next_run_at, started_at.replace(minute=30, second=0, microsecond=0))
+
+
+class SchedulerTests(TransactionTestCase):
+    """The scheduler caps jobs per source and records jobs whose worker failed."""
+    
+    def setUp(self):
+        self.user = User.objects.create_user('editor', password='secret')
+        self.acme = Client.objects.create(name='Acme', created_by=self.user)
+        executor = mock.patch.object(Scheduler, '_create_executor', lambda scheduler: ThreadPoolExecutor(scheduler.max_workers))
+        executor.start()
+        self.addCleanup(executor.stop)
+    
+    def due_project(self, name, bucket):
+        project = Project.objects.create(name=name, client=self.acme, created_by=self.user)
+        LogSource.objects.create(project=project, source_type=LogSource.SourceType.S3, bucket_name=bucket)
+        schedule = Schedule.objects.create(project=project, cron_expression='*/5 * * * *')
+        Schedule.objects.filter(pk=schedule.pk).update(next_run_at=timezone.now() - timedelta(minutes=1))
+        return project
+    
+    def test_jobs_per_source_are_capped(self):
+        release = threading.Event()
+        first = self.due_project('First', 'shared')
+        self.due_project('Second', 'shared')
+        self.due_project('Other', 'other')
+        with mock.patch.object(worker, 'run_job', side_effect=lambda project_id: release.wait() and (0,) * 6):
+            with Scheduler(max_workers=4, max_jobs_per_source=1, poll_interval=1) as scheduler:
+                self.assertEqual(scheduler.tick(), 2)
+                self.assertEqual(scheduler.tick(), 0)
+                release.set()
+                scheduler.wait()
+                # Running jobs move their schedules on themselves; here only the second one is left.
+                Schedule.objects.filter(project=first).update(next_run_at=timezone.now() + timedelta(minutes=5))
+                Schedule.objects.filter(project__name='Other').update(next_run_at=timezone.now() + timedelta(minutes=5))
+                self.assertEqual(scheduler.tick(), 1)
+                scheduler.wait()
+    
+    def test_failed_job_is_recorded(self):
+        project = self.due_project('Site', 'bucket')
+        with mock.patch.object(worker, 'run_job', side_effect=RuntimeError('setup failed')):
+            with Scheduler(max_workers=2, poll_interval=1) as scheduler:
+                self.assertEqual(scheduler.tick(), 1)
+                with self.assertLogs('projects.sync.scheduler', 'ERROR'):
+                    scheduler.wait()
+                run = JobRun.objects.get(project=project)
+                self.assertEqual((run.status, run.error), (JobRun.Status.FAILED, 'setup failed'))
+                schedule = Schedule.objects.get(project=project)
+                self.assertIsNotNone(schedule.last_run_at)
+                self.assertGreater(schedule.next_run_at, timezone.now())
+                self.assertEqual(scheduler.tick(), 0)
+    
+    def test_running_run_of_a_dead_worker_is_failed(self):
+        project = self.due_project('Site', 'bucket')
+        
+        def crash(project_id):
+            JobRun.objects.create(project_id=project_id, started_at=timezone.now())
+            raise BrokenProcessPool('A process in the process pool was terminated abruptly')
+        
+        with mock.patch.object(worker, 'run_job', side_effect=crash):
+            with Scheduler(max_workers=2, poll_interval=1) as scheduler:
+                executor = scheduler._executor
+                scheduler.tick()
+                with self.assertLogs('projects.sync.scheduler', 'WARNING') as logs:
+                    scheduler.wait()
+                self.assertIn('starting a new one', logs.output[-1])
+                # A new pool replaces the broken one.
+                self.assertIsNot(scheduler._executor, executor)
+        run = JobRun.objects.get(project=project)
+        self.assertEqual(run.status, JobRun.Status.FAILED)
+        self.assertIsNotNone(run.finished_at)
+
+
+class SFTPPoolTests(SFTPServerMixin, SyncDirectoriesMixin, TestCase):
+    """SFTP sessions are pooled, and only servers with the stored host key are trusted."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.project = Project.objects.create(name='Site', client=Client.objects.create(name='Acme', created_by=cls.user), created_by=cls.user)
+    
+    def setUp(self):
+        super().setUp()
+        sftp_pool.close_all()
+        self.put('access.log', access_lines(0, 10))
+    
+    def list_paths(self, log_source):
+        with open_source(log_source) as source:
+            return [remote_file.path for remote_file in source.list_files()]
+    
+    def test_sessions_are_reused(self):
+        log_source = self.sftp_log_source(self.project)
+        handshakes = self.server.handshakes
+        for _ in range(3):
+            self.assertEqual(self.list_paths(log_source), [f'/{self._testMethodName}/access.log'])
+        self.assertEqual(self.server.handshakes, handshakes + 1)
+        with open_source(log_source) as source:
+            self.assertEqual(b''.join(source.iter_chunks(f'/{self._testMethodName}/access.log')), access_lines(0, 10))
+    
+    def test_unknown_host_key_is_refused(self):
+        log_source = self.sftp_log_source(self.project, host_key='')
+        with self.assertRaisesMessage(SourceError, 'pin_sftp_host_keys'):
+            self.list_paths(log_source)
+    
+    def test_changed_host_key_is_refused(self):
+        other_key = paramiko.RSAKey.generate(2048)
+        log_source = self.sftp_log_source(self.project, host_key=f'127.0.0.1 ssh-rsa {other_key.get_base64()}')
+        with self.assertRaisesMessage(SourceError, 'does not match'):
+            self.list_paths(log_source)
+    
+    @override_settings(SFTP_TRUST_NEW_HOST_KEYS=True)
+    def test_new_host_key_is_trusted_and_stored(self):
+        log_source = self.sftp_log_source(self.project, host_key='')
+        saved = []
+        receiver = lambda sender, instance, update_fields=None, **kwargs: saved.append(update_fields)
+        post_save.connect(receiver, sender=LogSource)
+        self.addCleanup(post_save.disconnect, receiver, sender=LogSource)
+        with self.assertLogs('projects.sync.pool', 'WARNING') as logs:
+            self.assertEqual(len(self.list_paths(log_source)), 1)
+        self.assertIn(self.server.host_key.fingerprint, logs.output[0])
+        log_source.refresh_from_db()
+        self.assertEqual(log_source.host_key, self.server.host_key_line())
+        self.assertEqual(saved, [frozenset({'host_key'})])
+    
+    def test_missing_password(self):
+        log_source = self.sftp_log_source(self.project, password='')
+        with self.assertRaisesMessage(SourceError, 'No password set'):
+            self.list_paths(log_source)
+    
+    def test_pin_host_keys_command(self):
+        log_source = self.sftp_log_source(self.project, host_key='')
+        out = io.StringIO()
+        call_command('pin_sftp_host_keys', '--dry-run', stdout=out)
+        self.assertIn(self.server.host_key.fingerprint, out.getvalue())
+        log_source.refresh_from_db()
+        self.assertEqual(log_source.host_key, '')
+        call_command('pin_sftp_host_keys', stdout=io.StringIO())
+        log_source.refresh_from_db()
+        self.assertEqual(log_source.host_key, self.server.host_key_line())
+        self.assertEqual(len(self.list_paths(log_source)), 1)
+
+
+class SyncEngineTests(SFTPServerMixin, SyncDirectoriesMixin, TestCase):
+    """End-to-end syncs from an SFTP server into a local destination."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.acme = Client.objects.create(name='Acme', created_by=cls.user)
+    
+    def setUp(self):
+        super().setUp()
+        self.project = Project.objects.create(name='Site', client=self.acme, created_by=self.user)
+        self.log_source = self.sftp_log_source(self.project)
+        FileFilter.objects.create(project=self.project, filter_type='starts_with', pattern='access', log_format='combined')
+        self.warehouse = self.tmp / 'warehouse'
+    
+    def destination(self, **kwargs):
+        fields = {'destination_type': 'local', 'directory': str(self.warehouse), 'partitioning': 'day', 'clustering_fields': ''}
+        fields.update(kwargs)
+        return Destination.objects.create(project=self.project, **fields)
+    
+    def table(self, suffix=''):
+        return pq.read_table(self.warehouse / f'access_logs{suffix}')
+    
+    def statuses(self):
+        return dict(ManifestEntry.objects.filter(project=self.project).values_list('path', 'status'))
+    
+    def remote_path(self, name):
+        return f'/{self._testMethodName}/{name}'
+    
+    def test_loads_files_into_date_partitions(self):
+        self.destination()
+        self.put('access.log-1.gz', gzip.compress(access_lines(0, 1000, day=15)))
+        self.put('access.log-2.bz2', bz2.compress(access_lines(1000, 1500)))
+        self.put('access.log-3', access_lines(1500, 1800) + b'garbage\n')
+        self.put('error.log', b'not an access log\n')
+        with self.assertLogs('projects.sync.engine', 'WARNING') as logs:
+            result = run_project_sync(self.project.pk)
+        self.assertIn('Skipped 1 of 301 lines', logs.output[0])
+        self.assertEqual((result.files, result.rows, result.failed, result.skipped), (3, 1800, 0, 0))
+        self.assertEqual(sorted(os.listdir(self.warehouse / 'access_logs')), ['date=2026-10-15', 'date=2026-10-16'])
+        table = self.table()
+        self.assertEqual(table.num_rows, 1800)
+        self.assertEqual(len(set(table.column('path').to_pylist())), 1800)
+        self.assertEqual(set(self.statuses().values()), {ManifestEntry.SyncStatus.SYNCED})
+        
+        # Files already synced are neither downloaded nor loaded again.
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows, result.skipped), (0, 0, 3))
+        self.assertEqual(self.table().num_rows, 1800)
+    
+    def test_run_is_recorded_with_stage_metrics(self):
+        self.destination()
+        self.put('access.log.gz', gzip.compress(access_lines(0, 500)))
+        schedule = Schedule.objects.create(project=self.project, cron_expression='0 * * * *')
+        run_project_sync(self.project.pk)
+        run = JobRun.objects.with_stage_metrics().get(project=self.project)
+        self.assertEqual(run.status, JobRun.Status.SUCCEEDED)
+        stages = {stage.stage: stage for stage in run.stage_metrics}
+        self.assertEqual(stages['parse'].rows, 500)
+        self.assertEqual(stages['load'].rows, 500)
+        self.assertEqual(stages['decompress'].bytes, len(access_lines(0, 500)))
+        self.assertEqual(stages['fetch'].files, 1)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.last_run_at, run.started_at)
+    
+    def test_corrupt_file_fails_alone(self):
+        self.destination()
+        self.put('access.log-1.gz', gzip.compress(access_lines(0, 100))[:-20])
+        self.put('access.log-2', access_lines(100, 200))
+        with self.assertLogs('projects.sync.engine', 'WARNING'):
+            result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows, result.failed), (1, 100, 1))
+        entry = ManifestEntry.objects.get(project=self.project, path=self.remote_path('access.log-1.gz'))
+        self.assertEqual(entry.status, ManifestEntry.SyncStatus.FAILED)
+        self.assertIn('gzip', entry.error.lower())
+        
+        # The failed file is retried once fixed.
+        self.put('access.log-1.gz', gzip.compress(access_lines(0, 100)))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows, result.failed, result.skipped), (1, 100, 0, 1))
+        self.assertEqual(self.table().num_rows, 200)
+    
+    def test_copies_of_a_file_are_duplicates(self):
+        self.destination()
+        self.put('access.log-1', access_lines(0, 100))
+        run_project_sync(self.project.pk)
+        self.put('access.log-1.copy', access_lines(0, 100))
+        self.put('access.log-2', access_lines(0, 100))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows, result.duplicates), (0, 0, 2))
+        self.assertEqual(self.statuses()[self.remote_path('access.log-2')], ManifestEntry.SyncStatus.DUPLICATE)
+        self.assertEqual(self.table().num_rows, 100)
+    
+    def test_duplicate_rows_are_dropped_across_runs(self):
+        self.destination(deduplicate_rows=True)
+        self.put('access.log-1', access_lines(0, 1000) + access_lines(0, 10))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual(result.rows, 1000)
+        # Overlapping rows, in a file with other bytes, on a later run.
+        self.put('access.log-2.gz', gzip.compress(access_lines(500, 1500)))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual(result.rows, 500)
+        paths = self.table().column('path').to_pylist()
+        self.assertEqual(len(paths), 1500)
+        self.assertEqual(len(set(paths)), 1500)
+    
+    def test_failed_load_keeps_duplicate_rows_loadable(self):
+        self.destination(deduplicate_rows=True)
+        self.put('access.log-1', access_lines(0, 100))
+        with mock.patch.object(loaders.LocalLoader, 'load', side_effect=loaders.LoadError('disk full')), \
+                self.assertLogs('projects.sync.engine', 'ERROR'):
+            result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.failed), (0, 1))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows), (1, 100))
+    
+    def test_tailed_files_resume_from_the_last_line(self):
+        self.destination(partitioning='none')
+        self.log_source.tail_files = True
+        self.log_source.save()
+        content = access_lines(0, 100) + b'66.249.66.1 - - [16/Oct/2026:13:00:36 +0000] "GET /partial'
+        self.put('access.log', content)
+        result = run_project_sync(self.project.pk)
+        self.assertEqual(result.rows, 100)
+        entry = ManifestEntry.objects.get(project=self.project)
+        self.assertEqual(entry.offset, len(access_lines(0, 100)))
+        
+        content += b' HTTP/1.1" 200 5 "-" "ua"\n' + access_lines(100, 150)
+        self.put('access.log', content)
+        fetched = []
+        read_chunks = SFTPSource._read_chunks
+        
+        def spy(source, sftp, path, offset=0):
+            fetched.append(offset)
+            return read_chunks(source, sftp, path, offset)
+        
+        with mock.patch.object(SFTPSource, '_read_chunks', spy):
+            result = run_project_sync(self.project.pk)
+        self.assertEqual(result.rows, 51)
+        # Only the bytes checked to be unchanged are read again.
+        self.assertEqual(fetched, [len(access_lines(0, 100)) - OVERLAP_BYTES])
+        paths = self.table().column('path').to_pylist()
+        self.assertEqual(len(paths), 151)
+        self.assertIn('/partial', paths)
+    
+    def test_retried_files_are_read_from_the_spool(self):
+        self.destination()
+        self.put('access.log-1.gz', gzip.compress(access_lines(0, 100)))
+        spool = self.tmp / 'spool'
+        fetched = []
+        read_chunks = SFTPSource._read_chunks
+        
+        def spy(source, sftp, path, offset=0):
+            fetched.append(path)
+            return read_chunks(source, sftp, path, offset)
+        
+        with mock.patch.object(SFTPSource, '_read_chunks', spy):
+            with mock.patch.object(loaders.LocalLoader, 'load', side_effect=loaders.LoadError('disk full')), \
+                    self.assertLogs('projects.sync.engine', 'ERROR'):
+                run_project_sync(self.project.pk)
+                self.assertFalse(spool.exists() and os.listdir(spool))
+                # Failed before: kept in the spool as it is downloaded again.
+                run_project_sync(self.project.pk)
+                self.assertEqual(len(os.listdir(spool)), 1)
+            result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows), (1, 100))
+        self.assertEqual(len(fetched), 2)
+        self.assertEqual(os.listdir(spool), [])
+    
+    def test_crawlers_dimensions_and_rollups(self):
+        ranges = self.tmp / 'ranges'
+        ranges.mkdir()
+        (ranges / 'googlebot.json').write_text(json.dumps({'prefixes': [{'ipv4Prefix': '66.249.64.0/19'}]}))
+        self.destination(classify_crawlers=True, normalize_dimensions=True)
+        Rollup.objects.create(project=self.project, name='daily_hits', group_by='path,status,crawler')
+        self.put('access.log', (
+            access_lines(0, 100)
+            + access_lines(0, 20, address='1.2.3.4')
+            + access_lines(0, 30, address='8.8.8.8', user_agent=BROWSER)
+        ))
+        with mock.patch('projects.sync.crawlers.SocketResolver') as resolver:
+            result = run_project_sync(self.project.pk)
+        resolver.return_value.reverse.assert_not_called()
+        self.assertEqual(result.rows, 150)
+        
+        facts = self.table()
+        self.assertNotIn('path', facts.column_names)
+        paths = dict(zip(*self.table('_paths').select(['path_id', 'path']).to_pydict().values()))
+        user_agents = dict(zip(*self.table('_user_agents').select(['user_agent_id', 'user_agent']).to_pydict().values()))
+        rows = sorted(
+            (paths[path_id], user_agents[user_agent_id], crawler, verified)
+            for path_id, user_agent_id, crawler, verified in zip(*facts.select(
+                ['path_id', 'user_agent_id', 'crawler', 'crawler_verified']
+            ).to_pydict().values())
+        )
+        self.assertEqual(len(rows), 150)
+        self.assertIn(('/p/5', GOOGLEBOT, 'googlebot', True), rows)
+        self.assertEqual(rows.count(('/p/5', GOOGLEBOT, 'googlebot', False)), 1)
+        self.assertIn(('/p/5', BROWSER, None, None), rows)
+        
+        rollup = self.table('_daily_hits').to_pydict()
+        self.assertEqual(sum(rollup['hits']), 150)
+        hits = {(crawler, paths[path_id]): count for crawler, path_id, count in zip(rollup['crawler'], rollup['path_id'], rollup['hits'])}
+        self.assertEqual(hits[('googlebot', '/p/5')], 2)
+        self.assertEqual(hits[(None, '/p/5')], 1)
+        
+        # Values already loaded are not loaded into the dimension tables again.
+        self.put('access.log-2', access_lines(0, 10) + access_lines(1000, 1010))
+        run_project_sync(self.project.pk)
+        paths = self.table('_paths').column('path').to_pylist()
+        self.assertEqual(len(paths), len(set(paths)))
+        self.assertEqual(len(paths), 110)
+    
+    def test_projects_without_destination_mirror_files(self):
+        self.put('access.log', access_lines(0, 10))
+        self.put('access.log-1.gz', gzip.compress(access_lines(10, 20)))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.bytes), (2, len(access_lines(0, 10)) + len(gzip.compress(access_lines(10, 20)))))
+        mirrored = self.tmp / 'data' / str(self.project.pk) / self._testMethodName
+        self.assertEqual((mirrored / 'access.log').read_bytes(), access_lines(0, 10))
+        self.assertEqual(sorted(os.listdir(mirrored)), ['access.log', 'access.log-1.gz'])
+    
+    def test_command(self):
+        self.destination()
+        self.put('access.log', access_lines(0, 10))
+        out = io.StringIO()
+        call_command('run_project_sync', self.project.pk, stdout=out)
+        self.assertIn('Synced 1 files', out.getvalue())
+        self.assertIn('10 rows', out.getvalue())
+    
+    def test_command_fails_on_unreachable_source(self):
+        self.log_source.password = 'wrong'
+        self.log_source.save()
+        with self.assertRaisesMessage(CommandError, 'Could not connect'):
+            call_command('run_project_sync', self.project.pk, stdout=io.StringIO())
+        self.assertEqual(JobRun.objects.get(project=self.project).status, JobRun.Status.FAILED)
+
+
+@skipUnless(importlib.util.find_spec('moto'), 'S3 tests need moto')
+class S3SourceTests(SyncDirectoriesMixin, TestCase):
+    """S3 listings are partitioned across threads and files deduplicated by ETag.
+    
+    Runs against a moto server, the way S3-compatible stores such as MinIO
+    are used, through ``SYNC_S3_ENDPOINT_URL``.
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from moto.server import ThreadedMotoServer
+        
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        cls.moto = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+        cls.moto.start()
+        cls.endpoint_url = f'http://127.0.0.1:{port}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.moto.stop()
+        super().tearDownClass()
+    
+    def setUp(self):
+        super().setUp()
+        import boto3
+        
+        endpoint = override_settings(SYNC_S3_ENDPOINT_URL=self.endpoint_url)
+        endpoint.enable()
+        self.addCleanup(endpoint.disable)
+        self.s3 = boto3.client(
+            's3', region_name='us-east-1', endpoint_url=self.endpoint_url,
+            aws_access_key_id='key', aws_secret_access_key='secret',
+        )
+        self.bucket = self._testMethodName.replace('_', '-')
+        self.s3.create_bucket(Bucket=self.bucket)
+        user = User.objects.create_user('editor', password='secret')
+        self.project = Project.objects.create(name='Site', client=Client.objects.create(name='Acme', created_by=user), created_by=user)
+        self.log_source = LogSource.objects.create(
+            project=self.project, source_type=LogSource.SourceType.S3, bucket_name=self.bucket, prefix='cdn/',
+            region='us-east-1', access_key_id='key', secret_access_key='secret',
+        )
+    
+    @override_settings(S3_LIST_CONCURRENCY=4)
+    def test_partitioned_listing_lists_every_key(self):
+        keys = {f'cdn/2026-10-{day:02d}/{shard:x}/access-{n}.log' for day in (15, 16) for shard in range(12) for n in range(3)}
+        keys |= {'cdn/loose.log', 'cdn/2026-10-16/loose.log', 'cdn/~tilde.log'}
+        for key in keys:
+            self.s3.put_object(Bucket=self.bucket, Key=key, Body=b'x')
+        self.s3.put_object(Bucket=self.bucket, Key='other/outside.log', Body=b'x')
+        with open_source(self.log_source) as source:
+            paths = [remote_file.path for remote_file in source.list_files()]
+            self.assertEqual(sorted(paths), sorted(keys))
+            resumed = [remote_file.path for remote_file in source.list_files(start_after='cdn/2026-10-16')]
+        self.assertEqual(sorted(resumed), sorted(key for key in keys if key > 'cdn/2026-10-16'))
+    
+    def test_sync_skips_copies_by_etag(self):
+        self.s3.put_object(Bucket=self.bucket, Key='cdn/access-1.log', Body=access_lines(0, 100))
+        Destination.objects.create(project=self.project, destination_type='local', directory=str(self.tmp / 'warehouse'))
+        result = run_project_sync(self.project.pk)
+        self.assertEqual((result.files, result.rows), (1, 100))
+        self.s3.copy_object(Bucket=self.bucket, Key='cdn/access-2.log', CopySource=f'{self.bucket}/cdn/access-1.log')
+        with mock.patch('projects.sync.sources.S3Source.iter_chunks') as iter_chunks:
+            result = run_project_sync(self.project.pk)
+        iter_chunks.assert_not_called()
+        self.assertEqual((result.files, result.duplicates, result.skipped), (0, 1, 1))
+
+
+class CrawlerVerifierTests(SyncDirectoriesMixin, SimpleTestCase):
+    """Crawler addresses are checked against published ranges, else with DNS."""
+    
+    class Resolver:
+        
+        def __init__(self):
+            self.lookups = []
+        
+        def reverse(self, address):
+            self.lookups.append(address)
+            if address == '8.8.4.4':
+                raise DNSLookupError('timed out')
+            return {
+                '157.55.39.1': 'msnbot-157-55-39-1.search.msn.com',
+                '1.2.3.4': 'msnbot.search.msn.com.attacker.net',
+                '5.6.7.8': 'fake.search.msn.com',
+            }.get(address)
+        
+        def forward(self, hostname):
+            return {'msnbot-157-55-39-1.search.msn.com': ['157.55.39.1'], 'fake.search.msn.com': ['9.9.9.9']}.get(hostname, [])
+    
+    def setUp(self):
+        super().setUp()
+        ranges = self.tmp / 'ranges'
+        ranges.mkdir()
+        (ranges / 'googlebot.json').write_text(json.dumps({'prefixes': [
+            {'ipv4Prefix': '66.249.64.0/19'}, {'ipv6Prefix': '2001:4860:4801::/48'},
+        ]}))
+        self.resolver = self.Resolver()
+        self.verifier = CrawlerVerifier(resolver=self.resolver, cache=VerificationCache(), ranges=PublishedRanges(ranges), threads=2)
+    
+    def test_published_ranges_decide_without_dns(self):
+        self.assertEqual(
+            self.verifier.verify_many([
+                ('googlebot', '66.249.66.1'), ('googlebot', '2001:4860:4801::5'), ('googlebot', '157.55.39.1'),
+            ]),
+            [True, True, False],
+        )
+        self.assertEqual(self.resolver.lookups, [])
+    
+    def test_reverse_and_forward_dns(self):
+        claims = [('bingbot', '157.55.39.1'), ('bingbot', '1.2.3.4'), ('bingbot', '5.6.7.8'), ('bingbot', '192.0.2.1')]
+        self.assertEqual(self.verifier.verify_many(claims), [True, False, False, False])
+        # Private and reserved addresses are never looked up.
+        self.assertNotIn('192.0.2.1', self.resolver.lookups)
+        self.assertEqual(self.verifier.verify_many(claims), [True, False, False, False])
+        self.assertEqual(len(self.resolver.lookups), 3)
+    
+    def test_failed_lookups_are_unknown_and_retried(self):
+        self.assertEqual(self.verifier.verify_many([('bingbot', '8.8.4.4')]), [None])
+        self.assertEqual(self.verifier.verify_many([('bingbot', '8.8.4.4')]), [None])
+        self.assertEqual(self.resolver.lookups, ['8.8.4.4', '8.8.4.4'])
+    
+    def test_user_agents(self):
+        classifier = UserAgentClassifier()
+        self.assertEqual(
+            [classifier.classify(user_agent) for user_agent in [
+                GOOGLEBOT, 'Googlebot-Image/1.0', 'Mozilla/5.0 (compatible; bingbot/2.0)',
+                'Mozilla/5.0 (Macintosh) Applebot/0.1', 'YandexBot/3.0', BROWSER,
+            ]],
+            ['googlebot', 'googlebot', 'bingbot', 'applebot', 'yandexbot', None],
+        )
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'projects-tests'}},
+    CONFIG_CACHE_TIMEOUT=60,
+)
+class ConfigCacheTests(TestCase):
+    """Project pages are served from the cache until what they show changes."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.project = Project.objects.create(name='Site', client=Client.objects.create(name='Acme', created_by=cls.user), created_by=cls.user)
+        cls.log_source = LogSource.objects.create(project=cls.project, source_type=LogSource.SourceType.S3, bucket_name='old-bucket')
+    
+    def setUp(self):
+        from django.core.cache import cache as default_cache
+        
+        default_cache.clear()
+        self.client.force_login(self.user)
+    
+    def get_detail(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('project_detail', args=[self.project.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+    
+    def test_cached_project_is_invalidated_on_save(self):
+        first, cold_queries = self.get_detail()
+        self.assertIn('old-bucket', first)
+        second, warm_queries = self.get_detail()
+        self.assertLess(warm_queries, cold_queries)
+        self.assertEqual(cache.stats()['project']['hits'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.log_source.bucket_name = 'new-bucket'
+            self.log_source.save()
+        page, _ = self.get_detail()
+        self.assertIn('new-bucket', page)
+        self.assertNotIn('old-bucket', page)
+    
+    def test_recording_a_run_keeps_the_cache(self):
+        schedule = Schedule.objects.create(project=self.project, cron_expression='0 * * * *')
+        self.get_detail()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            schedule.mark_run()
+        self.assertEqual(callbacks, [])
+    
+    def test_deleted_project_is_not_served(self):
+        self.get_detail()
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.get(pk=self.project.pk).delete()
+        self.assertEqual(self.client.get(reverse('project_detail', args=[self.project.pk])).status_code, 404)
+
+
+class FileFilterPreviewTests(TestCase):
+    
+    class Source:
+        
+        def __init__(self, log_source, remote_files):
+            self.log_source = log_source
+            self.remote_files = remote_files
+        
+        def __enter__(self):
+            return self
+        
+        def __exit__(self, *exc_info):
+            pass
+        
+        def list_files(self, start_after=None):
+            yield from self.remote_files
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.project = Project.objects.create(name='Site', client=Client.objects.create(name='Acme', created_by=cls.user), created_by=cls.user)
+        cls.log_source = LogSource.objects.create(project=cls.project, source_type=LogSource.SourceType.S3, bucket_name='logs')
+        FileFilter.objects.create(project=cls.project, filter_type='starts_with', pattern='access', log_format='combined')
+    
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.remote_files = [RemoteFile(f'logs/access-{n:03d}.log', n, 1760600000, '') for n in range(120)]
+        self.remote_files += [RemoteFile(f'logs/error-{n:03d}.log', n, 1760600000, '') for n in range(30)]
+        self.remote_files.append(RemoteFile('logs/access-undated.log', 1, None, ''))
+        patcher = mock.patch('projects.views.open_source', lambda log_source: self.Source(log_source, self.remote_files))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def preview(self, **params):
+        with override_settings(SYNC_LISTING_CACHE_TTL=0):
+            response = self.client.get(reverse('file_filter_preview', args=[self.project.pk]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_pages_of_matching_files(self):
+        first = self.preview()
+        self.assertEqual((first['listed'], first['matched'], first['complete']), (151, 121, True))
+        self.assertEqual(len(first['files']), 50)
+        self.assertTrue(first['has_next'])
+        self.assertEqual(first['files'][0]['modified'], '2025-10-16T07:33:20+00:00')
+        last = self.preview(page=3)
+        self.assertFalse(last['has_next'])
+        self.assertEqual(last['files'][-1], {'path': 'logs/access-undated.log', 'size': 1, 'modified': None})
+    
+    def test_unsaved_filter(self):
+        data = self.preview(filter_type='contains', pattern='error', log_format='combined')
+        self.assertEqual(data['matched'], 30)
+    
+    def test_listing_is_capped(self):
+        with mock.patch('projects.views.FILTER_PREVIEW_MAX_LISTED', 100):
+            data = self.preview()
+        self.assertEqual((data['listed'], data['matched'], data['complete']), (100, 100, False))
+
+
+class LoginRequiredTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('editor', password='secret')
+        cls.project = Project.objects.create(name='Site', client=Client.objects.create(name='Acme', created_by=user), created_by=user)
+    
+    def test_configuration_pages_require_login(self):
+        for name in ['configure_destination', 'configure_rollups', 'file_filter_preview']:
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=[self.project.pk]))
+                self.assertEqual(response.status_code, 302)
+                self.assertIn(reverse('login'), response['Location'])
@@ -11,6 +11,9 @@ urlpatterns = [
     # Configuration URLs
     path('<int:project_id>/configure/', views.project_configuration, name='project_configuration'),
     path('<int:project_id>/configure/log-source/', views.configure_log_source, name='configure_log_source'),
+    path('<int:project_id>/configure/destination/', views.configure_destination, name='configure_destination'),
+    path('<int:project_id>/configure/rollups/', views.configure_rollups, name='configure_rollups'),
     path('<int:project_id>/configure/file-filter/', views.configure_file_filter, name='configure_file_filter'),
+    path('<int:project_id>/configure/file-filter/preview/', views.file_filter_preview, name='file_filter_preview'),
     path('<int:project_id>/configure/schedule/', views.configure_schedule, name='configure_schedule'),
 ]
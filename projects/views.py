@@ -1,41 +1,62 @@
+from datetime import datetime, timezone
+from itertools import batched, islice
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
 from django.urls import reverse_lazy
 from django.db import transaction
-from .models import Project, LogSource, FileFilter, Schedule
-from .forms import ProjectForm, LogSourceForm, FileFilterForm, ScheduleForm
+from . import cache as config_cache
+from .models import Project, LogSource, Destination, FileFilter, Schedule
+from .forms import ProjectForm, LogSourceForm, DestinationForm, RollupFormSet, FileFilterForm, ScheduleForm
+from .sync.engine import LISTING_BATCH_SIZE
+from .sync.listing_cache import ListingCache, cached_listing
+from .sync.sources import SourceError, open_source
+from bigmomo_cms.pagination import KeysetPaginationMixin
 from clients.models import Client
+from search.index import matching_ids
+from search.models import SearchEntry
+
+
+# Number of recent job runs shown on the project detail page.
+JOB_HISTORY_SIZE = 20
+
+# Matching files returned per page of a file filter preview.
+FILTER_PREVIEW_PAGE_SIZE = 50
 
+# Remote files listed at most by a file filter preview, which lists the
+# source while the request waits.
+FILTER_PREVIEW_MAX_LISTED = 50000
 
-class ProjectListView(ListView):
+
+class ProjectListView(KeysetPaginationMixin, ListView):
     """List view for projects."""
     model = Project
     template_name = 'projects/project_list.html'
     context_object_name = 'projects'
-    ordering = ['name']
     
     def get_queryset(self):
-        """Get projects with related data."""
-        return Project.objects.select_related('client', 'created_by').prefetch_related('log_source', 'file_filter', 'schedule')
-    
-    def get_context_data(self, **kwargs):
-        """Add search and filter functionality."""
-        context = super().get_context_data(**kwargs)
+        """Get projects with related data, filtered by search and client."""
+        queryset = Project.objects.select_related('client', 'created_by', 'log_source', 'file_filter', 'schedule')
         search = self.request.GET.get('search')
         client_id = self.request.GET.get('client')
         
-        queryset = context['projects']
-        
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            queryset = queryset.filter(pk__in=matching_ids(search, SearchEntry.Kind.PROJECT))
         
-        if client_id:
+        if client_id and client_id.isdigit():
             queryset = queryset.filter(client_id=client_id)
         
-        context['projects'] = queryset
-        context['clients'] = Client.objects.all()
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        """Add the client filtered by; others are looked up with the search API as the user types."""
+        context = super().get_context_data(**kwargs)
+        client_id = self.request.GET.get('client')
+        if client_id and client_id.isdigit():
+            context['selected_client'] = Client.objects.only('id', 'name').filter(pk=client_id).first()
         return context
 
 
@@ -45,14 +66,33 @@ class ProjectDetailView(DetailView):
     template_name = 'projects/project_detail.html'
     context_object_name = 'project'
     
+    def get_object(self, queryset=None):
+        """Get the project and its configuration from the configuration cache."""
+        return config_cache.get_project(self.kwargs['pk'])
+    
     def get_context_data(self, **kwargs):
-        """Add related configuration data."""
+        """Add related configuration data and its cached cards."""
         context = super().get_context_data(**kwargs)
         project = context['project']
         
-        context['log_source'] = getattr(project, 'log_source', None)
-        context['file_filter'] = getattr(project, 'file_filter', None)
-        context['schedule'] = getattr(project, 'schedule', None)
+        configuration = {
+            'project': project,
+            'log_source': getattr(project, 'log_source', None),
+            'file_filter': getattr(project, 'file_filter', None),
+            'schedule': getattr(project, 'schedule', None),
+            'destination': getattr(project, 'destination', None),
+            'rollups': project.rollups.all(),
+        }
+        context['configuration_cards'] = config_cache.render_fragment(
+            project, 'projects/_project_configuration.html', configuration
+        )
+        context['configuration_status'] = config_cache.render_fragment(
+            project, 'projects/_configuration_status.html', configuration
+        )
+        # Run times change with every run, in the scheduler's processes: they are never cached.
+        if configuration['schedule'] is not None:
+            context['run_times'] = Schedule.objects.filter(project=project).values('next_run_at', 'last_run_at').first()
+        context['job_runs'] = project.job_runs.with_stage_metrics().order_by('-started_at')[:JOB_HISTORY_SIZE]
         
         return context
 
@@ -119,6 +159,49 @@ def configure_log_source(request, project_id):
     })
 
 
+@login_required
+def configure_destination(request, project_id):
+    """Configure destination for a project."""
+    project = get_object_or_404(Project, id=project_id)
+    destination = getattr(project, 'destination', None)
+    
+    if request.method == 'POST':
+        form = DestinationForm(request.POST, instance=destination)
+        if form.is_valid():
+            destination = form.save(commit=False)
+            destination.project = project
+            destination.save()
+            messages.success(request, 'Destination configured successfully.')
+            return redirect('project_detail', pk=project_id)
+    else:
+        form = DestinationForm(instance=destination)
+    
+    return render(request, 'projects/configure_destination.html', {
+        'form': form,
+        'project': project
+    })
+
+
+@login_required
+def configure_rollups(request, project_id):
+    """Configure the rollups of a project."""
+    project = get_object_or_404(Project, id=project_id)
+    
+    if request.method == 'POST':
+        formset = RollupFormSet(request.POST, instance=project)
+        if formset.is_valid():
+            formset.save()
+            messages.success(request, 'Rollups configured successfully.')
+            return redirect('project_detail', pk=project_id)
+    else:
+        formset = RollupFormSet(instance=project)
+    
+    return render(request, 'projects/configure_rollups.html', {
+        'formset': formset,
+        'project': project
+    })
+
+
 def configure_file_filter(request, project_id):
     """Configure file filter for a project."""
     project = get_object_or_404(Project, id=project_id)
@@ -141,6 +224,76 @@ def configure_file_filter(request, project_id):
     })
 
 
+@login_required
+def file_filter_preview(request, project_id):
+    """List the remote files a file filter matches, one page at a time, as JSON.
+
+    The filter fields can be passed in the query string to preview a filter
+    before saving it; otherwise the saved filter is used. The source's
+    listing is cached (see ``ListingCache``), and ``refresh`` lists it again.
+    Only the first ``FILTER_PREVIEW_MAX_LISTED`` files are listed; ``complete``
+    is false when the source holds more.
+    """
+    project = get_object_or_404(Project.objects.select_related('log_source', 'file_filter'), id=project_id)
+    log_source = getattr(project, 'log_source', None)
+    if log_source is None:
+        return JsonResponse({'error': 'No log source configured.'}, status=400)
+    
+    file_filter = getattr(project, 'file_filter', None)
+    if 'pattern' in request.GET:
+        form = FileFilterForm(request.GET, instance=file_filter)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+        file_filter = form.instance
+    
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    start = (page - 1) * FILTER_PREVIEW_PAGE_SIZE
+    end = start + FILTER_PREVIEW_PAGE_SIZE
+    
+    if request.GET.get('refresh'):
+        ListingCache(log_source).invalidate()
+    matcher = file_filter.get_matcher() if file_filter is not None else None
+    files = []
+    listed = matched = 0
+    complete = True
+    try:
+        with open_source(log_source) as source:
+            listing = cached_listing(source)
+            # One more file than the cap tells whether the source holds more.
+            for batch in batched(islice(listing, FILTER_PREVIEW_MAX_LISTED + 1), LISTING_BATCH_SIZE):
+                if listed + len(batch) > FILTER_PREVIEW_MAX_LISTED:
+                    batch = batch[:FILTER_PREVIEW_MAX_LISTED - listed]
+                    complete = False
+                listed += len(batch)
+                for remote_file in matcher.filter(batch) if matcher is not None else batch:
+                    if start <= matched < end:
+                        files.append({
+                            'path': remote_file.path,
+                            'size': remote_file.size,
+                            'modified': (
+                                datetime.fromtimestamp(remote_file.mtime, timezone.utc).isoformat()
+                                if remote_file.mtime is not None else None
+                            ),
+                        })
+                    matched += 1
+            listing.close()
+    except SourceError as e:
+        return JsonResponse({'error': str(e)}, status=502)
+    
+    return JsonResponse({
+        'page': page,
+        'page_size': FILTER_PREVIEW_PAGE_SIZE,
+        'listed': listed,
+        'matched': matched,
+        'has_next': matched > end,
+        'complete': complete,
+        'files': files,
+    })
+
+
 def configure_schedule(request, project_id):
     """Configure schedule for a project."""
     project = get_object_or_404(Project, id=project_id)
@@ -165,7 +318,11 @@ def configure_schedule(request, project_id):
 
 def project_configuration(request, project_id):
     """Complete project configuration view."""
-    project = get_object_or_404(Project, id=project_id)
+    # Forms are saved onto the current rows, never onto cached copies.
+    if request.method == 'POST':
+        project = get_object_or_404(Project, id=project_id)
+    else:
+        project = config_cache.get_project(project_id)
     
     if request.method == 'POST':
         log_source_form = LogSourceForm(request.POST, instance=getattr(project, 'log_source', None))
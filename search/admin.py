@@ -0,0 +1,18 @@
+from django.contrib import admin
+from .models import SearchEntry
+
+
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    """Read-only admin interface for SearchEntry model; entries follow the indexed objects."""
+    
+    list_display = ['title', 'kind', 'object_id', 'url']
+    list_filter = ['kind']
+    search_fields = ['title']
+    ordering = ['kind', 'title']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,205 @@
+"""Full-text search index over clients, projects, log sources and users.
+
+Every indexed object has a ``SearchEntry`` row, updated by signals when
+the object is saved or deleted. The rows are indexed by the database:
+
+- SQLite: an FTS5 table with the trigram tokenizer, kept in sync with
+  ``search_searchentry`` by triggers and ranked with BM25.
+- PostgreSQL: a ``pg_trgm`` GIN index over the title and body, ranked
+  with ``ts_rank`` and trigram similarity.
+
+Like the ``icontains`` lookups they replace, every term of a query
+matches anywhere in a word, case-insensitively. Other databases, and
+SQLite terms shorter than a trigram, fall back to ``icontains`` on the
+search entries.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import SearchEntry
+
+
+# Results per page of the search API.
+SEARCH_PAGE_SIZE = 20
+
+# FTS5 table indexing the title and body of ``search_searchentry``.
+FTS_TABLE = 'search_searchentry_fts'
+
+# Shortest term the trigram indexes can match.
+TRIGRAM_LENGTH = 3
+
+# BM25 weights of the title and body columns; title matches rank first.
+BM25_WEIGHTS = (10.0, 1.0)
+
+# Indexed text of PostgreSQL entries, as in the trigram index expression.
+_POSTGRES_DOCUMENT = "(title || ' ' || body)"
+
+# Objects listed in the index are saved in bulk at most this many at a time.
+REBUILD_BATCH_SIZE = 1000
+
+
+def _client_document(client):
+    return client.name, '', reverse('client_edit', args=[client.pk])
+
+
+def _project_document(project):
+    return project.name, project.description, reverse('project_detail', args=[project.pk])
+
+
+def _log_source_document(log_source):
+    if log_source.source_type == 's3':
+        title = f"S3 - {log_source.bucket_name}/{log_source.prefix}"
+    else:
+        title = f"SFTP - {log_source.host}:{log_source.port}"
+    fields = [log_source.host, log_source.directory, log_source.bucket_name, log_source.prefix, log_source.region]
+    return title, ' '.join(field for field in fields if field), reverse('configure_log_source', args=[log_source.project_id])
+
+
+def _user_document(user):
+    fields = [user.first_name, user.last_name, user.email]
+    return user.username, ' '.join(field for field in fields if field), reverse('user_edit', args=[user.pk])
+
+
+# Indexed models by label, with the kind of their entries and the function
+# returning their title, body and URL. Documents only read model fields,
+# so they also work on the historical models of migrations.
+DOCUMENTS = {
+    'clients.Client': (SearchEntry.Kind.CLIENT, _client_document),
+    'projects.Project': (SearchEntry.Kind.PROJECT, _project_document),
+    'projects.LogSource': (SearchEntry.Kind.LOG_SOURCE, _log_source_document),
+    'accounts.User': (SearchEntry.Kind.USER, _user_document),
+}
+
+
+def _entry(kind, document, instance, entry_model=SearchEntry):
+    title, body, url = document(instance)
+    return entry_model(kind=kind, object_id=instance.pk, title=title[:255], body=body, url=url)
+
+
+def index_instance(instance):
+    """Create or update the search entry of a saved object."""
+    kind, document = DOCUMENTS[instance._meta.label]
+    entry = _entry(kind, document, instance)
+    SearchEntry.objects.update_or_create(
+        kind=kind, object_id=instance.pk,
+        defaults={'title': entry.title, 'body': entry.body, 'url': entry.url},
+    )
+
+
+def remove_instance(instance):
+    """Delete the search entry of a deleted object."""
+    kind, _ = DOCUMENTS[instance._meta.label]
+    SearchEntry.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def rebuild(apps=None, entry_model=SearchEntry):
+    """Replace every search entry with one per indexed object; return how many there are.
+
+    Objects saved without signals, e.g. by ``bulk_create`` or ``update``,
+    are only found after a rebuild. ``apps`` is the app registry of a
+    migration, if called from one.
+    """
+    from django.apps import apps as installed_apps
+
+    apps = apps or installed_apps
+    entry_model.objects.all().delete()
+    count = 0
+    for label, (kind, document) in DOCUMENTS.items():
+        model = apps.get_model(label)
+        batch = []
+        for instance in model._base_manager.order_by('pk').iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(_entry(kind, document, instance, entry_model))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                count += len(entry_model.objects.bulk_create(batch))
+                batch = []
+        count += len(entry_model.objects.bulk_create(batch))
+    return count
+
+
+def _uses_fts(terms):
+    return connection.vendor == 'sqlite' and all(len(term) >= TRIGRAM_LENGTH for term in terms)
+
+
+def _fts_query(terms):
+    """Return an FTS5 query matching every term as a substring."""
+    return ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _kind_condition(kinds):
+    if kinds is None:
+        return '', []
+    return f" AND search_searchentry.kind IN ({', '.join(['%s'] * len(kinds))})", list(kinds)
+
+
+def matching_entries(query, kinds=None):
+    """Return the ``SearchEntry`` queryset of the entries matching every term of ``query``, unordered."""
+    terms = query.split()
+    if not terms or kinds is not None and not kinds:
+        return SearchEntry.objects.none()
+    kind_condition, kind_params = _kind_condition(kinds)
+    # Entries are filtered by kind within the subqueries, so that they are
+    # then looked up by id rather than by scanning every entry of a kind.
+    # CROSS JOIN makes SQLite start from the FTS matches.
+    if _uses_fts(terms):
+        return SearchEntry.objects.filter(id__in=RawSQL(
+            f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} CROSS JOIN search_searchentry ON search_searchentry.id = {FTS_TABLE}.rowid'
+            f' WHERE {FTS_TABLE} MATCH %s{kind_condition}',
+            [_fts_query(terms), *kind_params],
+        ))
+    if connection.vendor == 'postgresql':
+        condition = ' AND '.join([f"{_POSTGRES_DOCUMENT} ILIKE %s"] * len(terms))
+        return SearchEntry.objects.filter(id__in=RawSQL(
+            f'SELECT id FROM search_searchentry WHERE {condition}{kind_condition}',
+            [*(_like_pattern(term) for term in terms), *kind_params],
+        ))
+    entries = SearchEntry.objects.all()
+    if kinds is not None:
+        entries = entries.filter(kind__in=kinds)
+    for term in terms:
+        entries = entries.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return entries
+
+
+def matching_ids(query, kind):
+    """Return a subquery of the ids of the objects of ``kind`` matching ``query``.
+
+    List views filter with ``pk__in=matching_ids(...)``, which keeps their
+    own ordering and pagination.
+    """
+    return matching_entries(query, [kind]).values('object_id')
+
+
+def search(query, kinds=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """Return a page of the entries matching ``query``, best first, and whether there is a next page."""
+    terms = query.split()
+    if not terms or kinds is not None and not kinds:
+        return [], False
+    offset = (page - 1) * page_size
+    kind_condition, kind_params = _kind_condition(kinds)
+    if _uses_fts(terms):
+        entries = SearchEntry.objects.raw(
+            f'SELECT search_searchentry.* FROM {FTS_TABLE}'
+            f' CROSS JOIN search_searchentry ON search_searchentry.id = {FTS_TABLE}.rowid'
+            f' WHERE {FTS_TABLE} MATCH %s{kind_condition}'
+            f' ORDER BY bm25({FTS_TABLE}, %s, %s), search_searchentry.title LIMIT %s OFFSET %s',
+            [_fts_query(terms), *kind_params, *BM25_WEIGHTS, page_size + 1, offset],
+        )
+    elif connection.vendor == 'postgresql':
+        condition = ' AND '.join([f"{_POSTGRES_DOCUMENT} ILIKE %s"] * len(terms))
+        entries = SearchEntry.objects.raw(
+            f'SELECT * FROM search_searchentry WHERE {condition}{kind_condition}'
+            f" ORDER BY ts_rank(to_tsvector('simple', {_POSTGRES_DOCUMENT}), plainto_tsquery('simple', %s))"
+            f' + similarity(title, %s) DESC, title LIMIT %s OFFSET %s',
+            [*(_like_pattern(term) for term in terms), *kind_params, query, query, page_size + 1, offset],
+        )
+    else:
+        entries = matching_entries(query, kinds).order_by('title', 'id')[offset:offset + page_size + 1]
+    entries = list(entries)
+    return entries[:page_size], len(entries) > page_size
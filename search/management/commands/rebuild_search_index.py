@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from search.index import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the search index of clients, projects, log sources and users, e.g. after bulk imports'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} objects.'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('client', 'Client'), ('project', 'Project'), ('log_source', 'Log Source'), ('user', 'User')], max_length=10, verbose_name='Kind')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Title')),
+                ('body', models.TextField(blank=True, verbose_name='Body')),
+                ('url', models.CharField(max_length=255, verbose_name='URL')),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
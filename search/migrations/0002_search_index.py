@@ -0,0 +1,72 @@
+from django.db import migrations
+
+from search.index import FTS_TABLE, rebuild
+
+
+SQLITE_INDEX = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"title, body, content='search_searchentry', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER search_searchentry_ai AFTER INSERT ON search_searchentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    f"CREATE TRIGGER search_searchentry_ad AFTER DELETE ON search_searchentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    f"CREATE TRIGGER search_searchentry_au AFTER UPDATE ON search_searchentry BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS search_searchentry_au',
+    'DROP TRIGGER IF EXISTS search_searchentry_ad',
+    'DROP TRIGGER IF EXISTS search_searchentry_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    "CREATE INDEX search_searchentry_trgm_idx ON search_searchentry USING gin ((title || ' ' || body) gin_trgm_ops)",
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS search_searchentry_trgm_idx',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_INDEX)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_INDEX)
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_DROP)
+
+
+def index_existing(apps, schema_editor):
+    rebuild(apps, apps.get_model('search', 'SearchEntry'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('accounts', '0001_initial'),
+        ('clients', '0002_list_pagination_indexes'),
+        ('projects', '0015_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
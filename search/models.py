@@ -0,0 +1,49 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SearchEntry(models.Model):
+    """Searchable text of one client, project, log source or user.
+    
+    Entries are kept up to date by signals (see ``search.signals``) and
+    indexed by the database's full-text search (see ``search.index``).
+    """
+    
+    class Kind(models.TextChoices):
+        CLIENT = 'client', _('Client')
+        PROJECT = 'project', _('Project')
+        LOG_SOURCE = 'log_source', _('Log Source')
+        USER = 'user', _('User')
+    
+    kind = models.CharField(
+        max_length=10,
+        choices=Kind.choices,
+        verbose_name=_('Kind')
+    )
+    
+    object_id = models.BigIntegerField(
+        verbose_name=_('Object ID')
+    )
+    
+    title = models.CharField(
+        max_length=255,
+        verbose_name=_('Title')
+    )
+    
+    body = models.TextField(
+        blank=True,
+        verbose_name=_('Body')
+    )
+    
+    url = models.CharField(
+        max_length=255,
+        verbose_name=_('URL')
+    )
+    
+    class Meta:
+        verbose_name = _('Search Entry')
+        verbose_name_plural = _('Search Entries')
+        unique_together = ['kind', 'object_id']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
@@ -0,0 +1,21 @@
+"""Keep the search index up to date as indexed objects are saved and deleted."""
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .index import DOCUMENTS, index_instance, remove_instance
+
+
+def update_entry(sender, instance, raw=False, **kwargs):
+    # Fixtures are loaded raw: their entries come from ``rebuild_search_index``.
+    if not raw:
+        index_instance(instance)
+
+
+def delete_entry(sender, instance, **kwargs):
+    remove_instance(instance)
+
+
+for label in DOCUMENTS:
+    model = apps.get_model(label)
+    post_save.connect(update_entry, sender=model, dispatch_uid=f'search-index-{label}')
+    post_delete.connect(delete_entry, sender=model, dispatch_uid=f'search-unindex-{label}')
@@ -0,0 +1,112 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import User
+from clients.models import Client
+from projects.models import LogSource, Project
+from .index import matching_entries, rebuild, search
+from .models import SearchEntry
+
+
+class SearchIndexTests(TestCase):
+    """Entries follow the indexed objects and are matched by substring."""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('jdoe', password='secret', first_name='Jane', email='jane@example.com')
+        cls.acme = Client.objects.create(name='Acme Corporation', created_by=cls.user)
+        cls.globex = Client.objects.create(name='Globex', created_by=cls.user)
+        cls.shop = Project.objects.create(
+            name='Acme Shop', description='Storefront access logs', client=cls.acme, created_by=cls.user,
+        )
+        cls.blog = Project.objects.create(name='Blog', client=cls.globex, created_by=cls.user)
+        cls.log_source = LogSource.objects.create(
+            project=cls.blog, source_type='s3', bucket_name='globex-logs', prefix='cloudfront/', region='eu-west-1',
+        )
+    
+    def titles(self, query, kinds=None):
+        return [entry.title for entry in search(query, kinds)[0]]
+    
+    def test_saved_objects_are_indexed(self):
+        self.assertEqual(SearchEntry.objects.count(), 6)
+        entry = SearchEntry.objects.get(kind=SearchEntry.Kind.LOG_SOURCE, object_id=self.log_source.pk)
+        self.assertEqual(entry.title, 'S3 - globex-logs/cloudfront/')
+        self.assertEqual(entry.url, reverse('configure_log_source', args=[self.blog.pk]))
+    
+    def test_substring_terms_match_title_and_body(self):
+        self.assertEqual(sorted(self.titles('acme')), ['Acme Corporation', 'Acme Shop'])
+        self.assertEqual(self.titles('orefro'), ['Acme Shop'])
+        self.assertEqual(self.titles('acme shop'), ['Acme Shop'])
+        self.assertEqual(self.titles('acme blog'), [])
+    
+    def test_title_matches_rank_first(self):
+        Project.objects.create(name='Intranet', description='Logs of the Globex intranet', client=self.acme, created_by=self.user)
+        self.assertEqual(self.titles('globex')[0], 'Globex')
+    
+    def test_short_terms(self):
+        self.assertEqual(self.titles('Bl'), ['Blog'])
+        self.assertEqual(set(matching_entries('ac').values_list('title', flat=True)), {'Acme Shop', 'Acme Corporation'})
+    
+    def test_special_characters_are_literal(self):
+        self.assertEqual(self.titles('"acme'), [])
+        self.assertEqual(self.titles('globex-logs'), ['S3 - globex-logs/cloudfront/'])
+        self.assertEqual(self.titles('100%'), [])
+    
+    def test_kinds(self):
+        self.assertEqual(self.titles('acme', [SearchEntry.Kind.CLIENT]), ['Acme Corporation'])
+        self.assertEqual(self.titles('globex', [SearchEntry.Kind.CLIENT, SearchEntry.Kind.LOG_SOURCE]), [
+            'Globex', 'S3 - globex-logs/cloudfront/',
+        ])
+        self.assertEqual(self.titles('acme', []), [])
+    
+    def test_updates_and_deletes(self):
+        self.shop.name = 'Initech Shop'
+        self.shop.save()
+        self.assertEqual(self.titles('acme', [SearchEntry.Kind.PROJECT]), [])
+        self.assertEqual(self.titles('initech'), ['Initech Shop'])
+        self.globex.delete()
+        self.assertEqual(self.titles('globex'), [])
+        self.assertFalse(SearchEntry.objects.filter(kind=SearchEntry.Kind.PROJECT, object_id=self.blog.pk).exists())
+    
+    def test_pages(self):
+        for i in range(25):
+            Client.objects.create(name=f'Paged client {i:02d}', created_by=self.user)
+        first, has_next = search('paged', page_size=20)
+        self.assertTrue(has_next)
+        second, has_next = search('paged', page=2, page_size=20)
+        self.assertFalse(has_next)
+        self.assertEqual(len(first) + len(second), 25)
+        self.assertFalse({entry.pk for entry in first} & {entry.pk for entry in second})
+    
+    def test_rebuild(self):
+        SearchEntry.objects.all().delete()
+        rebuild()
+        self.assertEqual(SearchEntry.objects.count(), 6)
+        self.assertEqual(self.titles('storefront'), ['Acme Shop'])
+
+
+class SearchApiTests(TestCase):
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.editor = User.objects.create_user('editor', password='secret')
+        cls.admin = User.objects.create_user('admin', password='secret', role=User.UserRole.ADMIN)
+        Client.objects.create(name='Editorial', created_by=cls.editor)
+    
+    def get(self, **params):
+        return self.client.get(reverse('search_api'), params)
+    
+    def test_requires_login(self):
+        self.assertEqual(self.get(q='edit').status_code, 302)
+    
+    def test_users_are_only_searched_by_admins(self):
+        self.client.force_login(self.editor)
+        self.assertEqual([result['kind'] for result in self.get(q='edit').json()['results']], ['client'])
+        self.assertEqual(self.get(q='edit', kind='user').json()['results'], [])
+        self.client.force_login(self.admin)
+        self.assertEqual(sorted(result['kind'] for result in self.get(q='edit').json()['results']), ['client', 'user'])
+    
+    def test_invalid_parameters(self):
+        self.client.force_login(self.editor)
+        self.assertEqual(self.get(q='edit', kind='invoice').status_code, 400)
+        self.assertEqual(self.get(q='edit', page='x').status_code, 400)
@@ -0,0 +1,46 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .index import SEARCH_PAGE_SIZE, search
+from .models import SearchEntry
+
+
+@login_required
+def search_api(request):
+    """Return one page of ranked search results as JSON.
+    
+    Takes the query in ``q``, an optional ``kind`` to search only clients,
+    projects, log sources or users, and a 1-based ``page``. Users are only
+    searched by admins.
+    """
+    query = request.GET.get('q', '').strip()
+    kinds = list(SearchEntry.Kind.values)
+    if not request.user.is_admin:
+        kinds.remove(SearchEntry.Kind.USER)
+    kind = request.GET.get('kind')
+    if kind:
+        if kind not in SearchEntry.Kind.values:
+            return JsonResponse({'error': f'Unknown kind: {kind}.'}, status=400)
+        kinds = [kind] if kind in kinds else []
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page number.'}, status=400)
+    
+    entries, has_next = search(query, kinds, page=page)
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'page_size': SEARCH_PAGE_SIZE,
+        'has_next': has_next,
+        'results': [
+            {
+                'kind': entry.kind,
+                'id': entry.object_id,
+                'title': entry.title,
+                'body': entry.body,
+                'url': entry.url,
+            }
+            for entry in entries
+        ],
+    })